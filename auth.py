@@ -0,0 +1,102 @@
+import hashlib
+import hmac
+import os
+from functools import lru_cache
+from PySide6 import QtCore
+import queries
+from database import read_connection, transaction, add_change_listener
+
+# mots de passe : "pbkdf2_sha256$<iterations>$<sel hex>$<hash hex>".
+# Les anciens comptes ont un sha256 hex sans sel ; ils sont convertis a leur
+# prochaine connexion reussie.
+ALGORITHM = "pbkdf2_sha256"
+ITERATIONS = 200_000
+SALT_BYTES = 16
+
+
+def hash_password(password, iterations=ITERATIONS, salt=None):
+    salt = salt or os.urandom(SALT_BYTES).hex()
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), iterations)
+    return f"{ALGORITHM}${iterations}${salt}${digest.hex()}"
+
+
+def verify_password(password, stored):
+    # renvoie (correct, a_rehacher)
+    if stored.startswith(ALGORITHM + "$"):
+        _, iterations, salt, _ = stored.split("$")
+        ok = hmac.compare_digest(hash_password(password, int(iterations), salt), stored)
+        return ok, ok and int(iterations) < ITERATIONS
+    legacy = hashlib.sha256(password.encode()).hexdigest()
+    ok = hmac.compare_digest(legacy, stored)
+    return ok, ok
+
+
+# compare un identifiant inconnu a ce hash : la reponse prend le meme temps
+# que pour un compte existant. Aucun mot de passe ne donne un condensat nul,
+# inutile de le calculer (200 000 iterations) a l'import.
+_DUMMY_HASH = f"{ALGORITHM}${ITERATIONS}${'00' * SALT_BYTES}${'00' * 32}"
+
+
+@lru_cache(maxsize=32)
+def role_name(role_id):
+    with read_connection() as conn:
+        row = conn.execute("SELECT nom FROM role WHERE id=?", (role_id,)).fetchone()
+    return row[0] if row else None
+
+
+@lru_cache(maxsize=32)
+def societe_name(societe_id):
+    with read_connection() as conn:
+        row = conn.execute("SELECT nom FROM societe WHERE id=?", (societe_id,)).fetchone()
+    return row[0] if row else None
+
+
+def _forget_names(changes):
+    tables = {change[0] for change in changes}
+    if "role" in tables:
+        role_name.cache_clear()
+    if "societe" in tables:
+        societe_name.cache_clear()
+
+add_change_listener(_forget_names)
+
+
+def authenticate(identifiant, password):
+    # bloquant (PBKDF2) : depuis l'interface, passer par AuthWorker
+    with read_connection() as conn:
+        row = queries.fetchone(conn, "auth.user", (identifiant,))
+    if row is None:
+        verify_password(password, _DUMMY_HASH)
+        return None
+    ok, rehash = verify_password(password, row["password"])
+    if not ok:
+        return None
+    user = dict(row)
+    if rehash:
+        user["password"] = hash_password(password)
+        with transaction() as conn:
+            conn.execute("UPDATE user SET password=? WHERE id=?", (user["password"], user["id"]))
+    user["role_nom"] = role_name(user["role_id"])
+    user["societe_nom"] = societe_name(user["societe_id"])
+    return user
+
+
+class AuthWorker(QtCore.QRunnable):
+    # verifie le mot de passe hors du thread de l'interface. done(user, erreur)
+    # est un signal, donc recu dans le thread de l'interface : user vaut None si
+    # les identifiants sont faux, erreur est vide sauf si la base a echoue
+    def __init__(self, identifiant, password, done):
+        super().__init__()
+        self.identifiant = identifiant
+        self.password = password
+        self.done = done
+
+    def run(self):
+        try:
+            # poste seul : authenticate() ; guichet distant : POST /login du serveur
+            from backend import backend
+            user = backend().authenticate(self.identifiant, self.password)
+        except Exception as e:
+            self.done.emit(None, str(e))
+            return
+        self.done.emit(user, "")
@@ -0,0 +1,254 @@
+import http.client
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from urllib.parse import urlsplit
+import queries
+from database import read_connection, table_versions, add_change_listener
+from writequeue import write_queue
+
+# GESTTRANSPORT_SERVER=http://poste-central:8765 (ou main.py --server URL) : le
+# guichet ne touche plus a un fichier local, tout passe par server.py
+SERVER_ENV = "GESTTRANSPORT_SERVER"
+REQUEST_TIMEOUT = 15
+# duree d'attente d'un appel GET /changes cote serveur (long polling)
+CHANGES_WAIT = 20
+
+
+class ServerError(Exception):
+    pass
+
+
+class SessionExpired(ServerError):
+    # 401 et reconnexion impossible (mot de passe change, compte supprime)
+    pass
+
+
+class LocalBackend:
+    # acces direct a gestransport.db (poste seul, ou le serveur lui-meme) ; les
+    # ventes passent par la file d'ecriture (writequeue.py), commits groupes
+    remote = False
+
+    def fetchall(self, name, params=()):
+        with read_connection() as conn:
+            return queries.fetchall(conn, name, params)
+
+    def fetchone(self, name, params=()):
+        with read_connection() as conn:
+            return queries.fetchone(conn, name, params)
+
+    def search_connection(self):
+        # connexion donnee a search.SearchController (interruptible)
+        return read_connection()
+
+    def table_versions(self, tables):
+        return table_versions(tables)
+
+    def add_change_listener(self, listener):
+        add_change_listener(listener)
+
+    def authenticate(self, identifiant, password):
+        from auth import authenticate
+        return authenticate(identifiant, password)
+
+    def seat_plan(self, trajet_id):
+        from seats import inventory
+        return inventory.plan(trajet_id)
+
+    def sell_ticket(self, user, trajet_id, siege, client_id, montant, date):
+        from seats import inventory
+        return write_queue().call(inventory.reserve, trajet_id, siege, client_id, user["id"], montant, date)
+
+    def sell_group(self, user, trajet_id, client_ids, montant, date):
+        from seats import inventory
+        return write_queue().call(inventory.reserve_many, trajet_id, client_ids, user["id"], montant, date)
+
+    def cancel_ticket(self, ticket_id):
+        from seats import inventory
+        write_queue().call(inventory.cancel, ticket_id)
+
+    def add_client(self, nom, prenom, telephone):
+        return write_queue().execute("INSERT INTO client (nom,prenom,telephone) VALUES (?,?,?)",
+                                     (nom, prenom, telephone)).result()
+
+
+class Row(tuple):
+    # ligne recue du serveur, lue par position ou par nom comme un sqlite3.Row
+    def __new__(cls, index, values):
+        row = super().__new__(cls, values)
+        row._index = index
+        return row
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            key = self._index[key]
+        return tuple.__getitem__(self, key)
+
+    def keys(self):
+        return list(self._index)
+
+
+def _rows(result):
+    index = {name: i for i, name in enumerate(result["columns"])}
+    return [Row(index, values) for values in result["rows"]]
+
+
+class RemoteBackend:
+    # client HTTP/JSON de server.py : une connexion persistante par thread
+    remote = True
+
+    def __init__(self, url):
+        parts = urlsplit(url if "//" in url else f"http://{url}")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.token = None
+        # gardes pour rouvrir la session si le serveur a redemarre (401)
+        self._credentials = None
+        self._auth_lock = threading.Lock()
+        self._local = threading.local()
+        self._versions = {}
+        self._seq = None
+        self._poller = None
+        self._listeners = []
+
+    def _connection(self, timeout=REQUEST_TIMEOUT):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        return conn
+
+    def _send(self, method, path, body, timeout):
+        data = None if body is None else json.dumps(body).encode()
+        headers = {"Content-Type": "application/json"}
+        token = self.token
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        for attempt in (1, 2):
+            conn = self._connection(timeout)
+            try:
+                conn.request(method, path, data, headers)
+                response = conn.getresponse()
+                return token, response.status, json.loads(response.read() or b"null")
+            except (OSError, http.client.HTTPException):
+                # connexion persistante fermee par le serveur : une seule reprise
+                conn.close()
+                self._local.conn = None
+                if attempt == 2:
+                    raise ServerError(f"Serveur injoignable ({self.host}:{self.port}).") from None
+
+    def request(self, method, path, body=None, timeout=REQUEST_TIMEOUT):
+        token, status, payload = self._send(method, path, body, timeout)
+        if status == 401 and token is not None:
+            # sessions perdues au redemarrage du serveur : on se reconnecte et on rejoue
+            self._reauthenticate(token)
+            token, status, payload = self._send(method, path, body, timeout)
+        if status == 401:
+            raise SessionExpired(payload["error"] if isinstance(payload, dict) else "Session expirée.")
+        if status == 409:
+            from seats import SeatUnavailable
+            raise SeatUnavailable(payload["error"])
+        if status >= 400:
+            raise ServerError(payload["error"] if isinstance(payload, dict) else f"Erreur {status}")
+        return payload
+
+    def _reauthenticate(self, token):
+        with self._auth_lock:
+            if self.token != token or self._credentials is None:
+                # deja rouverte par un autre thread, ou rien pour la rouvrir
+                return
+            # serveur injoignable : ServerError, la session sera rouverte au prochain appel
+            _, status, result = self._send("POST", "/login", self._credentials, REQUEST_TIMEOUT)
+            if status == 200 and result.get("user") is not None:
+                self.token = result["token"]
+            else:
+                self.token = self._credentials = None
+
+    def fetchall(self, name, params=()):
+        return _rows(self.request("POST", f"/query/{name}", {"params": params}))
+
+    def fetchone(self, name, params=()):
+        rows = _rows(self.request("POST", f"/query/{name}", {"params": params, "one": True}))
+        return rows[0] if rows else None
+
+    def search_connection(self):
+        return nullcontext(None)
+
+    def table_versions(self, tables):
+        return tuple(self._versions.get(table, 0) for table in tables)
+
+    def add_change_listener(self, listener):
+        self._listeners.append(listener)
+
+    def authenticate(self, identifiant, password):
+        result = self.request("POST", "/login", {"identifiant": identifiant, "password": password})
+        if result["user"] is None:
+            return None
+        self.token = result["token"]
+        self._credentials = {"identifiant": identifiant, "password": password}
+        self._start_poller()
+        return result["user"]
+
+    def seat_plan(self, trajet_id):
+        from seats import _SeatMap
+        plan = self.request("GET", f"/trajets/{trajet_id}/places")
+        return _SeatMap(plan["capacite"], plan["pris"])
+
+    def sell_ticket(self, user, trajet_id, siege, client_id, montant, date):
+        # date et agent sont fixes par le serveur
+        return self.request("POST", "/tickets", {"trajet_id": trajet_id, "siege": siege,
+                                                 "client_id": client_id, "montant": montant})["id"]
+
+    def sell_group(self, user, trajet_id, client_ids, montant, date):
+        return self.request("POST", "/tickets/groupe", {"trajet_id": trajet_id, "client_ids": client_ids,
+                                                        "montant": montant})["sieges"]
+
+    def cancel_ticket(self, ticket_id):
+        self.request("POST", f"/tickets/{ticket_id}/annuler", {})
+
+    def add_client(self, nom, prenom, telephone):
+        return self.request("POST", "/clients", {"nom": nom, "prenom": prenom, "telephone": telephone})["id"]
+
+    def _start_poller(self):
+        if self._poller is None:
+            self._poller = threading.Thread(target=self._poll, daemon=True, name="changes")
+            self._poller.start()
+
+    def _poll(self):
+        # changements faits sur le serveur (par ce guichet ou les autres) :
+        # publies comme ceux d'un commit local (events.bus)
+        while True:
+            try:
+                since = -1 if self._seq is None else self._seq
+                result = self.request("GET", f"/changes?since={since}&wait={CHANGES_WAIT}",
+                                      timeout=CHANGES_WAIT + REQUEST_TIMEOUT)
+            except SessionExpired:
+                # plus de session : le prochain authenticate() relance le suivi
+                self._poller = None
+                return
+            except ServerError:
+                time.sleep(2)
+                continue
+            first = self._seq is None
+            self._seq = result["seq"]
+            changes = [tuple(change) for change in result["changes"]]
+            if first or not changes:
+                continue
+            for table in {change[0] for change in changes}:
+                self._versions[table] = self._versions.get(table, 0) + 1
+            for listener in list(self._listeners):
+                listener(changes)
+
+
+_backend = None
+
+def use_server(url):
+    global _backend
+    _backend = RemoteBackend(url) if url else LocalBackend()
+    return _backend
+
+def backend():
+    if _backend is None:
+        use_server(os.environ.get(SERVER_ENV))
+    return _backend
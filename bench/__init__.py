@@ -0,0 +1,2 @@
+# bancs d'essai : python -m bench.generate, bench.query_bench, bench.stress,
+# bench.gui_bench (depuis la racine du depot), voir bench/common.py
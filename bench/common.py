@@ -0,0 +1,81 @@
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import database
+
+# base generee par bench.generate quand --db n'est pas donne
+DEFAULT_DB = os.path.join(ROOT, "bench", "bench.db")
+
+
+def use_database(path):
+    # toutes les connexions (pages, inventaire, file d'ecriture) ouvrent ce fichier
+    database.close_connections()
+    database.DB_PATH = os.path.abspath(path)
+    database.init_db()
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    k = (len(ordered) - 1) * p / 100
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def summary(samples):
+    # durees en secondes -> millisecondes
+    ms = [s * 1000 for s in samples]
+    return {"n": len(ms), "min_ms": round(min(ms), 3), "p50_ms": round(percentile(ms, 50), 3),
+            "p95_ms": round(percentile(ms, 95), 3), "max_ms": round(max(ms), 3),
+            "mean_ms": round(statistics.fmean(ms), 3)}
+
+
+def measure(fn, repeat=20, warmup=2):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summary(samples)
+
+
+def db_info():
+    path = database.DB_PATH
+    info = {"path": path, "size_mb": round(os.path.getsize(path) / 1e6, 1)}
+    conn = database.get_connection()
+    try:
+        for table in ("ticket", "trajet", "client", "vehicule", "chauffeur", "societe", "ville", "user"):
+            info[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+    return info
+
+
+def report(kind, results, output=None, **extra):
+    # une ligne lisible par resultat sur stderr, le JSON complet sur stdout ou dans "output"
+    for name, stats in results.items():
+        cols = "  ".join(f"{k}={v}" for k, v in stats.items())
+        print(f"{name:<34}{cols}", file=sys.stderr)
+    data = {"bench": kind, "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "sqlite": database.sqlite3.sqlite_version,
+            "machine": platform.machine(), **extra, "results": results}
+    text = json.dumps(data, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return data
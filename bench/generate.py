@@ -0,0 +1,160 @@
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from bench.common import DEFAULT_DB, use_database, db_info
+import database
+
+# python -m bench.generate --tickets 2000000 --db bench/bench.db
+# Base de demonstration a volume reel : societes, villes, vehicules,
+# chauffeurs, agents, clients, trajets et tickets (sieges uniques par trajet).
+CHUNK = 50_000
+CAPACITIES = (10, 15, 18, 30, 50, 70)
+VILLES = ["OUAGADOUGOU", "BOBO-DIOULASSO", "KOUDOUGOU", "OUAHIGOUYA", "BANFORA", "DEDOUGOU",
+          "KAYA", "TENKODOGO", "FADA N'GOURMA", "DORI", "GAOUA", "KOUPELA", "ZINIARE",
+          "MANGA", "LEO", "NOUNA", "DIEBOUGOU", "POUYTENGA", "REO", "HOUNDE"]
+NOMS = ["OUEDRAOGO", "SAWADOGO", "KABORE", "TRAORE", "COMPAORE", "ZONGO", "OUATTARA",
+        "SANOU", "DIALLO", "KONATE", "ILBOUDO", "NIKIEMA", "YAMEOGO", "BAMBA", "KINDA"]
+PRENOMS = ["Aminata", "Issouf", "Mariam", "Boureima", "Salif", "Awa", "Adama", "Fatimata",
+           "Moussa", "Rasmané", "Minata", "Hamidou", "Safiatou", "Karim", "Alima"]
+# proportion de tickets annules
+CANCELLED = 0.03
+# pas de montant aleatoire : le prix du trajet, comme au guichet
+PRICES = (2500, 3000, 5000, 7500, 10000)
+
+
+def _chunks(rows, size=CHUNK):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert(conn, sql, rows, label, progress):
+    total = 0
+    for chunk in _chunks(rows):
+        conn.executemany(sql, chunk)
+        conn.commit()
+        total += len(chunk)
+        progress(f"{label} : {total}")
+    return total
+
+
+def _name(rnd):
+    return rnd.choice(NOMS), rnd.choice(PRENOMS)
+
+
+def generate(path, societes=5, villes=20, vehicules=200, chauffeurs=300, agents=20, clients=100_000,
+             trajets=0, tickets=1_000_000, seed=1, progress=None):
+    progress = progress or (lambda text: print(text, file=sys.stderr))
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    use_database(path)
+    rnd = random.Random(seed)
+    conn = database.get_connection()
+    # base jetable : pas de fsync pendant la generation
+    conn.execute("PRAGMA synchronous=OFF")
+    start = time.perf_counter()
+
+    _insert(conn, "INSERT INTO societe (nom, description, telephone, adresse) VALUES (?,?,?,?)",
+            ((f"SOCIETE {i:03d}", "générée", f"25{i:06d}", "Ouagadougou") for i in range(1, societes + 1)),
+            "sociétés", progress)
+    societe_ids = [r[0] for r in conn.execute("SELECT id FROM societe")]
+
+    noms_villes = VILLES[:villes] + [f"VILLE-{i:03d}" for i in range(max(villes - len(VILLES), 0))]
+    conn.executemany("INSERT OR IGNORE INTO ville (nom) VALUES (?)", [(v,) for v in noms_villes])
+    conn.commit()
+    ville_ids = [r[0] for r in conn.execute("SELECT id FROM ville")]
+
+    _insert(conn, "INSERT INTO vehicule (matricule, nbre_place, type, societe_id) VALUES (?,?,?,?)",
+            ((f"BF-{i:05d}", rnd.choice(CAPACITIES), "Car", rnd.choice(societe_ids))
+             for i in range(vehicules)), "véhicules", progress)
+    capacity = dict(conn.execute("SELECT id, nbre_place FROM vehicule WHERE nbre_place IS NOT NULL"))
+    vehicule_ids = list(capacity)
+
+    _insert(conn, "INSERT INTO chauffeur (nom, prenom, matricule, permis, date_embauche, societe_id) "
+                  "VALUES (?,?,?,?,?,?)",
+            ((*_name(rnd), f"CH-{i:05d}", "D", "2020-01-01", rnd.choice(societe_ids)) for i in range(chauffeurs)),
+            "chauffeurs", progress)
+    chauffeur_ids = [r[0] for r in conn.execute("SELECT id FROM chauffeur")]
+
+    # un seul hachage PBKDF2 partage : mot de passe "bench" pour tous les agents
+    from auth import hash_password
+    password = hash_password("bench")
+    _insert(conn, "INSERT INTO user (nom, prenom, identifiant, password, genre, role_id, societe_id) "
+                  "VALUES (?,?,?,?,?,?,?)",
+            ((*_name(rnd), f"agent{i:03d}", password, "M", 2, rnd.choice(societe_ids)) for i in range(agents)),
+            "agents", progress)
+    user_ids = [r[0] for r in conn.execute("SELECT id FROM user")]
+
+    _insert(conn, "INSERT INTO client (nom, prenom, telephone) VALUES (?,?,?)",
+            ((*_name(rnd), f"7{rnd.randrange(10**7):07d}") for _ in range(clients)), "clients", progress)
+    client_low, client_high = conn.execute("SELECT MIN(id), MAX(id) FROM client").fetchone()
+
+    # assez de trajets pour loger les tickets (remplissage moyen ~ 65 %)
+    average = sum(CAPACITIES) / len(CAPACITIES)
+    trajets = max(trajets, math.ceil(tickets / (average * 0.65)) if tickets else 0)
+    first_day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=365)
+
+    def trajet_rows():
+        for _ in range(trajets):
+            depart, arrivee = rnd.sample(ville_ids, 2)
+            dep = first_day + timedelta(minutes=rnd.randrange(395 * 24 * 60))
+            arr = dep + timedelta(minutes=rnd.randrange(90, 600))
+            yield (dep.strftime("%Y-%m-%d %H:%M"), arr.strftime("%Y-%m-%d %H:%M"), depart, arrivee,
+                   rnd.choice(vehicule_ids), rnd.choice(chauffeur_ids), rnd.choice(PRICES))
+    _insert(conn, "INSERT INTO trajet (heure_depart, heure_arrivee, ville_depart_id, ville_arrivee_id, "
+                  "vehicule_id, chauffeur_id, prix) VALUES (?,?,?,?,?,?,?)", trajet_rows(), "trajets", progress)
+
+    def ticket_rows():
+        left = tickets
+        for tid, dep, vid, prix in conn.execute("SELECT id, heure_depart, vehicule_id, prix FROM trajet").fetchall():
+            if left <= 0:
+                return
+            places = capacity.get(vid, 10)
+            sold = min(left, max(1, round(places * rnd.uniform(0.3, 1.0))))
+            left -= sold
+            departure = datetime.strptime(dep, "%Y-%m-%d %H:%M")
+            for siege in range(1, sold + 1):
+                date = departure - timedelta(minutes=rnd.randrange(10 * 24 * 60))
+                yield (date.strftime("%Y-%m-%d %H:%M"), siege, prix,
+                       "annulé" if rnd.random() < CANCELLED else "payé", tid,
+                       rnd.randint(client_low, client_high), rnd.choice(user_ids))
+    _insert(conn, "INSERT INTO ticket (date, siege, montant, statut, trajet_id, client_id, user_id) "
+                  "VALUES (?,?,?,?,?,?,?)", ticket_rows(), "tickets", progress)
+
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    progress(f"base générée en {time.perf_counter() - start:.1f} s")
+    return db_info()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère une base de test volumineuse")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--societes", type=int, default=5)
+    parser.add_argument("--villes", type=int, default=20)
+    parser.add_argument("--vehicules", type=int, default=200)
+    parser.add_argument("--chauffeurs", type=int, default=300)
+    parser.add_argument("--agents", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=100_000)
+    parser.add_argument("--trajets", type=int, default=0, help="minimum ; augmenté pour loger les tickets")
+    parser.add_argument("--tickets", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    info = generate(args.db, args.societes, args.villes, args.vehicules, args.chauffeurs, args.agents,
+                    args.clients, args.trajets, args.tickets, args.seed)
+    print(", ".join(f"{k}={v}" for k, v in info.items()), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
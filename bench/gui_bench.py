@@ -0,0 +1,211 @@
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import importlib
+import resource
+import sys
+import time
+from bench.common import DEFAULT_DB, use_database, db_info, summary, report
+
+# python -m bench.gui_bench --db bench/bench.db --output gui.json
+# Les vraies pages (dashboard.PAGES) dans une fenetre hors ecran de la taille du
+# tableau de bord : construction, load_data, repeint complet et defilement du
+# tableau, plus les cartes de _load_stats et l'apercu d'impression. Tout le
+# temps Qt (widgets, styles, mise en page) est compte, pas seulement le SQL.
+WINDOW_SIZE = (1200 - 230, 750)
+
+
+def _peak_rss_mb():
+    # ru_maxrss est en Ko sous Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _timed(app, fn, repeat, warmup=1):
+    # fn puis les evenements en attente (deleteLater, mises a jour differees)
+    for _ in range(warmup):
+        fn()
+        app.processEvents()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        app.processEvents()
+        samples.append(time.perf_counter() - start)
+    return summary(samples)
+
+
+def _host(page, style):
+    from PySide6 import QtWidgets
+    host = QtWidgets.QWidget()
+    host.setStyleSheet(style)
+    host.resize(*WINDOW_SIZE)
+    layout = QtWidgets.QVBoxLayout(host)
+    layout.setContentsMargins(0, 0, 0, 0)
+    layout.addWidget(page)
+    host.show()
+    return host
+
+
+def _table(page):
+    # le plus grand tableau de la page (liste principale)
+    from PySide6 import QtWidgets
+    views = page.findChildren(QtWidgets.QAbstractItemView)
+    return max(views, key=lambda v: v.model().rowCount() if v.model() else 0, default=None)
+
+
+def _scroll(app, view):
+    # descend le tableau ecran par ecran en repeignant chaque position
+    bar = view.verticalScrollBar()
+    steps = 0
+    bar.setValue(0)
+    while True:
+        view.viewport().repaint()
+        app.processEvents()
+        steps += 1
+        if bar.value() >= bar.maximum():
+            return steps
+        bar.setValue(bar.value() + max(bar.pageStep(), 1))
+
+
+def _load(page):
+    # la meme chose que Dashboard.refresh_page, mais synchrone pour les rapports
+    if hasattr(page, "load_data"):
+        return page.load_data
+    if hasattr(page, "run") and hasattr(page, "_show"):
+        from reports import revenue
+
+        def run_report():
+            criteria = (page.report_cb.currentData(), page.debut.date().toString("yyyy-MM-dd"),
+                        page.fin.date().toString("yyyy-MM-dd"), page.period_cb.currentData())
+            page._number += 1
+            page._criteria = criteria
+            page._show(page._number, revenue(*criteria), None)
+        return run_report
+    return page.refresh
+
+
+def bench_page(app, key, user, style, repeat, rows):
+    from dashboard import PAGES
+    module, cls, _ = PAGES[key]
+    page_class = getattr(importlib.import_module(module), cls)
+    result = {}
+    rss = _peak_rss_mb()
+
+    def build():
+        page = page_class(user)
+        page.deleteLater()
+    result["construction"] = _timed(app, build, repeat)
+
+    page = page_class(user)
+    pager = getattr(page, "pager", None)
+    if rows and pager is not None:
+        # pages a QTableWidget : "rows" lignes (donc "rows" setCellWidget) par page
+        pager.page_size = rows
+    host = _host(page, style)
+    app.processEvents()
+    result["load_data"] = _timed(app, _load(page), repeat)
+    result["repaint"] = _timed(app, host.repaint, repeat)
+    view = _table(page)
+    if view is not None and view.model() is not None:
+        steps = [0]
+
+        def scroll():
+            steps[0] = _scroll(app, view)
+        stats = _timed(app, scroll, max(repeat // 2, 1), 0)
+        result["scroll"] = dict(stats, ecrans=steps[0], lignes=view.model().rowCount())
+    peak = _peak_rss_mb()
+    result["memoire"] = {"rss_pic_mb": peak, "hausse_mb": round(peak - rss, 1)}
+    host.close()
+    host.deleteLater()
+    app.processEvents()
+    return result
+
+
+def bench_stats_cards(app, user, style, repeat):
+    # DashboardHome._load_stats : six cartes QFrame detruites et recreees
+    from dashboard_home import DashboardHome
+    page = DashboardHome(user)
+    host = _host(page, style)
+    app.processEvents()
+    result = {"_load_stats": _timed(app, page._load_stats, repeat),
+              "_load_stats+repaint": _timed(app, lambda: (page._load_stats(), host.repaint()), repeat)}
+    host.close()
+    host.deleteLater()
+    return result
+
+
+def bench_print_preview(app, repeat):
+    # apercu d'un trajet complet : setHtml (fait dans la file d'impression) puis
+    # le dialogue et son premier affichage (thread de l'interface)
+    from PySide6 import QtGui
+    from backend import backend
+    from printing import tickets_html, PrintPreviewDialog
+    import database
+    with database.read_connection() as conn:
+        row = conn.execute("SELECT trajet_id FROM ticket WHERE statut != 'annulé' "
+                           "GROUP BY trajet_id ORDER BY COUNT(*) DESC LIMIT 1").fetchone()
+    if row is None:
+        return {}
+    text = tickets_html(backend().fetchall("tickets.print_trajet", (row[0],)))
+    docs = []
+
+    def set_html():
+        doc = QtGui.QTextDocument()
+        doc.setHtml(text)
+        docs.append(doc)
+
+    def preview():
+        doc = QtGui.QTextDocument()
+        doc.setHtml(text)
+        dialog = PrintPreviewDialog(None, doc, text, "Trajet")
+        dialog.show()
+        dialog.repaint()
+        dialog.close()
+        dialog.deleteLater()
+    result = {"setHtml": _timed(app, set_html, repeat), "dialogue": _timed(app, preview, repeat)}
+    result["setHtml"]["pages"] = docs[-1].pageCount() if docs else 0
+    return result
+
+
+def _quiet(mode, context, message):
+    # le plugin offscreen signale chaque fenetre qu'il ne sait pas redimensionner
+    if "propagateSizeHints" not in message:
+        print(message, file=sys.stderr)
+
+
+def main(argv=None):
+    from dashboard import PAGES
+    parser = argparse.ArgumentParser(description="Temps des pages Qt (hors ecran) sur une base generee")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--page", action="append", choices=list(PAGES), help="repetable (defaut : toutes)")
+    parser.add_argument("--rows", type=int, default=0,
+                        help="lignes par page des listes a QTableWidget (defaut : celui de la page)")
+    parser.add_argument("--output", help="fichier JSON (sinon sur la sortie standard)")
+    args = parser.parse_args(argv)
+    use_database(args.db)
+
+    from PySide6 import QtWidgets, QtCore
+    from auth import authenticate
+    from styles import APP_STYLE
+    QtCore.qInstallMessageHandler(_quiet)
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    user = authenticate("admin", "admin123")
+    if user is None:
+        raise SystemExit("Compte admin / admin123 introuvable dans la base.")
+    results = {}
+    start_rss = _peak_rss_mb()
+    for key in args.page or PAGES:
+        for name, stats in bench_page(app, key, user, APP_STYLE, args.repeat, args.rows).items():
+            results[f"{key}.{name}"] = stats
+    for name, stats in bench_stats_cards(app, user, APP_STYLE, args.repeat).items():
+        results[f"home.{name}"] = stats
+    for name, stats in bench_print_preview(app, args.repeat).items():
+        results[f"apercu.{name}"] = stats
+    report("gui", results, args.output, repeat=args.repeat, rows=args.rows, platform=app.platformName(),
+           rss_depart_mb=start_rss, rss_pic_mb=_peak_rss_mb(), database=db_info())
+
+
+if __name__ == "__main__":
+    main()
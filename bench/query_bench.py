@@ -0,0 +1,139 @@
+import argparse
+import random
+from datetime import date, timedelta
+from bench.common import DEFAULT_DB, use_database, db_info, measure, report
+import database
+import profiling
+from backend import backend
+from pagination import KeysetPager, MAX_ID
+
+# python -m bench.query_bench --db bench/bench.db --output resultats.json
+# Chaque mesure rejoue le chemin reel de la page (meme requete du registre,
+# memes parametres, meme pager) sans construire de widget.
+SEARCHES = {"client": "ouedraogo ami", "ville": "bobo", "rare": "zzzz"}
+
+
+def _tickets_pager(search="", statut=None):
+    from tickets import FETCH_CHUNK, TICKETS_PAGE_SIZE
+    pager = KeysetPager("tickets.page", ["id"], (MAX_ID,), page_size=TICKETS_PAGE_SIZE, descending=True)
+    pager.set_filter({"q": database.fts_match(search), "statut": statut})
+    return pager, FETCH_CHUNK
+
+
+def bench_tickets(results, repeat):
+    # TicketsPage.load_data : premier paquet de la page, puis le defilement
+    def load(search="", statut=None):
+        pager, chunk = _tickets_pager(search, statut)
+        return lambda: pager.first(chunk)
+    results["tickets.load_data"] = measure(load(), repeat)
+    for label, text in SEARCHES.items():
+        results[f"tickets.load_data[{label}]"] = measure(load(text), repeat)
+    results["tickets.load_data[annulé]"] = measure(load("", "annulé"), repeat)
+
+    def scroll():
+        pager, chunk = _tickets_pager()
+        pager.first(chunk)
+        while pager.can_fetch:
+            pager.fetch(chunk)
+    results["tickets.scroll_page"] = measure(scroll, max(repeat // 4, 3))
+
+
+def bench_dashboard(results, repeat):
+    # DashboardHome._load_stats / _load_recent_tickets / _load_upcoming_trips
+    for name in ("dashboard.counts", "dashboard.recent_tickets", "dashboard.upcoming_trips"):
+        results[name] = measure(lambda: backend().fetchall(name), repeat)
+
+
+def bench_clients(results, repeat):
+    # ClientsPage : nombre de tickets par client de la page
+    def load(search=""):
+        pager = KeysetPager("clients.page", ["nom", "id"], ("", 0))
+        pager.set_filter({"q": database.fts_match(search)})
+        return pager.first
+    results["clients.load_data"] = measure(load(), repeat)
+    results["clients.load_data[client]"] = measure(load(SEARCHES["client"]), repeat)
+
+
+def bench_print(results, repeat, rnd):
+    from printing import tickets_html
+    with database.read_connection() as conn:
+        low, high = conn.execute("SELECT MIN(id), MAX(id) FROM ticket").fetchone()
+        trajets = [r[0] for r in conn.execute(
+            "SELECT trajet_id FROM ticket GROUP BY trajet_id ORDER BY COUNT(*) DESC LIMIT 20")]
+    if low is None:
+        return
+
+    def one():
+        rows = backend().fetchall("tickets.print", (rnd.randint(low, high),))
+        return tickets_html(rows)
+
+    def trajet():
+        rows = backend().fetchall("tickets.print_trajet", (rnd.choice(trajets),))
+        return tickets_html(rows)
+    results["print.ticket"] = measure(one, repeat)
+    results["print.trajet"] = measure(trajet, max(repeat // 4, 3))
+
+
+def bench_auth(results, repeat):
+    # domine par PBKDF2 (auth.ITERATIONS) : peu de repetitions
+    from auth import authenticate
+    results["auth.authenticate"] = measure(lambda: authenticate("admin", "admin123"), max(repeat // 10, 3), 1)
+    results["auth.authenticate[inconnu]"] = measure(lambda: authenticate("personne", "x"),
+                                                    max(repeat // 10, 3), 1)
+
+
+def bench_reports(results, repeat):
+    try:
+        import reports
+    except ImportError:
+        return
+    fin = date.today()
+    for days in (30, 365):
+        debut = (fin - timedelta(days=days)).isoformat()
+        results[f"reports.trajet[{days}j]"] = measure(
+            lambda: reports.revenue("trajet", debut, fin.isoformat()), max(repeat // 10, 3), 1)
+    results["reports.societe[365j]"] = measure(
+        lambda: reports.revenue("societe", debut, fin.isoformat(), "mois"), max(repeat // 10, 3), 1)
+
+
+def bench_scheduling(results, repeat):
+    from scheduling import scheduler
+
+    def build():
+        scheduler.invalidate()
+        scheduler._timelines()
+    results["scheduling.index"] = measure(build, max(repeat // 10, 3), 1)
+
+
+GROUPS = {
+    "tickets": bench_tickets, "dashboard": bench_dashboard, "clients": bench_clients,
+    "print": bench_print, "auth": bench_auth, "reports": bench_reports, "scheduling": bench_scheduling,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Temps des requetes des pages sur une base generee")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", action="append", choices=sorted(GROUPS), help="groupe a mesurer (repetable)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="fichier JSON (sinon sur la sortie standard)")
+    args = parser.parse_args(argv)
+    use_database(args.db)
+    rnd = random.Random(args.seed)
+    results = {}
+    for name, fn in GROUPS.items():
+        if args.only and name not in args.only:
+            continue
+        if name == "print":
+            fn(results, args.repeat, rnd)
+        else:
+            fn(results, args.repeat)
+    # temps cote SQLite des requetes du registre (profiling.py), a comparer au temps de la page
+    registry = {row["nom"]: {k: row[k] for k in ("appels", "total_ms", "p95_ms", "max_ms")}
+                for row in sorted(profiling.statistics(), key=lambda row: row["nom"] or "") if row["nom"]}
+    report("queries", results, args.output, repeat=args.repeat, database=db_info(), registry=registry)
+
+
+if __name__ == "__main__":
+    main()
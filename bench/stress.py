@@ -0,0 +1,180 @@
+import argparse
+import contextlib
+import multiprocessing
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from bench.common import DEFAULT_DB, use_database, db_info, summary, report
+import database
+
+# python -m bench.stress --mode queue --workers 16 --sales 200
+# Ventes concurrentes sur des trajets neufs crees pour l'essai : chaque vendeur
+# prend le prochain siege libre, retente si on le lui a pris, et on verifie a
+# la fin qu'aucun siege n'a ete vendu deux fois.
+#   threads   : inventory.reserve direct, une transaction par vente
+#   queue     : inventory.reserve via la file d'ecriture (commits groupes)
+#   processes : un processus par vendeur, chacun sa connexion (postes sur un partage)
+#   server    : server.py sur localhost et server.simulate (guichets HTTP)
+MODES = ("threads", "queue", "processes", "server")
+RETRIES = 3
+PRICE = 5000
+
+
+def _prepare(trajets, places):
+    # trajets vides sur un vehicule de "places" places, dans un mois
+    depart = (datetime.now() + timedelta(days=30)).strftime("%Y-%m-%d %H:%M")
+    with database.transaction() as conn:
+        villes = [r[0] for r in conn.execute("SELECT id FROM ville LIMIT 2")]
+        vid = conn.execute("INSERT INTO vehicule (matricule, nbre_place, type) VALUES (?,?,?)",
+                           (f"STRESS-{time.time_ns()}", places, "Car")).lastrowid
+        first = conn.execute("SELECT COALESCE(MAX(id), 0) FROM trajet").fetchone()[0]
+        conn.executemany("""INSERT INTO trajet (heure_depart, ville_depart_id, ville_arrivee_id, vehicule_id, prix)
+                            VALUES (?,?,?,?,?)""", [(depart, villes[0], villes[-1], vid, PRICE)] * trajets)
+        ids = [r[0] for r in conn.execute("SELECT id FROM trajet WHERE id > ?", (first,))]
+        clients = [r[0] for r in conn.execute("SELECT id FROM client LIMIT 1000")]
+        user = conn.execute("SELECT id FROM user ORDER BY id LIMIT 1").fetchone()[0]
+    if not clients:
+        sys.exit("Il faut des clients : générer la base avec bench.generate.")
+    return ids, clients, user
+
+
+def _sell_loop(sell, trajets, clients, sales, seed):
+    # renvoie (compteurs, durees des ventes reussies)
+    from seats import inventory, SeatUnavailable
+    rnd = random.Random(seed)
+    counts = {"vendus": 0, "sieges_pris": 0, "complets": 0, "erreurs": 0}
+    samples = []
+    for _ in range(sales):
+        trajet_id = rnd.choice(trajets)
+        for _ in range(RETRIES):
+            siege = inventory.next_free(trajet_id)
+            if siege is None:
+                counts["complets"] += 1
+                break
+            start = time.perf_counter()
+            try:
+                sell(trajet_id, siege, rnd.choice(clients))
+            except SeatUnavailable:
+                counts["sieges_pris"] += 1
+                continue
+            except Exception:
+                counts["erreurs"] += 1
+                break
+            samples.append(time.perf_counter() - start)
+            counts["vendus"] += 1
+            break
+    return counts, samples
+
+
+def _seller(mode, user):
+    from seats import inventory
+    from writequeue import write_queue
+    date = datetime.now().strftime("%Y-%m-%d %H:%M")
+    if mode == "queue":
+        return lambda t, s, c: write_queue().call(inventory.reserve, t, s, c, user, PRICE, date)
+    return lambda t, s, c: inventory.reserve(t, s, c, user, PRICE, date)
+
+
+def _process_worker(trajets, clients, user, sales, seed):
+    # dans un processus (spawn) ouvert par run_local : sa propre connexion, son propre plan
+    return _sell_loop(_seller("processes", user), trajets, clients, sales, seed)
+
+
+def _merge(parts):
+    counts, samples = {}, []
+    for part_counts, part_samples in parts:
+        for key, value in part_counts.items():
+            counts[key] = counts.get(key, 0) + value
+        samples.extend(part_samples)
+    return counts, samples
+
+
+def run_local(mode, path, workers, sales, trajets, clients, user):
+    if mode == "processes":
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(workers, use_database, (path,)) as pool:
+            # demarrage des processus (imports, init_db) hors mesure
+            pool.map(time.sleep, [0.2] * workers)
+            start = time.perf_counter()
+            parts = pool.starmap(_process_worker, [(trajets, clients, user, sales, n)
+                                                   for n in range(workers)])
+            elapsed = time.perf_counter() - start
+        return _merge(parts), elapsed
+    sell = _seller(mode, user)
+    parts = [None] * workers
+
+    def worker(n):
+        parts[n] = _sell_loop(sell, trajets, clients, sales, n)
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(workers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return _merge(parts), time.perf_counter() - start
+
+
+def run_server(workers, sales, identifiant, password):
+    import asyncio
+    import server
+    started = threading.Event()
+    port = server.DEFAULT_PORT + 1
+    threading.Thread(target=lambda: asyncio.run(server.serve("127.0.0.1", port, started)),
+                     daemon=True).start()
+    started.wait()
+    start = time.perf_counter()
+    # simulate ecrit son bilan sur stdout, reserve au JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        counts = server.simulate(f"http://127.0.0.1:{port}", workers, sales, identifiant, password)
+    return (counts, []), time.perf_counter() - start
+
+
+def duplicates(trajets):
+    conn = database.get_connection()
+    try:
+        marks = ",".join("?" * len(trajets))
+        return conn.execute(f"""SELECT COUNT(*) FROM (
+                                    SELECT 1 FROM ticket WHERE trajet_id IN ({marks}) AND statut != 'annulé'
+                                    GROUP BY trajet_id, siege HAVING COUNT(*) > 1)""", trajets).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ventes concurrentes sur une base generee")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--mode", action="append", choices=MODES, help="repetable (defaut : threads et queue)")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--sales", type=int, default=100, help="ventes par vendeur")
+    parser.add_argument("--trajets", type=int, default=20, help="trajets neufs par mode")
+    parser.add_argument("--places", type=int, default=70)
+    parser.add_argument("--user", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--output", help="fichier JSON (sinon sur la sortie standard)")
+    args = parser.parse_args(argv)
+    use_database(args.db)
+    results = {}
+    for mode in args.mode or ["threads", "queue"]:
+        trajets, clients, user = _prepare(args.trajets, args.places)
+        if mode == "server":
+            (counts, samples), elapsed = run_server(args.workers, args.sales, args.user, args.password)
+        else:
+            (counts, samples), elapsed = run_local(mode, args.db, args.workers, args.sales, trajets, clients, user)
+        result = {"vendeurs": args.workers, "duree_s": round(elapsed, 3),
+                  "ventes_par_s": round(counts["vendus"] / elapsed, 1), **counts}
+        if mode != "server":
+            # le serveur vend sur tous les trajets de la base, pas seulement ceux de l'essai
+            result["doublons"] = duplicates(trajets)
+        if samples:
+            result.update({f"vente_{k}": v for k, v in summary(samples).items() if k != "n"})
+        if mode == "queue":
+            from writequeue import write_queue
+            result.update(write_queue().stats())
+        results[mode] = result
+    report("stress", results, args.output, database=db_info())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,12 @@
+import sqlite3
 from PySide6 import QtWidgets, QtCore
-from database import get_connection
-from styles import primary_btn, section_title, make_table
+from database import read_connection, transaction, fts_match
+from styles import primary_btn, section_title, make_table, pager_bar, patch_table
+from pagination import KeysetPager, MAX_ID
+from search import SearchController
+from events import bus
+from export import export_list
+from seats import inventory
 
 
 class ChauffeursPage(QtWidgets.QWidget):
@@ -17,56 +23,79 @@ class ChauffeursPage(QtWidgets.QWidget):
         hdr = QtWidgets.QHBoxLayout()
         hdr.addWidget(section_title("🚗 Chauffeurs"))
         hdr.addStretch()
+        btn_export = primary_btn("⬇️ Exporter", "#ffffff", "#1a1f2e")
+        btn_export.clicked.connect(lambda: export_list(self, "chauffeurs", self.pager, self.table))
+        hdr.addWidget(btn_export)
         btn = primary_btn("+ Ajouter")
         btn.clicked.connect(self.open_form)
         hdr.addWidget(btn)
         layout.addLayout(hdr)
         self.search = QtWidgets.QLineEdit()
         self.search.setPlaceholderText("🔍 Rechercher...")
-        self.search.textChanged.connect(lambda t: self.load_data(t))
+        self.search.textChanged.connect(lambda t: self.searcher.submit(t))
         layout.addWidget(self.search)
         self.table = make_table(["ID", "Nom", "Prénom", "Matricule", "Permis", "Date embauche", "Société", "Actions"])
         layout.addWidget(self.table)
+        self.pager = KeysetPager("chauffeurs.page", ["nom", "id"], ("", 0))
+        self.pager_bar = pager_bar(lambda: self._show(self.pager.previous_page()),
+                                   lambda: self._show(self.pager.next_page()))
+        layout.addWidget(self.pager_bar)
+        bus().changed.connect(self._on_change)
+        self.searcher = SearchController(lambda conn, text: self.pager.prepare(self._filter(text), conn=conn))
+        self.searcher.results_ready.connect(lambda text, res: self._show(self.pager.apply(res)))
+
+    def _filter(self, search):
+        return {"q": fts_match(search)}
+
+    def refresh(self):
+        self.load_data(self.search.text())
 
     def load_data(self, search=""):
-        conn = get_connection()
-        query = """SELECT c.id,c.nom,c.prenom,c.matricule,c.permis,c.date_embauche,s.nom as societe
-                   FROM chauffeur c LEFT JOIN societe s ON c.societe_id=s.id"""
-        params = []
-        if search:
-            query += " WHERE c.nom LIKE ? OR c.prenom LIKE ? OR c.matricule LIKE ?"
-            s = f"%{search}%"
-            params = [s, s, s]
-        rows = conn.execute(query, params).fetchall()
-        conn.close()
+        self.pager.set_filter(self._filter(search))
+        self._show(self.pager.first())
+
+    def _show(self, rows):
+        self._rows = list(rows)
         self.table.setRowCount(len(rows))
         for i, row in enumerate(rows):
-            for j, val in enumerate(row):
-                self.table.setItem(i, j, QtWidgets.QTableWidgetItem(str(val) if val else "—"))
-            aw = QtWidgets.QWidget()
-            al = QtWidgets.QHBoxLayout(aw)
-            al.setContentsMargins(4, 2, 4, 2)
-            be = QtWidgets.QPushButton("✏️")
-            be.setStyleSheet("background:#1f3a6e;color:#82a2f5;border:none;border-radius:4px;padding:4px 8px;")
-            bd = QtWidgets.QPushButton("🗑️")
-            bd.setStyleSheet("background:#3d1c1c;color:#f85149;border:none;border-radius:4px;padding:4px 8px;")
-            cid = row[0]
-            be.clicked.connect(lambda _, id=cid: self.open_form(id))
-            bd.clicked.connect(lambda _, id=cid: self.delete(id))
-            al.addWidget(be); al.addWidget(bd)
-            self.table.setCellWidget(i, 7, aw)
+            self._fill_row(i, row)
+        self.pager_bar.sync(self.pager)
+
+    def _fill_row(self, i, row):
+        for j, val in enumerate(row):
+            self.table.setItem(i, j, QtWidgets.QTableWidgetItem(str(val) if val else "—"))
+        aw = QtWidgets.QWidget()
+        al = QtWidgets.QHBoxLayout(aw)
+        al.setContentsMargins(4, 2, 4, 2)
+        be = QtWidgets.QPushButton("✏️")
+        be.setStyleSheet("background:#1f3a6e;color:#82a2f5;border:none;border-radius:4px;padding:4px 8px;")
+        bd = QtWidgets.QPushButton("🗑️")
+        bd.setStyleSheet("background:#3d1c1c;color:#f85149;border:none;border-radius:4px;padding:4px 8px;")
+        cid = row[0]
+        be.clicked.connect(lambda _, id=cid: self.open_form(id))
+        bd.clicked.connect(lambda _, id=cid: self.delete(id))
+        al.addWidget(be); al.addWidget(bd)
+        self.table.setCellWidget(i, 7, aw)
+
+    def _on_change(self, table, op, rowid):
+        if table == "chauffeur" and op == "reload":
+            self.refresh()
+        elif table == "chauffeur":
+            patch_table(self.table, self._rows, self.pager.patch(self._rows, op, rowid), self._fill_row)
+            self.pager_bar.sync(self.pager)
 
     def delete(self, cid):
         reply = QtWidgets.QMessageBox.question(self, "Confirmation", "Supprimer ce chauffeur ?")
         if reply == QtWidgets.QMessageBox.Yes:
-            conn = get_connection()
-            conn.execute("DELETE FROM chauffeur WHERE id=?", (cid,))
-            conn.commit(); conn.close()
-            self.load_data()
+            try:
+                with transaction() as conn:
+                    conn.execute("DELETE FROM chauffeur WHERE id=?", (cid,))
+            except sqlite3.IntegrityError:
+                QtWidgets.QMessageBox.warning(self, "Erreur", "Ce chauffeur est affecté à des trajets, il ne peut pas être supprimé."); return
 
     def open_form(self, cid=None):
         dlg = ChauffeurFormDialog(self, cid)
-        if dlg.exec(): self.load_data()
+        dlg.exec()
 
 
 class ChauffeurFormDialog(QtWidgets.QDialog):
@@ -85,9 +114,8 @@ class ChauffeurFormDialog(QtWidgets.QDialog):
         self.date_emb = QtWidgets.QDateEdit()
         self.date_emb.setCalendarPopup(True)
         self.societe_cb = QtWidgets.QComboBox()
-        conn = get_connection()
-        socs = conn.execute("SELECT id,nom FROM societe").fetchall()
-        conn.close()
+        with read_connection() as conn:
+            socs = conn.execute("SELECT id,nom FROM societe").fetchall()
         for s in socs: self.societe_cb.addItem(s['nom'], s['id'])
         layout.addRow("Nom *", self.nom)
         layout.addRow("Prénom *", self.prenom)
@@ -102,9 +130,8 @@ class ChauffeurFormDialog(QtWidgets.QDialog):
         if cid: self._load(cid)
 
     def _load(self, cid):
-        conn = get_connection()
-        row = conn.execute("SELECT * FROM chauffeur WHERE id=?", (cid,)).fetchone()
-        conn.close()
+        with read_connection() as conn:
+            row = conn.execute("SELECT * FROM chauffeur WHERE id=?", (cid,)).fetchone()
         if row:
             self.nom.setText(row['nom']); self.prenom.setText(row['prenom'])
             self.matricule.setText(row['matricule'] or ""); self.permis.setText(row['permis'] or "")
@@ -117,18 +144,18 @@ class ChauffeurFormDialog(QtWidgets.QDialog):
         nom = self.nom.text().strip(); prenom = self.prenom.text().strip()
         if not nom or not prenom:
             QtWidgets.QMessageBox.warning(self, "Erreur", "Nom et prénom obligatoires."); return
-        conn = get_connection()
         dob = self.date_emb.date().toString("yyyy-MM-dd")
         try:
-            if self.cid:
-                conn.execute("UPDATE chauffeur SET nom=?,prenom=?,matricule=?,permis=?,date_embauche=?,societe_id=? WHERE id=?",
-                    (nom,prenom,self.matricule.text(),self.permis.text(),dob,self.societe_cb.currentData(),self.cid))
-            else:
-                conn.execute("INSERT INTO chauffeur (nom,prenom,matricule,permis,date_embauche,societe_id) VALUES (?,?,?,?,?,?)",
-                    (nom,prenom,self.matricule.text(),self.permis.text(),dob,self.societe_cb.currentData()))
-            conn.commit(); conn.close(); self.accept()
+            with transaction() as conn:
+                if self.cid:
+                    conn.execute("UPDATE chauffeur SET nom=?,prenom=?,matricule=?,permis=?,date_embauche=?,societe_id=? WHERE id=?",
+                        (nom,prenom,self.matricule.text(),self.permis.text(),dob,self.societe_cb.currentData(),self.cid))
+                else:
+                    conn.execute("INSERT INTO chauffeur (nom,prenom,matricule,permis,date_embauche,societe_id) VALUES (?,?,?,?,?,?)",
+                        (nom,prenom,self.matricule.text(),self.permis.text(),dob,self.societe_cb.currentData()))
+            self.accept()
         except Exception as e:
-            conn.close(); QtWidgets.QMessageBox.warning(self, "Erreur", str(e))
+            QtWidgets.QMessageBox.warning(self, "Erreur", str(e))
 
 
 
@@ -146,55 +173,87 @@ class VehiculesPage(QtWidgets.QWidget):
         hdr = QtWidgets.QHBoxLayout()
         hdr.addWidget(section_title("🚌 Véhicules"))
         hdr.addStretch()
+        btn_import = primary_btn("📥 Importer", "#ffffff", "#1a1f2e")
+        btn_import.clicked.connect(self.open_import)
+        hdr.addWidget(btn_import)
+        btn_export = primary_btn("⬇️ Exporter", "#ffffff", "#1a1f2e")
+        btn_export.clicked.connect(lambda: export_list(self, "vehicules", self.pager, self.table))
+        hdr.addWidget(btn_export)
         btn = primary_btn("+ Ajouter")
         btn.clicked.connect(self.open_form)
         hdr.addWidget(btn)
         layout.addLayout(hdr)
         self.search = QtWidgets.QLineEdit()
         self.search.setPlaceholderText("🔍 Rechercher par matricule ou type...")
-        self.search.textChanged.connect(lambda t: self.load_data(t))
+        self.search.textChanged.connect(lambda t: self.searcher.submit(t))
         layout.addWidget(self.search)
         self.table = make_table(["ID", "Matricule", "Nbre places", "Type", "Société", "Actions"])
         layout.addWidget(self.table)
+        self.pager = KeysetPager("vehicules.page", ["id"], (MAX_ID,), descending=True)
+        self.pager_bar = pager_bar(lambda: self._show(self.pager.previous_page()),
+                                   lambda: self._show(self.pager.next_page()))
+        layout.addWidget(self.pager_bar)
+        bus().changed.connect(self._on_change)
+        self.searcher = SearchController(lambda conn, text: self.pager.prepare(self._filter(text), conn=conn))
+        self.searcher.results_ready.connect(lambda text, res: self._show(self.pager.apply(res)))
+
+    def _filter(self, search):
+        return {"q": fts_match(search)}
+
+    def refresh(self):
+        self.load_data(self.search.text())
 
     def load_data(self, search=""):
-        conn = get_connection()
-        query = "SELECT v.id,v.matricule,v.nbre_place,v.type,s.nom FROM vehicule v LEFT JOIN societe s ON v.societe_id=s.id"
-        params = []
-        if search:
-            query += " WHERE v.matricule LIKE ? OR v.type LIKE ?"
-            s = f"%{search}%"
-            params = [s, s]
-        rows = conn.execute(query, params).fetchall()
-        conn.close()
+        self.pager.set_filter(self._filter(search))
+        self._show(self.pager.first())
+
+    def _show(self, rows):
+        self._rows = list(rows)
         self.table.setRowCount(len(rows))
         for i, row in enumerate(rows):
-            for j, val in enumerate(row):
-                self.table.setItem(i, j, QtWidgets.QTableWidgetItem(str(val) if val else "—"))
-            aw = QtWidgets.QWidget()
-            al = QtWidgets.QHBoxLayout(aw)
-            al.setContentsMargins(4,2,4,2)
-            be = QtWidgets.QPushButton("✏️")
-            be.setStyleSheet("background:#1f3a6e;color:#82a2f5;border:none;border-radius:4px;padding:4px 8px;")
-            bd = QtWidgets.QPushButton("🗑️")
-            bd.setStyleSheet("background:#3d1c1c;color:#f85149;border:none;border-radius:4px;padding:4px 8px;")
-            vid = row[0]
-            be.clicked.connect(lambda _, id=vid: self.open_form(id))
-            bd.clicked.connect(lambda _, id=vid: self.delete(id))
-            al.addWidget(be); al.addWidget(bd)
-            self.table.setCellWidget(i, 5, aw)
+            self._fill_row(i, row)
+        self.pager_bar.sync(self.pager)
+
+    def _fill_row(self, i, row):
+        for j, val in enumerate(row):
+            self.table.setItem(i, j, QtWidgets.QTableWidgetItem(str(val) if val else "—"))
+        aw = QtWidgets.QWidget()
+        al = QtWidgets.QHBoxLayout(aw)
+        al.setContentsMargins(4,2,4,2)
+        be = QtWidgets.QPushButton("✏️")
+        be.setStyleSheet("background:#1f3a6e;color:#82a2f5;border:none;border-radius:4px;padding:4px 8px;")
+        bd = QtWidgets.QPushButton("🗑️")
+        bd.setStyleSheet("background:#3d1c1c;color:#f85149;border:none;border-radius:4px;padding:4px 8px;")
+        vid = row[0]
+        be.clicked.connect(lambda _, id=vid: self.open_form(id))
+        bd.clicked.connect(lambda _, id=vid: self.delete(id))
+        al.addWidget(be); al.addWidget(bd)
+        self.table.setCellWidget(i, 5, aw)
+
+    def _on_change(self, table, op, rowid):
+        if table == "vehicule" and op == "reload":
+            self.refresh()
+        elif table == "vehicule":
+            patch_table(self.table, self._rows, self.pager.patch(self._rows, op, rowid), self._fill_row)
+            self.pager_bar.sync(self.pager)
 
     def delete(self, vid):
         reply = QtWidgets.QMessageBox.question(self, "Confirmation", "Supprimer ce véhicule ?")
         if reply == QtWidgets.QMessageBox.Yes:
-            conn = get_connection()
-            conn.execute("DELETE FROM vehicule WHERE id=?", (vid,))
-            conn.commit(); conn.close()
-            self.load_data()
+            try:
+                with transaction() as conn:
+                    conn.execute("DELETE FROM vehicule WHERE id=?", (vid,))
+            except sqlite3.IntegrityError:
+                QtWidgets.QMessageBox.warning(self, "Erreur", "Ce véhicule est affecté à des trajets, il ne peut pas être supprimé."); return
 
     def open_form(self, vid=None):
         dlg = VehiculeFormDialog(self, vid)
-        if dlg.exec(): self.load_data()
+        dlg.exec()
+
+    def open_import(self):
+        # pandas n'est charge qu'a la premiere importation
+        from importer import import_dialog
+        import_dialog(self, "vehicules")
 
 
 class VehiculeFormDialog(QtWidgets.QDialog):
@@ -213,9 +272,8 @@ class VehiculeFormDialog(QtWidgets.QDialog):
         self.vtype.setEditable(True)
         self.vtype.addItems(["Bus", "Minibus", "Car", "Van", "Autre"])
         self.societe_cb = QtWidgets.QComboBox()
-        conn = get_connection()
-        socs = conn.execute("SELECT id,nom FROM societe").fetchall()
-        conn.close()
+        with read_connection() as conn:
+            socs = conn.execute("SELECT id,nom FROM societe").fetchall()
         for s in socs: self.societe_cb.addItem(s['nom'], s['id'])
         layout.addRow("Matricule *", self.matricule)
         layout.addRow("Nombre de places", self.nbre_place)
@@ -228,9 +286,8 @@ class VehiculeFormDialog(QtWidgets.QDialog):
         if vid: self._load(vid)
 
     def _load(self, vid):
-        conn = get_connection()
-        row = conn.execute("SELECT * FROM vehicule WHERE id=?", (vid,)).fetchone()
-        conn.close()
+        with read_connection() as conn:
+            row = conn.execute("SELECT * FROM vehicule WHERE id=?", (vid,)).fetchone()
         if row:
             self.matricule.setText(row['matricule'])
             self.nbre_place.setValue(row['nbre_place'] or 1)
@@ -244,14 +301,15 @@ class VehiculeFormDialog(QtWidgets.QDialog):
         mat = self.matricule.text().strip()
         if not mat:
             QtWidgets.QMessageBox.warning(self, "Erreur", "La matricule est obligatoire."); return
-        conn = get_connection()
         try:
-            if self.vid:
-                conn.execute("UPDATE vehicule SET matricule=?,nbre_place=?,type=?,societe_id=? WHERE id=?",
-                    (mat, self.nbre_place.value(), self.vtype.currentText(), self.societe_cb.currentData(), self.vid))
-            else:
-                conn.execute("INSERT INTO vehicule (matricule,nbre_place,type,societe_id) VALUES (?,?,?,?)",
-                    (mat, self.nbre_place.value(), self.vtype.currentText(), self.societe_cb.currentData()))
-            conn.commit(); conn.close(); self.accept()
+            with transaction() as conn:
+                if self.vid:
+                    conn.execute("UPDATE vehicule SET matricule=?,nbre_place=?,type=?,societe_id=? WHERE id=?",
+                        (mat, self.nbre_place.value(), self.vtype.currentText(), self.societe_cb.currentData(), self.vid))
+                    inventory.invalidate()
+                else:
+                    conn.execute("INSERT INTO vehicule (matricule,nbre_place,type,societe_id) VALUES (?,?,?,?)",
+                        (mat, self.nbre_place.value(), self.vtype.currentText(), self.societe_cb.currentData()))
+            self.accept()
         except Exception as e:
-            conn.close(); QtWidgets.QMessageBox.warning(self, "Erreur", str(e))
\ No newline at end of file
+            QtWidgets.QMessageBox.warning(self, "Erreur", str(e))
\ No newline at end of file
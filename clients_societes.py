@@ -1,6 +1,12 @@
+import sqlite3
 from PySide6 import QtWidgets
-from database import get_connection
-from styles import primary_btn, section_title, make_table
+import queries
+from database import read_connection, transaction, fts_match
+from styles import primary_btn, section_title, make_table, pager_bar, patch_table
+from pagination import KeysetPager
+from search import SearchController
+from events import bus
+from export import export_list
 
 
 class ClientsPage(QtWidgets.QWidget):
@@ -17,57 +23,96 @@ class ClientsPage(QtWidgets.QWidget):
         hdr = QtWidgets.QHBoxLayout()
         hdr.addWidget(section_title("👤 Clients"))
         hdr.addStretch()
+        btn_import = primary_btn("📥 Importer", "#ffffff", "#1a1f2e")
+        btn_import.clicked.connect(self.open_import)
+        hdr.addWidget(btn_import)
+        btn_export = primary_btn("⬇️ Exporter", "#ffffff", "#1a1f2e")
+        btn_export.clicked.connect(lambda: export_list(self, "clients", self.pager, self.table))
+        hdr.addWidget(btn_export)
         btn = primary_btn("+ Ajouter")
         btn.clicked.connect(self.open_form)
         hdr.addWidget(btn)
         layout.addLayout(hdr)
         self.search = QtWidgets.QLineEdit()
         self.search.setPlaceholderText("🔍 Rechercher...")
-        self.search.textChanged.connect(lambda t: self.load_data(t))
+        self.search.textChanged.connect(lambda t: self.searcher.submit(t))
         layout.addWidget(self.search)
         self.table = make_table(["ID", "Nom", "Prénom", "Téléphone", "Nb tickets", "Actions"])
         layout.addWidget(self.table)
+        self.pager = KeysetPager("clients.page", ["nom", "id"], ("", 0))
+        self.pager_bar = pager_bar(lambda: self._show(self.pager.previous_page()),
+                                   lambda: self._show(self.pager.next_page()))
+        layout.addWidget(self.pager_bar)
+        bus().changed.connect(self._on_change)
+        self.searcher = SearchController(lambda conn, text: self.pager.prepare(self._filter(text), conn=conn))
+        self.searcher.results_ready.connect(lambda text, res: self._show(self.pager.apply(res)))
+
+    def _filter(self, search):
+        return {"q": fts_match(search)}
+
+    def refresh(self):
+        self.load_data(self.search.text())
 
     def load_data(self, search=""):
-        conn = get_connection()
-        query = """SELECT c.id,c.nom,c.prenom,c.telephone,COUNT(tk.id) as nb_tickets
-                   FROM client c LEFT JOIN ticket tk ON c.id=tk.client_id"""
-        params = []
-        if search:
-            query += " WHERE c.nom LIKE ? OR c.prenom LIKE ? OR c.telephone LIKE ?"
-            s = f"%{search}%"
-            params = [s,s,s]
-        query += " GROUP BY c.id ORDER BY c.nom"
-        rows = conn.execute(query, params).fetchall()
-        conn.close()
+        self.pager.set_filter(self._filter(search))
+        self._show(self.pager.first())
+
+    def _show(self, rows):
+        self._rows = list(rows)
         self.table.setRowCount(len(rows))
         for i, row in enumerate(rows):
-            for j, val in enumerate(row):
-                self.table.setItem(i, j, QtWidgets.QTableWidgetItem(str(val) if val else "—"))
-            aw = QtWidgets.QWidget()
-            al = QtWidgets.QHBoxLayout(aw)
-            al.setContentsMargins(4,2,4,2)
-            be = QtWidgets.QPushButton("✏️")
-            be.setStyleSheet("background:#1f3a6e;color:#82a2f5;border:none;border-radius:4px;padding:4px 8px;")
-            bd = QtWidgets.QPushButton("🗑️")
-            bd.setStyleSheet("background:#3d1c1c;color:#f85149;border:none;border-radius:4px;padding:4px 8px;")
-            cid = row[0]
-            be.clicked.connect(lambda _, id=cid: self.open_form(id))
-            bd.clicked.connect(lambda _, id=cid: self.delete(id))
-            al.addWidget(be); al.addWidget(bd)
-            self.table.setCellWidget(i, 5, aw)
+            self._fill_row(i, row)
+        self.pager_bar.sync(self.pager)
+
+    def _fill_row(self, i, row):
+        for j, val in enumerate(row):
+            self.table.setItem(i, j, QtWidgets.QTableWidgetItem(str(val) if val else "—"))
+        aw = QtWidgets.QWidget()
+        al = QtWidgets.QHBoxLayout(aw)
+        al.setContentsMargins(4,2,4,2)
+        be = QtWidgets.QPushButton("✏️")
+        be.setStyleSheet("background:#1f3a6e;color:#82a2f5;border:none;border-radius:4px;padding:4px 8px;")
+        bd = QtWidgets.QPushButton("🗑️")
+        bd.setStyleSheet("background:#3d1c1c;color:#f85149;border:none;border-radius:4px;padding:4px 8px;")
+        cid = row[0]
+        be.clicked.connect(lambda _, id=cid: self.open_form(id))
+        bd.clicked.connect(lambda _, id=cid: self.delete(id))
+        al.addWidget(be); al.addWidget(bd)
+        self.table.setCellWidget(i, 5, aw)
+
+    def _on_change(self, table, op, rowid):
+        if table == "client" and op == "reload":
+            self.refresh()
+        elif table == "client":
+            patch_table(self.table, self._rows, self.pager.patch(self._rows, op, rowid), self._fill_row)
+            self.pager_bar.sync(self.pager)
+        elif table == "ticket" and op == "insert":
+            # seul le nombre de tickets du client concerne change
+            with read_connection() as conn:
+                ticket = queries.fetchone(conn, "tickets.client", (rowid,))
+            if ticket and any(r["id"] == ticket[0] for r in self._rows):
+                patch_table(self.table, self._rows, self.pager.patch(self._rows, "update", ticket[0]), self._fill_row)
+        elif table == "ticket" and op in ("delete", "reload"):
+            # le client du ticket supprime n'est plus connu
+            self.refresh()
 
     def delete(self, cid):
         reply = QtWidgets.QMessageBox.question(self, "Confirmation", "Supprimer ce client ?")
         if reply == QtWidgets.QMessageBox.Yes:
-            conn = get_connection()
-            conn.execute("DELETE FROM client WHERE id=?", (cid,))
-            conn.commit(); conn.close()
-            self.load_data()
+            try:
+                with transaction() as conn:
+                    conn.execute("DELETE FROM client WHERE id=?", (cid,))
+            except sqlite3.IntegrityError:
+                QtWidgets.QMessageBox.warning(self, "Erreur", "Ce client a des tickets, il ne peut pas être supprimé."); return
 
     def open_form(self, cid=None):
         dlg = ClientFormDialog(self, cid)
-        if dlg.exec(): self.load_data()
+        dlg.exec()
+
+    def open_import(self):
+        # pandas n'est charge qu'a la premiere importation
+        from importer import import_dialog
+        import_dialog(self, "clients")
 
 
 class ClientFormDialog(QtWidgets.QDialog):
@@ -92,9 +137,8 @@ class ClientFormDialog(QtWidgets.QDialog):
         if cid: self._load(cid)
 
     def _load(self, cid):
-        conn = get_connection()
-        row = conn.execute("SELECT * FROM client WHERE id=?", (cid,)).fetchone()
-        conn.close()
+        with read_connection() as conn:
+            row = conn.execute("SELECT * FROM client WHERE id=?", (cid,)).fetchone()
         if row:
             self.nom.setText(row['nom']); self.prenom.setText(row['prenom'])
             self.telephone.setText(row['telephone'] or "")
@@ -103,17 +147,17 @@ class ClientFormDialog(QtWidgets.QDialog):
         nom = self.nom.text().strip(); prenom = self.prenom.text().strip()
         if not nom or not prenom:
             QtWidgets.QMessageBox.warning(self, "Erreur", "Nom et prénom obligatoires."); return
-        conn = get_connection()
         try:
-            if self.cid:
-                conn.execute("UPDATE client SET nom=?,prenom=?,telephone=? WHERE id=?",
-                    (nom, prenom, self.telephone.text(), self.cid))
-            else:
-                conn.execute("INSERT INTO client (nom,prenom,telephone) VALUES (?,?,?)",
-                    (nom, prenom, self.telephone.text()))
-            conn.commit(); conn.close(); self.accept()
+            with transaction() as conn:
+                if self.cid:
+                    conn.execute("UPDATE client SET nom=?,prenom=?,telephone=? WHERE id=?",
+                        (nom, prenom, self.telephone.text(), self.cid))
+                else:
+                    conn.execute("INSERT INTO client (nom,prenom,telephone) VALUES (?,?,?)",
+                        (nom, prenom, self.telephone.text()))
+            self.accept()
         except Exception as e:
-            conn.close(); QtWidgets.QMessageBox.warning(self, "Erreur", str(e))
+            QtWidgets.QMessageBox.warning(self, "Erreur", str(e))
 
 
 
@@ -131,34 +175,57 @@ class SocietePage(QtWidgets.QWidget):
         hdr = QtWidgets.QHBoxLayout()
         hdr.addWidget(section_title("🏢 Sociétés"))
         hdr.addStretch()
+        btn_export = primary_btn("⬇️ Exporter", "#ffffff", "#1a1f2e")
+        btn_export.clicked.connect(lambda: export_list(self, "societes", self.pager, self.table))
+        hdr.addWidget(btn_export)
         btn = primary_btn("+ Ajouter")
         btn.clicked.connect(self.open_form)
         hdr.addWidget(btn)
         layout.addLayout(hdr)
         self.table = make_table(["ID", "Nom", "Téléphone", "Adresse", "Description", "Actions"])
         layout.addWidget(self.table)
+        self.pager = KeysetPager("societes.page", ["nom", "id"], ("", 0))
+        self.pager_bar = pager_bar(lambda: self._show(self.pager.previous_page()),
+                                   lambda: self._show(self.pager.next_page()))
+        layout.addWidget(self.pager_bar)
+        bus().changed.connect(self._on_change)
+
+    def refresh(self):
+        self.load_data()
 
     def load_data(self):
-        conn = get_connection()
-        rows = conn.execute("SELECT id,nom,telephone,adresse,description FROM societe").fetchall()
-        conn.close()
+        self._show(self.pager.first())
+
+    def _show(self, rows):
+        self._rows = list(rows)
         self.table.setRowCount(len(rows))
         for i, row in enumerate(rows):
-            for j, val in enumerate(row):
-                self.table.setItem(i, j, QtWidgets.QTableWidgetItem(str(val) if val else "—"))
-            aw = QtWidgets.QWidget()
-            al = QtWidgets.QHBoxLayout(aw)
-            al.setContentsMargins(4,2,4,2)
-            be = QtWidgets.QPushButton("✏️")
-            be.setStyleSheet("background:#1f3a6e;color:#82a2f5;border:none;border-radius:4px;padding:4px 8px;")
-            sid = row[0]
-            be.clicked.connect(lambda _, id=sid: self.open_form(id))
-            al.addWidget(be)
-            self.table.setCellWidget(i, 5, aw)
+            self._fill_row(i, row)
+        self.pager_bar.sync(self.pager)
+
+    def _fill_row(self, i, row):
+        for j, val in enumerate(row):
+            self.table.setItem(i, j, QtWidgets.QTableWidgetItem(str(val) if val else "—"))
+        aw = QtWidgets.QWidget()
+        al = QtWidgets.QHBoxLayout(aw)
+        al.setContentsMargins(4,2,4,2)
+        be = QtWidgets.QPushButton("✏️")
+        be.setStyleSheet("background:#1f3a6e;color:#82a2f5;border:none;border-radius:4px;padding:4px 8px;")
+        sid = row[0]
+        be.clicked.connect(lambda _, id=sid: self.open_form(id))
+        al.addWidget(be)
+        self.table.setCellWidget(i, 5, aw)
+
+    def _on_change(self, table, op, rowid):
+        if table == "societe" and op == "reload":
+            self.refresh()
+        elif table == "societe":
+            patch_table(self.table, self._rows, self.pager.patch(self._rows, op, rowid), self._fill_row)
+            self.pager_bar.sync(self.pager)
 
     def open_form(self, sid=None):
         dlg = SocieteFormDialog(self, sid)
-        if dlg.exec(): self.load_data()
+        dlg.exec()
 
 
 class SocieteFormDialog(QtWidgets.QDialog):
@@ -185,9 +252,8 @@ class SocieteFormDialog(QtWidgets.QDialog):
         if sid: self._load(sid)
 
     def _load(self, sid):
-        conn = get_connection()
-        row = conn.execute("SELECT * FROM societe WHERE id=?", (sid,)).fetchone()
-        conn.close()
+        with read_connection() as conn:
+            row = conn.execute("SELECT * FROM societe WHERE id=?", (sid,)).fetchone()
         if row:
             self.nom.setText(row['nom']); self.desc.setText(row['description'] or "")
             self.tel.setText(row['telephone'] or ""); self.adresse.setText(row['adresse'] or "")
@@ -196,11 +262,11 @@ class SocieteFormDialog(QtWidgets.QDialog):
         nom = self.nom.text().strip()
         if not nom:
             QtWidgets.QMessageBox.warning(self, "Erreur", "Le nom est obligatoire."); return
-        conn = get_connection()
-        if self.sid:
-            conn.execute("UPDATE societe SET nom=?,description=?,telephone=?,adresse=? WHERE id=?",
-                (nom, self.desc.text(), self.tel.text(), self.adresse.text(), self.sid))
-        else:
-            conn.execute("INSERT INTO societe (nom,description,telephone,adresse) VALUES (?,?,?,?)",
-                (nom, self.desc.text(), self.tel.text(), self.adresse.text()))
-        conn.commit(); conn.close(); self.accept()
\ No newline at end of file
+        with transaction() as conn:
+            if self.sid:
+                conn.execute("UPDATE societe SET nom=?,description=?,telephone=?,adresse=? WHERE id=?",
+                    (nom, self.desc.text(), self.tel.text(), self.adresse.text(), self.sid))
+            else:
+                conn.execute("INSERT INTO societe (nom,description,telephone,adresse) VALUES (?,?,?,?)",
+                    (nom, self.desc.text(), self.tel.text(), self.adresse.text()))
+        self.accept()
\ No newline at end of file
@@ -1,5 +1,29 @@
+import importlib
 from PySide6 import QtWidgets, QtGui, QtCore
 from styles import APP_STYLE
+from backend import backend
+
+# cle -> (module, classe, tables lues par la page en plus de celles qu'elle
+# suit en direct par events.bus) : un changement sur ces tables la fait recharger
+PAGES = {
+    "home": ("dashboard_home", "DashboardHome", ("ville",)),
+    "tickets": ("tickets", "TicketsPage", ("client", "trajet", "ville", "user")),
+    "trajets": ("trajets", "TrajetsPage", ("ville", "chauffeur", "vehicule")),
+    "clients": ("clients_societes", "ClientsPage", ()),
+    "chauffeurs": ("chauffeurs_vehicules", "ChauffeursPage", ("societe",)),
+    "vehicules": ("chauffeurs_vehicules", "VehiculesPage", ("societe",)),
+    "societes": ("clients_societes", "SocietePage", ()),
+    "users": ("users", "UsersPage", ("role",)),
+    "reports": ("reports", "ReportsPage", ("ticket", "trajet", "user", "societe", "ville", "chauffeur", "vehicule")),
+    "diagnostics": ("diagnostics", "DiagnosticsPage", ()),
+}
+# guichet relie a server.py : seules les pages de vente sont servies a distance
+REMOTE_PAGES = ("home", "tickets")
+# pages visibles seulement pour le role Admin
+ADMIN_PAGES = ("diagnostics",)
+
+def table_versions(tables):
+    return backend().table_versions(tables)
 
 class Dashboard(QtWidgets.QMainWindow):
     logout_requested = QtCore.Signal()
@@ -12,6 +36,7 @@ class Dashboard(QtWidgets.QMainWindow):
         self.setStyleSheet(APP_STYLE)
         self._pages = {}
         self._active_btn = None
+        self._active_key = None
         self._setup_ui()
 
     def _setup_ui(self):
@@ -60,10 +85,14 @@ class Dashboard(QtWidgets.QMainWindow):
             ("🚌", "Véhicules", "vehicules"),
             ("🏢", "Sociétés", "societes"),
             ("👥", "Utilisateurs", "users"),
+            ("📊", "Rapports", "reports"),
+            ("🩺", "Diagnostics", "diagnostics"),
         ]
 
         self._nav_buttons = {}
         for icon, label, key in nav_items:
+            if key not in self._page_keys():
+                continue
             btn = self._make_nav_btn(icon, label, key)
             self._nav_buttons[key] = btn
             nav_layout.addWidget(btn)
@@ -136,45 +165,58 @@ class Dashboard(QtWidgets.QMainWindow):
         return btn
 
     def _load_pages(self):
-        from dashboard_home import DashboardHome
-        from users import UsersPage
-        from trajets import TrajetsPage
-        from tickets import TicketsPage
-        from chauffeurs_vehicules import ChauffeursPage, VehiculesPage
-        from clients_societes import ClientsPage, SocietePage
-
-        pages = {
-            "home": DashboardHome(self.current_user),
-            "tickets": TicketsPage(self.current_user),
-            "trajets": TrajetsPage(self.current_user),
-            "clients": ClientsPage(self.current_user),
-            "chauffeurs": ChauffeursPage(self.current_user),
-            "vehicules": VehiculesPage(self.current_user),
-            "societes": SocietePage(self.current_user),
-            "users": UsersPage(self.current_user),
-        }
-        for key, page in pages.items():
+        # seules des pages vides sont posees ici : chaque page est construite
+        # (module importe, donnees chargees) au premier clic sur son bouton
+        for key in self._page_keys():
             scroll = QtWidgets.QScrollArea()
             scroll.setWidgetResizable(True)
-            scroll.setWidget(page)
+            placeholder = QtWidgets.QLabel("Chargement…")
+            placeholder.setAlignment(QtCore.Qt.AlignCenter)
+            placeholder.setStyleSheet("color:#6e7781;font-size:13px;")
+            scroll.setWidget(placeholder)
             self.stack.addWidget(scroll)
+            self._pages[key] = (None, scroll)
+        self._stamps = {}
+
+    def _page_keys(self):
+        keys = REMOTE_PAGES if backend().remote else tuple(PAGES)
+        if self.current_user.get("role_nom") != "Admin":
+            keys = tuple(key for key in keys if key not in ADMIN_PAGES)
+        return keys
+
+    def _page(self, key):
+        page, scroll = self._pages[key]
+        if page is None:
+            module, cls, tables = PAGES[key]
+            page = getattr(importlib.import_module(module), cls)(self.current_user)
+            scroll.setWidget(page)
             self._pages[key] = (page, scroll)
+            self._stamps[key] = table_versions(tables)
+        return page
 
     def _switch_page(self, key):
         if self._active_btn:
             self._active_btn.setChecked(False)
+            # la page quittee s'est rechargee elle-meme apres ses propres modifications
+            previous = self._active_key
+            if self._pages[previous][0] is not None:
+                self._stamps[previous] = table_versions(PAGES[previous][2])
         btn = self._nav_buttons.get(key)
         if btn:
             btn.setChecked(True)
             self._active_btn = btn
+            self._active_key = key
         if key in self._pages:
-            _, scroll = self._pages[key]
-            self.stack.setCurrentWidget(scroll)
-            if key == "home":
-                self._pages["home"][0].refresh()
+            built = self._pages[key][0] is not None
+            page = self._page(key)
+            self.stack.setCurrentWidget(self._pages[key][1])
+            # rechargee seulement si une de ses tables a change depuis
+            stamp = table_versions(PAGES[key][2])
+            if built and stamp != self._stamps.get(key):
+                page.refresh()
+                self._stamps[key] = stamp
 
     def refresh_page(self, key):
-        if key in self._pages:
-            page, _ = self._pages[key]
-            if hasattr(page, 'load_data'):
-                page.load_data()
\ No newline at end of file
+        if key in self._pages and self._pages[key][0] is not None:
+            self._pages[key][0].refresh()
+            self._stamps[key] = table_versions(PAGES[key][2])
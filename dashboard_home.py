@@ -1,13 +1,24 @@
 from PySide6 import QtWidgets, QtCore, QtGui
-from database import get_connection
+from backend import backend
 from styles import section_title
+from events import bus
 
 class DashboardHome(QtWidgets.QWidget):
     def __init__(self, current_user):
         super().__init__()
         self.current_user = current_user
+        self._refresh_timer = QtCore.QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.timeout.connect(self.refresh)
         self._setup_ui()
         self.refresh()
+        bus().changed.connect(self._on_change)
+
+    def _on_change(self, table, op, rowid):
+        # les compteurs viennent de la table stats (une ligne) : on relit une
+        # seule fois apres une serie de changements (vente groupee, import...)
+        if table in ("ticket", "trajet", "client", "chauffeur", "vehicule"):
+            self._refresh_timer.start(0)
 
     def _setup_ui(self):
         layout = QtWidgets.QVBoxLayout(self)
@@ -50,22 +61,15 @@ class DashboardHome(QtWidgets.QWidget):
             item = self.stats_layout.takeAt(0)
             if item.widget(): item.widget().deleteLater()
 
-        conn = get_connection()
-        nb_tickets = conn.execute("SELECT COUNT(*) FROM ticket WHERE statut='payé'").fetchone()[0]
-        total_rev = conn.execute("SELECT IFNULL(SUM(montant),0) FROM ticket WHERE statut='payé'").fetchone()[0]
-        nb_trajets = conn.execute("SELECT COUNT(*) FROM trajet").fetchone()[0]
-        nb_clients = conn.execute("SELECT COUNT(*) FROM client").fetchone()[0]
-        nb_chauffeurs = conn.execute("SELECT COUNT(*) FROM chauffeur").fetchone()[0]
-        nb_vehicules = conn.execute("SELECT COUNT(*) FROM vehicule").fetchone()[0]
-        conn.close()
+        counts = backend().fetchone("dashboard.counts")
 
         stats = [
-            ("🎫", "Tickets vendus", str(nb_tickets), "#fff", "#82a2f5"),
-            ("💰", "Recettes", f"{total_rev:.0f} FCFA", "#fff", "#82a2f5"),
-            ("🗺️", "Trajets", str(nb_trajets), "#fff", "#82a2f5"),
-            ("👤", "Clients", str(nb_clients), "#fff", "#82a2f5"),
-            ("🚗", "Chauffeurs", str(nb_chauffeurs), "#fff", "#82a2f5"),
-            ("🚌", "Véhicules", str(nb_vehicules), "#fff", "#82a2f5"),
+            ("🎫", "Tickets vendus", str(counts['nb_tickets']), "#fff", "#82a2f5"),
+            ("💰", "Recettes", f"{counts['recettes']:.0f} FCFA", "#fff", "#82a2f5"),
+            ("🗺️", "Trajets", str(counts['nb_trajets']), "#fff", "#82a2f5"),
+            ("👤", "Clients", str(counts['nb_clients']), "#fff", "#82a2f5"),
+            ("🚗", "Chauffeurs", str(counts['nb_chauffeurs']), "#fff", "#82a2f5"),
+            ("🚌", "Véhicules", str(counts['nb_vehicules']), "#fff", "#82a2f5"),
         ]
         for icon, label, value, bg, fg in stats:
             card = QtWidgets.QFrame()
@@ -94,18 +98,7 @@ class DashboardHome(QtWidgets.QWidget):
             self.stats_layout.addWidget(card)
 
     def _load_recent_tickets(self):
-        conn = get_connection()
-        rows = conn.execute("""
-            SELECT tk.id, cl.nom||' '||cl.prenom,
-                   vd.nom||' → '||va.nom, tk.montant, tk.date, tk.statut
-            FROM ticket tk
-            LEFT JOIN client cl ON tk.client_id=cl.id
-            LEFT JOIN trajet t ON tk.trajet_id=t.id
-            LEFT JOIN ville vd ON t.ville_depart_id=vd.id
-            LEFT JOIN ville va ON t.ville_arrivee_id=va.id
-            ORDER BY tk.id DESC LIMIT 10
-        """).fetchall()
-        conn.close()
+        rows = backend().fetchall("dashboard.recent_tickets")
         self.recent_table.setRowCount(len(rows))
         for i, row in enumerate(rows):
             for j, val in enumerate(row):
@@ -117,19 +110,7 @@ class DashboardHome(QtWidgets.QWidget):
                 self.recent_table.setItem(i, j, item)
 
     def _load_upcoming_trips(self):
-        conn = get_connection()
-        rows = conn.execute("""
-            SELECT vd.nom, va.nom, t.heure_depart, t.heure_arrivee,
-                   c.nom||' '||c.prenom, v.matricule
-            FROM trajet t
-            LEFT JOIN ville vd ON t.ville_depart_id=vd.id
-            LEFT JOIN ville va ON t.ville_arrivee_id=va.id
-            LEFT JOIN chauffeur c ON t.chauffeur_id=c.id
-            LEFT JOIN vehicule v ON t.vehicule_id=v.id
-            WHERE t.heure_depart >= datetime('now')
-            ORDER BY t.heure_depart ASC LIMIT 5
-        """).fetchall()
-        conn.close()
+        rows = backend().fetchall("dashboard.upcoming_trips")
         self.upcoming_table.setRowCount(len(rows))
         for i, row in enumerate(rows):
             for j, val in enumerate(row):
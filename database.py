@@ -1,142 +1,246 @@
 import sqlite3
-import hashlib
 import os
+import re
+import threading
+from contextlib import contextmanager
+from profiling import ProfiledConnection
+from migrations import migrate, schema_version, ensure_seat_index, LATEST
 
 DB_PATH = "gestransport.db"
-
-def get_connection():
-    conn = sqlite3.connect(DB_PATH)
+# requetes preparees gardees par connexion (les requetes de queries.QUERIES ont un texte fixe)
+STATEMENT_CACHE = 256
+
+# appliques une seule fois, a l'ouverture de chaque connexion
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA busy_timeout=5000",
+)
+
+# tables suivies par l'ecrivain : chaque commit qui les modifie incremente leur
+# version, les pages comparent ces versions pour savoir si elles sont perimees
+WATCHED_TABLES = ("role", "societe", "user", "ville", "vehicule", "chauffeur", "trajet", "client", "ticket")
+
+def _connect(path, **kwargs):
+    kwargs.setdefault("cached_statements", STATEMENT_CACHE)
+    # chaque requete est chronometree (profiling.py, page Diagnostics)
+    kwargs.setdefault("factory", ProfiledConnection)
+    conn = sqlite3.connect(path, **kwargs)
     conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
     return conn
 
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+def get_connection():
+    # connexion independante (init_db, outils) ; les pages passent par read_connection/transaction
+    return _connect(DB_PATH)
+
+
+class ConnectionManager:
+    # une connexion de lecture par thread, reutilisee, et un seul ecrivain
+    # partage entre les threads et serialise par un verrou. En WAL les lectures
+    # ne bloquent pas pendant qu'un guichet enregistre une vente.
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+        self._writer = None
+        self._pending = []
+        self._versions = {}
+        self._external = 0
+        self._data_version = None
+
+    def _open_writer(self):
+        conn = _connect(self.path, isolation_level=None, check_same_thread=False)
+        # triggers TEMP : propres a cette connexion, ils ne touchent pas au schema
+        conn.create_function("note_change", 3, lambda table, op, rowid: self._pending.append((table, op, rowid)))
+        # tables en ecriture de masse (transaction(bulk=...)) : pas de note par ligne
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS watch_paused (name TEXT PRIMARY KEY)")
+        for table in WATCHED_TABLES:
+            for op, ref in (("INSERT", "new"), ("UPDATE", "new"), ("DELETE", "old")):
+                conn.execute(f"""CREATE TEMP TRIGGER IF NOT EXISTS {table}_{op.lower()}_watch
+                                 AFTER {op} ON main.{table}
+                                 WHEN NOT EXISTS (SELECT 1 FROM temp.watch_paused WHERE name = '{table}')
+                                 BEGIN SELECT note_change('{table}', '{op.lower()}', {ref}.id); END""")
+        return conn
+
+    @contextmanager
+    def read(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.path)
+        yield conn
+
+    @contextmanager
+    def _paused(self, conn, tables):
+        # les lignes ecrites dans "tables" ne sont pas notees une a une : un seul
+        # changement (table, "reload", 0) est publie pour chacune
+        if not tables:
+            yield conn
+            return
+        conn.executemany("INSERT OR IGNORE INTO temp.watch_paused (name) VALUES (?)", [(t,) for t in tables])
+        try:
+            yield conn
+        finally:
+            conn.executemany("DELETE FROM temp.watch_paused WHERE name = ?", [(t,) for t in tables])
+        self._pending.extend((table, "reload", 0) for table in tables)
+
+    @contextmanager
+    def write(self, bulk=()):
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._open_writer()
+            conn = self._writer
+            if conn.in_transaction:
+                # transaction imbriquee : on reste dans celle de l'appelant
+                with self._paused(conn, bulk):
+                    yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                with self._paused(conn, bulk):
+                    yield conn
+                # un COMMIT qui echoue (base occupee, disque plein) laisse la
+                # transaction ouverte : on l'annule comme une erreur de l'appelant
+                conn.execute("COMMIT")
+            except BaseException:
+                # certaines erreurs ont deja annule la transaction
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                self._pending.clear()
+                raise
+            changes = list(self._pending)
+            self._pending.clear()
+            for table in {change[0] for change in changes}:
+                self._versions[table] = self._versions.get(table, 0) + 1
+        # publie apres le commit et hors du verrou : les lecteurs voient deja les lignes
+        if changes:
+            for listener in list(_listeners):
+                listener(changes)
+
+    @contextmanager
+    def savepoint(self, conn, name="op"):
+        # une operation dans une transaction plus large (lot de writequeue.py) :
+        # en cas d'erreur elle seule est annulee, et les changements qu'elle
+        # avait notes ne sont pas publies
+        mark = len(self._pending)
+        conn.execute(f"SAVEPOINT {name}")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {name}")
+            conn.execute(f"RELEASE {name}")
+            del self._pending[mark:]
+            raise
+        conn.execute(f"RELEASE {name}")
+
+    def versions(self, tables):
+        # "tampon" des tables donnees : il change des qu'une d'elles a ete modifiee.
+        # Les ecritures d'un autre processus (ou d'une autre connexion) ne passent
+        # pas par nos triggers : PRAGMA data_version de l'ecrivain les detecte et
+        # rend toutes les tables perimees.
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._open_writer()
+            data_version = self._writer.execute("PRAGMA data_version").fetchone()[0]
+            if self._data_version is not None and data_version != self._data_version:
+                self._external += 1
+            self._data_version = data_version
+            return (self._external,) + tuple(self._versions.get(table, 0) for table in tables)
+
+    def close(self):
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.execute("PRAGMA optimize")
+                self._writer.close()
+                self._writer = None
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def connections():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ConnectionManager(DB_PATH)
+        return _manager
+
+def read_connection():
+    return connections().read()
+
+def transaction(bulk=()):
+    # bulk = tables ecrites en masse (generation, import) : un seul changement
+    # "reload" par table au lieu d'un par ligne
+    return connections().write(bulk)
+
+def savepoint(conn, name="op"):
+    # a utiliser dans transaction()
+    return connections().savepoint(conn, name)
+
+_listeners = []
+
+def add_change_listener(listener):
+    # listener(changes) apres chaque commit, changes = [(table, op, rowid), ...]
+    # op vaut "insert", "update" ou "delete" ; appele dans le thread qui a ecrit
+    _listeners.append(listener)
+
+def remove_change_listener(listener):
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+def table_versions(tables):
+    return connections().versions(tables)
+
+def close_connections():
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.close()
+            _manager = None
 
 def init_db():
+    # renvoie les sieges vendus en double qui empechent l'index unique
+    # idx_ticket_siege (voir migrations.ensure_seat_index), [] sinon
     conn = get_connection()
+    # base a jour (cas de tous les lancements sauf le premier apres une mise a
+    # jour) : aucun DDL, une seule lecture de PRAGMA user_version
+    if schema_version(conn) < LATEST:
+        migrate(conn)
+    duplicates = ensure_seat_index(conn)
     c = conn.cursor()
 
-    c.executescript("""
-        CREATE TABLE IF NOT EXISTS role (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nom TEXT NOT NULL,
-            description TEXT
-        );
-
-        CREATE TABLE IF NOT EXISTS societe (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nom TEXT NOT NULL,
-            description TEXT,
-            telephone TEXT,
-            adresse TEXT
-        );
-
-        CREATE TABLE IF NOT EXISTS user (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nom TEXT NOT NULL,
-            prenom TEXT NOT NULL,
-            telephone TEXT,
-            date_naissance TEXT,
-            genre TEXT,
-            identifiant TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            role_id INTEGER,
-            societe_id INTEGER,
-            FOREIGN KEY (role_id) REFERENCES role(id),
-            FOREIGN KEY (societe_id) REFERENCES societe(id)
-        );
-
-        CREATE TABLE IF NOT EXISTS ville (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nom TEXT NOT NULL UNIQUE
-        );
-
-        CREATE TABLE IF NOT EXISTS vehicule (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            matricule TEXT NOT NULL UNIQUE,
-            nbre_place INTEGER,
-            type TEXT,
-            societe_id INTEGER,
-            FOREIGN KEY (societe_id) REFERENCES societe(id)
-        );
-
-        CREATE TABLE IF NOT EXISTS chauffeur (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nom TEXT NOT NULL,
-            prenom TEXT NOT NULL,
-            matricule TEXT UNIQUE,
-            permis TEXT,
-            date_embauche TEXT,
-            societe_id INTEGER,
-            FOREIGN KEY (societe_id) REFERENCES societe(id)
-        );
-
-        CREATE TABLE IF NOT EXISTS trajet (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            heure_depart TEXT,
-            heure_arrivee TEXT,
-            ville_depart_id INTEGER,
-            ville_arrivee_id INTEGER,
-            vehicule_id INTEGER,
-            chauffeur_id INTEGER,
-            prix REAL DEFAULT 0,
-            FOREIGN KEY (ville_depart_id) REFERENCES ville(id),
-            FOREIGN KEY (ville_arrivee_id) REFERENCES ville(id),
-            FOREIGN KEY (vehicule_id) REFERENCES vehicule(id),
-            FOREIGN KEY (chauffeur_id) REFERENCES chauffeur(id)
-        );
-
-        CREATE TABLE IF NOT EXISTS client (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nom TEXT NOT NULL,
-            prenom TEXT NOT NULL,
-            telephone TEXT
-        );
-
-        CREATE TABLE IF NOT EXISTS ticket (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date TEXT,
-            siege INTEGER,
-            montant REAL,
-            statut TEXT DEFAULT 'payé',
-            trajet_id INTEGER,
-            client_id INTEGER,
-            user_id INTEGER,
-            FOREIGN KEY (trajet_id) REFERENCES trajet(id),
-            FOREIGN KEY (client_id) REFERENCES client(id),
-            FOREIGN KEY (user_id) REFERENCES user(id)
-        );
-    """)
+    has_role, has_societe, has_user = c.execute("""
+        SELECT EXISTS(SELECT 1 FROM role), EXISTS(SELECT 1 FROM societe), EXISTS(SELECT 1 FROM user)
+    """).fetchone()
 
     # ici j'ai mis deux roles par defaut admin et agent
-    c.execute("SELECT COUNT(*) FROM role")
-    if c.fetchone()[0] == 0:
+    if not has_role:
         c.execute("INSERT INTO role (nom, description) VALUES ('Admin', 'Administrateur système')")
         c.execute("INSERT INTO role (nom, description) VALUES ('Agent', 'Agent de vente')")
 
-    c.execute("SELECT COUNT(*) FROM societe")
-    if c.fetchone()[0] == 0:
+    if not has_societe:
         c.execute("INSERT INTO societe (nom, description, telephone, adresse) VALUES ('Ma Société', 'Société principale', '', '')")
 
-    c.execute("SELECT COUNT(*) FROM user")
-    if c.fetchone()[0] == 0:
+    if not has_user:
+        from auth import hash_password
         c.execute("""INSERT INTO user (nom, prenom, identifiant, password, genre, role_id, societe_id)
                      VALUES ('Admin', 'Super', 'admin', ?, 'M', 1, 1)""",
                   (hash_password("admin123"),))
 
     conn.commit()
     conn.close()
+    return duplicates
 
-def authenticate(identifiant, password):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("""
-        SELECT u.*, r.nom as role_nom, s.nom as societe_nom
-        FROM user u
-        LEFT JOIN role r ON u.role_id = r.id
-        LEFT JOIN societe s ON u.societe_id = s.id
-        WHERE u.identifiant=? AND u.password=?
-    """, (identifiant, hash_password(password)))
-    user = c.fetchone()
-    conn.close()
-    return dict(user) if user else None
\ No newline at end of file
+def fts_match(text):
+    # "ouaga tra" -> '"ouaga"* "tra"*' : chaque mot est un prefixe, tous doivent correspondre
+    words = re.findall(r"\w+", text or "")
+    return " ".join(f'"{w}"*' for w in words) or None
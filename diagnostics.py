@@ -0,0 +1,134 @@
+from datetime import datetime
+from PySide6 import QtWidgets, QtCore
+import profiling
+from styles import primary_btn, section_title, make_table
+
+# page reservee aux administrateurs (dashboard.ADMIN_PAGES) : temps des
+# requetes SQL de ce poste depuis son lancement (profiling.py)
+STATS_SHOWN = 200
+STAT_HEADERS = ["Requête", "Appels", "Total (ms)", "Moy. (ms)", "p50", "p95", "p99", "Max (ms)"]
+SLOW_HEADERS = ["Date", "Durée (ms)", "Lignes", "Requête", "Tables lues en entier"]
+
+
+def _label(row):
+    return row["nom"] or (row["sql"][:120] + ("…" if len(row["sql"]) > 120 else ""))
+
+
+class DiagnosticsPage(QtWidgets.QWidget):
+    def __init__(self, current_user):
+        super().__init__()
+        self.current_user = current_user
+        self._slow = []
+        self._setup_ui()
+        self.refresh()
+
+    def _setup_ui(self):
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(30, 30, 30, 30)
+        layout.setSpacing(16)
+
+        hdr = QtWidgets.QHBoxLayout()
+        hdr.addWidget(section_title("🩺 Diagnostics SQL"))
+        hdr.addStretch()
+        btn_reset = primary_btn("🗑️ Remettre à zéro", "#ffffff", "#1a1f2e")
+        btn_reset.clicked.connect(self.reset)
+        hdr.addWidget(btn_reset)
+        btn_export = primary_btn("⬇️ Exporter JSON", "#ffffff", "#1a1f2e")
+        btn_export.clicked.connect(self.export)
+        hdr.addWidget(btn_export)
+        btn_refresh = primary_btn("🔄 Actualiser")
+        btn_refresh.clicked.connect(self.refresh)
+        hdr.addWidget(btn_refresh)
+        layout.addLayout(hdr)
+
+        opts = QtWidgets.QHBoxLayout()
+        opts.addWidget(QtWidgets.QLabel("Requête lente au-delà de"))
+        self.threshold = QtWidgets.QSpinBox()
+        self.threshold.setRange(1, 60000)
+        self.threshold.setSuffix(" ms")
+        self.threshold.setValue(profiling.SLOW_MS)
+        self.threshold.valueChanged.connect(self._set_threshold)
+        opts.addWidget(self.threshold)
+        opts.addStretch()
+        self.summary = QtWidgets.QLabel()
+        self.summary.setStyleSheet("color:#6e7781;font-size:12px;")
+        opts.addWidget(self.summary)
+        layout.addLayout(opts)
+
+        self.stats_table = make_table(STAT_HEADERS)
+        self.stats_table.verticalHeader().setDefaultSectionSize(30)
+        header = self.stats_table.horizontalHeader()
+        header.setSectionResizeMode(QtWidgets.QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        layout.addWidget(self.stats_table, 3)
+
+        layout.addWidget(section_title("🐢 Requêtes lentes"))
+        self.slow_table = make_table(SLOW_HEADERS)
+        self.slow_table.verticalHeader().setDefaultSectionSize(30)
+        header = self.slow_table.horizontalHeader()
+        header.setSectionResizeMode(QtWidgets.QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(3, QtWidgets.QHeaderView.Stretch)
+        self.slow_table.itemSelectionChanged.connect(self._show_plan)
+        layout.addWidget(self.slow_table, 2)
+
+        self.plan = QtWidgets.QPlainTextEdit()
+        self.plan.setReadOnly(True)
+        self.plan.setPlaceholderText("Sélectionner une requête lente pour voir son plan (EXPLAIN QUERY PLAN)")
+        self.plan.setStyleSheet("font-family:monospace;font-size:12px;background:#fff;color:#1a1f2e;")
+        layout.addWidget(self.plan, 1)
+
+    def _set_threshold(self, value):
+        profiling.SLOW_MS = value
+
+    def refresh(self):
+        stats = profiling.statistics()
+        self.summary.setText(f"{len(stats)} requête(s) distincte(s), "
+                             f"{sum(row['appels'] for row in stats)} exécution(s)")
+        stats = stats[:STATS_SHOWN]
+        self.stats_table.setRowCount(len(stats))
+        for i, row in enumerate(stats):
+            item = QtWidgets.QTableWidgetItem(_label(row))
+            item.setToolTip(row["sql"])
+            self.stats_table.setItem(i, 0, item)
+            for j, key in enumerate(("appels", "total_ms", "moyenne_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"), 1):
+                item = QtWidgets.QTableWidgetItem()
+                item.setData(QtCore.Qt.DisplayRole, row[key])
+                self.stats_table.setItem(i, j, item)
+
+        self._slow = profiling.slow_queries()
+        self.slow_table.setRowCount(len(self._slow))
+        for i, row in enumerate(self._slow):
+            values = [row["date"].replace("T", " "), row["ms"], row["lignes"], _label(row),
+                      ", ".join(row["scans"]) or "—"]
+            for j, val in enumerate(values):
+                item = QtWidgets.QTableWidgetItem()
+                item.setData(QtCore.Qt.DisplayRole, val)
+                if j == 3:
+                    item.setToolTip(row["sql"])
+                self.slow_table.setItem(i, j, item)
+        self.plan.clear()
+
+    def _show_plan(self):
+        rows = self.slow_table.selectionModel().selectedRows()
+        if not rows:
+            return
+        row = self._slow[rows[0].row()]
+        self.plan.setPlainText(row["sql"] + "\n\n" + "\n".join(row["plan"]))
+
+    def reset(self):
+        reply = QtWidgets.QMessageBox.question(self, "Confirmation", "Effacer les mesures de ce poste ?")
+        if reply == QtWidgets.QMessageBox.Yes:
+            profiling.reset()
+            self.refresh()
+
+    def export(self):
+        default = f"diagnostics_{datetime.now().strftime('%Y%m%d_%H%M')}.json"
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Exporter les diagnostics", default, "JSON (*.json)")
+        if not path:
+            return
+        try:
+            profiling.dump(path)
+        except OSError as e:
+            QtWidgets.QMessageBox.warning(self, "Erreur", f"Export impossible : {e}")
+            return
+        QtWidgets.QMessageBox.information(self, "Export", f"Diagnostics enregistrés dans {path}")
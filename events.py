@@ -0,0 +1,37 @@
+from PySide6 import QtCore
+from backend import backend
+
+# au-dela, un commit (import, grosse vente groupee) est publie comme un seul
+# changement (table, "reload", 0) : recharger la page coute moins que patcher
+# chaque ligne
+BULK_CHANGES = 200
+
+
+class ChangeBus(QtCore.QObject):
+    # une ligne modifiee en base : (table, "insert"|"update"|"delete", id).
+    # Alimente par les triggers TEMP de l'ecrivain (database.ConnectionManager),
+    # publie apres le commit, ou par le serveur pour un guichet distant. Un commit fait depuis un thread de travail arrive
+    # dans le thread de l'interface par connexion differee.
+    changed = QtCore.Signal(str, str, int)
+
+    def publish(self, changes):
+        counts = {}
+        for table, _, _ in changes:
+            counts[table] = counts.get(table, 0) + 1
+        for table in counts:
+            if counts[table] > BULK_CHANGES:
+                self.changed.emit(table, "reload", 0)
+        for table, op, rowid in changes:
+            if counts[table] <= BULK_CHANGES:
+                self.changed.emit(table, op, rowid)
+
+
+_bus = None
+
+def bus():
+    global _bus
+    if _bus is None:
+        _bus = ChangeBus()
+        # commits locaux, ou changements relayes par le serveur (backend.py)
+        backend().add_change_listener(_bus.publish)
+    return _bus
@@ -0,0 +1,135 @@
+import csv
+import os
+import threading
+from datetime import datetime
+from PySide6 import QtWidgets, QtCore
+import queries
+from database import read_connection
+
+# lignes lues puis ecrites par paquet : la liste n'est jamais entiere en memoire
+EXPORT_BATCH = 2000
+
+
+def write_csv(path, headers, batches, progress):
+    # ";" et BOM UTF-8 : Excel en francais ouvre le fichier directement
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(headers)
+        for rows in batches:
+            writer.writerows(rows)
+            if not progress(len(rows)):
+                return False
+    return True
+
+
+def write_xlsx(path, headers, batches, progress):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Export")
+    ws.append(headers)
+    for rows in batches:
+        for row in rows:
+            ws.append(tuple(row))
+        if not progress(len(rows)):
+            return False
+    wb.save(path)
+    return True
+
+WRITERS = {".csv": write_csv, ".xlsx": write_xlsx}
+
+
+class _ExportJob(QtCore.QRunnable):
+    def __init__(self, exporter, statement, params, headers, path):
+        super().__init__()
+        self.exporter = exporter
+        self.statement = statement
+        self.params = params
+        self.headers = headers
+        self.path = path
+
+    def run(self):
+        exp = self.exporter
+        written = 0
+
+        def progress(count):
+            nonlocal written
+            written += count
+            exp.progress.emit(written)
+            return not exp._cancel.is_set()
+
+        write = WRITERS[os.path.splitext(self.path)[1].lower()]
+        try:
+            with read_connection() as conn:
+                batches = queries.fetchmany(conn, self.statement, self.params, EXPORT_BATCH)
+                try:
+                    complete = write(self.path, self.headers, batches, progress)
+                finally:
+                    batches.close()
+        except Exception as e:
+            self._discard()
+            exp._finished.emit(written, str(e))
+            return
+        if not complete:
+            self._discard()
+            written = -1
+        exp._finished.emit(written, "")
+
+    def _discard(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Exporter(QtCore.QObject):
+    # export d'une liste (requete "<nom>.page" du registre, filtre courant, sans
+    # limite) vers CSV ou XLSX dans un thread du pool, avec progression et annulation
+    progress = QtCore.Signal(int)
+    finished = QtCore.Signal(int, str)
+    _finished = QtCore.Signal(int, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._cancel = threading.Event()
+        self._finished.connect(self.finished.emit)
+
+    def start(self, statement, params, headers, path):
+        self._cancel.clear()
+        QtCore.QThreadPool.globalInstance().start(_ExportJob(self, statement, params, headers, path))
+
+    def cancel(self):
+        self._cancel.set()
+
+
+def list_headers(view):
+    model = view.model()
+    headers = [model.headerData(i, QtCore.Qt.Horizontal) for i in range(model.columnCount())]
+    return [h for h in headers if h != "Actions"]
+
+
+def export_list(parent, name, pager, view):
+    # bouton "Exporter" des pages de liste : ce que montre la page (meme requete,
+    # meme filtre), mais toutes les pages
+    default = f"{name}_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
+    path, _ = QtWidgets.QFileDialog.getSaveFileName(
+        parent, "Exporter la liste", default, "CSV (*.csv);;Excel (*.xlsx)")
+    if not path:
+        return
+    if os.path.splitext(path)[1].lower() not in WRITERS:
+        path += ".csv"
+
+    dlg = QtWidgets.QProgressDialog("Export en cours…", "Annuler", 0, 0, parent)
+    dlg.setWindowTitle("Export")
+    dlg.setWindowModality(QtCore.Qt.WindowModal)
+    dlg.setMinimumDuration(300)
+    exporter = Exporter(dlg)
+    exporter.progress.connect(lambda n: dlg.setLabelText(f"{n} ligne(s) exportée(s)…"))
+    dlg.canceled.connect(exporter.cancel)
+
+    def done(written, error):
+        dlg.reset()
+        dlg.deleteLater()
+        if error:
+            QtWidgets.QMessageBox.warning(parent, "Erreur", f"Export impossible : {error}")
+        elif written >= 0:
+            QtWidgets.QMessageBox.information(parent, "Export", f"{written} ligne(s) exportée(s) dans\n{path}")
+    exporter.finished.connect(done)
+    exporter.start(pager.statement, pager.export_params(), list_headers(view), path)
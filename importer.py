@@ -0,0 +1,345 @@
+import csv
+import os
+import re
+import threading
+import unicodedata
+import pandas as pd
+from PySide6 import QtWidgets, QtCore
+from database import read_connection, transaction
+
+# lignes lues, validees et inserees par paquet, une transaction par paquet
+IMPORT_CHUNK = 10_000
+
+# en-tetes acceptes (minuscules, sans accents) -> colonne
+ALIASES = {
+    "tel": "telephone", "phone": "telephone", "contact": "telephone",
+    "ville_depart": "depart", "arrivee_ville": "arrivee", "ville_arrivee": "arrivee",
+    "h_depart": "heure_depart", "depart_le": "heure_depart", "date_depart": "heure_depart",
+    "h_arrivee": "heure_arrivee", "date_arrivee": "heure_arrivee",
+    "places": "nbre_place", "nb_places": "nbre_place", "nbre_places": "nbre_place",
+    "immatriculation": "matricule", "montant": "prix", "prix_fcfa": "prix",
+    "vehicule_matricule": "vehicule", "chauffeur_matricule": "chauffeur",
+}
+
+
+def _column(header):
+    text = unicodedata.normalize("NFKD", str(header or "")).encode("ascii", "ignore").decode()
+    name = re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+    return ALIASES.get(name, name)
+
+
+def _key(text):
+    return text.strip().casefold()
+
+
+def read_chunks(path, size=IMPORT_CHUNK):
+    # paquets de lignes en DataFrame de textes, avec "_ligne" = numero de la
+    # ligne dans le fichier (l'en-tete est la ligne 1)
+    line = 2
+    if os.path.splitext(path)[1].lower() == ".xlsx":
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            headers = [_column(h) for h in next(rows, ())]
+            batch = []
+            for row in rows:
+                batch.append(row[:len(headers)])
+                if len(batch) == size:
+                    yield _frame(batch, headers, line)
+                    line += len(batch)
+                    batch = []
+            if batch:
+                yield _frame(batch, headers, line)
+        finally:
+            wb.close()
+        return
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+    try:
+        sep = csv.Sniffer().sniff(sample, ";,\t").delimiter
+    except csv.Error:
+        sep = ","
+    for chunk in pd.read_csv(path, sep=sep, dtype=str, keep_default_na=False, encoding="utf-8-sig",
+                             skip_blank_lines=False, chunksize=size):
+        chunk.columns = [_column(c) for c in chunk.columns]
+        chunk["_ligne"] = range(line, line + len(chunk))
+        line += len(chunk)
+        yield chunk
+
+
+def _frame(batch, headers, line):
+    df = pd.DataFrame.from_records(batch, columns=headers).astype(object)
+    df = df.where(df.notna(), "").astype(str)
+    df["_ligne"] = range(line, line + len(df))
+    return df
+
+
+class _Import:
+    # une importation : verifier les colonnes, puis pour chaque paquet
+    # check(df, conn) -> (lignes a inserer, erreurs [(ligne, message)])
+    title = ""
+    required = ()
+    optional = ()
+    insert = ""
+    # tables ecrites : un seul changement "reload" par paquet (transaction(bulk=...))
+    tables = ()
+
+    def __init__(self, conn):
+        self.duplicates = 0
+
+    def columns(self, df):
+        missing = [c for c in self.required if c not in df.columns]
+        if missing:
+            raise ValueError(f"Colonne(s) manquante(s) : {', '.join(missing)}")
+        for col in self.optional:
+            if col not in df.columns:
+                df[col] = ""
+        for col in self.required + self.optional:
+            df[col] = df[col].str.strip()
+        return df
+
+    def _split(self, df, bad, message, errors):
+        # retire les lignes "bad" (masque) de df et les ajoute aux erreurs
+        errors.extend((ligne, message) for ligne in df.loc[bad, "_ligne"])
+        return df[~bad]
+
+    def _required(self, df, errors):
+        blank = (df[list(self.required) + list(self.optional)] == "").all(axis=1)
+        df = df[~blank]
+        for col in self.required:
+            df = self._split(df, df[col] == "", f"{col} manquant", errors)
+        return df
+
+    @staticmethod
+    def _values(col, index, cast=None):
+        # valeurs de col pour les lignes gardees, None pour les vides
+        return [None if pd.isna(v) or v == "" else (cast(v) if cast else v) for v in col.loc[index]]
+
+    def _dedupe(self, df, keys, known):
+        # doublons avec la base ou plus haut dans le fichier ; "known" est un
+        # ensemble de cles (hash) charge une fois, complete au fil de l'import
+        seen = keys.isin(known) | keys.duplicated()
+        empty = keys == ""
+        seen &= ~empty
+        self.duplicates += int(seen.sum())
+        known.update(keys[~seen & ~empty])
+        return df[~seen]
+
+
+class ClientImport(_Import):
+    title = "clients"
+    required = ("nom", "prenom")
+    optional = ("telephone",)
+    insert = "INSERT INTO client (nom, prenom, telephone) VALUES (?, ?, ?)"
+    tables = ("client",)
+
+    def __init__(self, conn):
+        super().__init__(conn)
+        phones = pd.Series([r[0] for r in conn.execute(
+            "SELECT telephone FROM client WHERE telephone IS NOT NULL AND telephone != ''")], dtype=str)
+        self.phones = set(self._phone(phones))
+
+    @staticmethod
+    def _phone(col):
+        return col.str.replace(r"\D", "", regex=True).str.lstrip("0")
+
+    def check(self, df, conn):
+        errors = []
+        df = self._required(df, errors)
+        df = self._dedupe(df, self._phone(df["telephone"]), self.phones)
+        idx = df.index
+        return list(zip(df["nom"], df["prenom"], self._values(df["telephone"], idx))), errors
+
+
+class VehiculeImport(_Import):
+    title = "véhicules"
+    required = ("matricule",)
+    optional = ("nbre_place", "type", "societe")
+    insert = "INSERT INTO vehicule (matricule, nbre_place, type, societe_id) VALUES (?, ?, ?, ?)"
+    tables = ("vehicule",)
+
+    def __init__(self, conn):
+        super().__init__(conn)
+        self.matricules = {m.upper() for m, in conn.execute("SELECT matricule FROM vehicule")}
+        self.societes = {_key(nom): sid for sid, nom in conn.execute("SELECT id, nom FROM societe")}
+
+    def check(self, df, conn):
+        errors = []
+        df = self._required(df, errors)
+        df = self._dedupe(df, df["matricule"].str.upper(), self.matricules)
+        places = pd.to_numeric(df["nbre_place"].replace("", None), errors="coerce")
+        df = self._split(df, (df["nbre_place"] != "") & ~(places > 0), "nombre de places invalide", errors)
+        societe = df["societe"].map(lambda s: self.societes.get(_key(s)) if s else None)
+        df = self._split(df, (df["societe"] != "") & societe.isna(), "société inconnue", errors)
+        idx = df.index
+        rows = zip(df["matricule"], self._values(places, idx, int),
+                   self._values(df["type"], idx), self._values(societe, idx, int))
+        return list(rows), errors
+
+
+class TrajetImport(_Import):
+    title = "trajets"
+    required = ("depart", "arrivee", "heure_depart")
+    optional = ("heure_arrivee", "prix", "vehicule", "chauffeur")
+    insert = """INSERT INTO trajet (ville_depart_id, ville_arrivee_id, heure_depart, heure_arrivee,
+                                    vehicule_id, chauffeur_id, prix) VALUES (?, ?, ?, ?, ?, ?, ?)"""
+    tables = ("trajet", "ville")
+
+    def __init__(self, conn):
+        super().__init__(conn)
+        # dictionnaire des villes charge une fois ; les villes inconnues sont
+        # creees en une fois par paquet (villes_creees)
+        self.villes = {_key(nom): vid for vid, nom in conn.execute("SELECT id, nom FROM ville")}
+        self.vehicules = {m.upper(): vid for vid, m in conn.execute("SELECT id, matricule FROM vehicule")}
+        self.chauffeurs = {m.upper(): cid for cid, m in conn.execute(
+            "SELECT id, matricule FROM chauffeur WHERE matricule IS NOT NULL")}
+        self.trajets = {k for k, in conn.execute(
+            "SELECT ville_depart_id||'|'||ville_arrivee_id||'|'||heure_depart FROM trajet")}
+        self.villes_creees = 0
+
+    def _villes(self, names, conn):
+        new = {}
+        for name in names:
+            if name and _key(name) not in self.villes:
+                new.setdefault(_key(name), name)
+        if new:
+            conn.executemany("INSERT OR IGNORE INTO ville (nom) VALUES (?)", [(n,) for n in new.values()])
+            marks = ",".join("?" * len(new))
+            for vid, nom in conn.execute(f"SELECT id, nom FROM ville WHERE nom IN ({marks})", list(new.values())):
+                self.villes[_key(nom)] = vid
+            self.villes_creees += len(new)
+
+    @staticmethod
+    def _dates(col):
+        parsed = pd.to_datetime(col.replace("", None), errors="coerce", dayfirst=True, format="mixed")
+        return parsed.dt.strftime("%Y-%m-%d %H:%M")
+
+    def check(self, df, conn):
+        errors = []
+        df = self._required(df, errors)
+        depart = self._dates(df["heure_depart"])
+        df = self._split(df, depart.isna(), "heure de départ invalide", errors)
+        arrivee = self._dates(df["heure_arrivee"])
+        df = self._split(df, (df["heure_arrivee"] != "") & arrivee.isna(), "heure d'arrivée invalide", errors)
+        prix = pd.to_numeric(df["prix"].replace("", "0"), errors="coerce")
+        df = self._split(df, prix.isna() | (prix < 0), "prix invalide", errors)
+        vehicule = df["vehicule"].str.upper().map(self.vehicules)
+        df = self._split(df, (df["vehicule"] != "") & vehicule.isna(), "véhicule inconnu", errors)
+        chauffeur = df["chauffeur"].str.upper().map(self.chauffeurs)
+        df = self._split(df, (df["chauffeur"] != "") & chauffeur.isna(), "chauffeur inconnu", errors)
+
+        self._villes(pd.concat([df["depart"], df["arrivee"]]).unique(), conn)
+        vd = df["depart"].map(lambda n: self.villes[_key(n)])
+        va = df["arrivee"].map(lambda n: self.villes[_key(n)])
+        keys = vd.astype(str) + "|" + va.astype(str) + "|" + depart.loc[df.index]
+        df = self._dedupe(df, keys, self.trajets)
+        idx = df.index
+        rows = zip(self._values(vd, idx, int), self._values(va, idx, int), self._values(depart, idx),
+                   self._values(arrivee, idx), self._values(vehicule, idx, int),
+                   self._values(chauffeur, idx, int), self._values(prix, idx, float))
+        return list(rows), errors
+
+
+IMPORTS = {"clients": ClientImport, "vehicules": VehiculeImport, "trajets": TrajetImport}
+
+
+def import_file(kind, path, progress=None, cancelled=None):
+    # renvoie {"lus", "importes", "doublons", "erreurs": [(ligne, message)], "rapport"}
+    with read_connection() as conn:
+        job = IMPORTS[kind](conn)
+    result = {"lus": 0, "importes": 0, "doublons": 0, "erreurs": [], "rapport": None}
+    for df in read_chunks(path):
+        if cancelled and cancelled():
+            break
+        df = job.columns(df)
+        with transaction(bulk=job.tables) as conn:
+            rows, errors = job.check(df, conn)
+            conn.executemany(job.insert, rows)
+        result["lus"] += len(df)
+        result["importes"] += len(rows)
+        result["erreurs"].extend(errors)
+        if progress:
+            progress(result["lus"], result["importes"])
+    result["doublons"] = job.duplicates
+    result["villes"] = getattr(job, "villes_creees", 0)
+    if result["erreurs"]:
+        result["rapport"] = write_report(path, result["erreurs"])
+    return result
+
+
+def write_report(path, errors):
+    report = os.path.splitext(path)[0] + "_erreurs.csv"
+    with open(report, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(["Ligne", "Erreur"])
+        writer.writerows(sorted(errors))
+    return report
+
+
+class _ImportJob(QtCore.QRunnable):
+    def __init__(self, importer, kind, path):
+        super().__init__()
+        self.importer = importer
+        self.kind = kind
+        self.path = path
+
+    def run(self):
+        imp = self.importer
+        try:
+            result = import_file(self.kind, self.path, imp.progress.emit, imp._cancel.is_set)
+        except Exception as e:
+            imp._finished.emit(None, str(e))
+            return
+        imp._finished.emit(result, "")
+
+
+class Importer(QtCore.QObject):
+    # importation dans un thread du pool ; les pages se mettent a jour par
+    # events.bus (un commit de plus de BULK_CHANGES lignes = "reload")
+    progress = QtCore.Signal(int, int)
+    finished = QtCore.Signal(object, str)
+    _finished = QtCore.Signal(object, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._cancel = threading.Event()
+        self._finished.connect(self.finished.emit)
+
+    def start(self, kind, path):
+        self._cancel.clear()
+        QtCore.QThreadPool.globalInstance().start(_ImportJob(self, kind, path))
+
+    def cancel(self):
+        self._cancel.set()
+
+
+def import_dialog(parent, kind):
+    # bouton "Importer" des pages clients, trajets et vehicules
+    path, _ = QtWidgets.QFileDialog.getOpenFileName(
+        parent, f"Importer des {IMPORTS[kind].title}", "", "Tableur (*.csv *.xlsx)")
+    if not path:
+        return
+    dlg = QtWidgets.QProgressDialog("Import en cours…", "Annuler", 0, 0, parent)
+    dlg.setWindowTitle("Import")
+    dlg.setWindowModality(QtCore.Qt.WindowModal)
+    dlg.setMinimumDuration(300)
+    importer = Importer(dlg)
+    importer.progress.connect(lambda lus, ok: dlg.setLabelText(f"{lus} ligne(s) lue(s), {ok} importée(s)…"))
+    dlg.canceled.connect(importer.cancel)
+
+    def done(result, error):
+        dlg.reset()
+        dlg.deleteLater()
+        if error:
+            QtWidgets.QMessageBox.warning(parent, "Erreur", f"Import impossible : {error}")
+            return
+        text = (f"{result['importes']} {IMPORTS[kind].title} importé(s) sur {result['lus']} ligne(s).\n"
+                f"{result['doublons']} doublon(s) ignoré(s), {len(result['erreurs'])} ligne(s) en erreur.")
+        if result["villes"]:
+            text += f"\n{result['villes']} ville(s) ajoutée(s)."
+        if result["rapport"]:
+            text += f"\n\nRapport des erreurs :\n{result['rapport']}"
+        QtWidgets.QMessageBox.information(parent, "Import", text)
+    importer.finished.connect(done)
+    importer.start(kind, path)
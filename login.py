@@ -1,8 +1,9 @@
 from PySide6 import QtWidgets, QtGui, QtCore
-from database import authenticate
+from auth import AuthWorker
 
 class LoginWindow(QtWidgets.QWidget):
     login_success = QtCore.Signal(dict)
+    _auth_done = QtCore.Signal(object, str)
 
     def __init__(self):
         super().__init__()
@@ -16,6 +17,7 @@ class LoginWindow(QtWidgets.QWidget):
             }
         """)
         self._setup_ui()
+        self._auth_done.connect(self._on_auth_done)
 
     def _setup_ui(self):
         layout = QtWidgets.QVBoxLayout(self)
@@ -62,7 +64,7 @@ class LoginWindow(QtWidgets.QWidget):
         self.error_lbl.setAlignment(QtCore.Qt.AlignCenter)
         card_layout.addWidget(self.error_lbl)
 
-        btn = QtWidgets.QPushButton("Se connecter")
+        self.btn_login = btn = QtWidgets.QPushButton("Se connecter")
         btn.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
         btn.setStyleSheet("""
             QPushButton {
@@ -121,9 +123,21 @@ class LoginWindow(QtWidgets.QWidget):
         if not ident or not pw:
             self.error_lbl.setText("Veuillez remplir tous les champs.")
             return
-        user = authenticate(ident, pw)
+        # le hachage prend une fraction de seconde : hors du thread de l'interface
+        self._set_busy(True)
+        self.error_lbl.setText("Connexion…")
+        QtCore.QThreadPool.globalInstance().start(AuthWorker(ident, pw, self._auth_done))
+
+    def _set_busy(self, busy):
+        for w in (self.field_id, self.field_pw, self.btn_login):
+            w.setEnabled(not busy)
+
+    def _on_auth_done(self, user, error):
+        self._set_busy(False)
         if user:
+            self.error_lbl.setText("")
             self.login_success.emit(user)
         else:
-            self.error_lbl.setText("Identifiant ou mot de passe incorrect.")
-            self.field_pw.clear()
\ No newline at end of file
+            self.error_lbl.setText(error or "Identifiant ou mot de passe incorrect.")
+            self.field_pw.clear()
+            self.field_pw.setFocus()
@@ -1,28 +1,77 @@
-
 import sys
 import os
+import time
+START = time.perf_counter()
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
-from PySide6 import QtWidgets, QtGui
-from database import init_db
+# seul le necessaire a l'ecran de connexion est importe ici : le tableau de
+# bord et ses pages sont importes apres la connexion
+from PySide6 import QtWidgets, QtCore
+from database import init_db, close_connections
+from backend import backend, use_server
 from login import LoginWindow
-from dashboard import Dashboard
 from styles import APP_STYLE
 
 
+class StartupProfiler(QtCore.QObject):
+    # --profile-startup : duree de chaque phase du lancement, sur stderr
+    def __init__(self, start):
+        super().__init__()
+        self._last = start
+        self.phases = []
+
+    def mark(self, label):
+        now = time.perf_counter()
+        self.phases.append((label, now - self._last))
+        self._last = now
+
+    def restart(self):
+        self._last = time.perf_counter()
+        self.phases = []
+
+    def until_first_paint(self, widget, label):
+        self._paint_label = label
+        widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QtCore.QEvent.Paint:
+            obj.removeEventFilter(self)
+            self.mark(self._paint_label)
+            self.report()
+        return False
+
+    def report(self):
+        for label, elapsed in self.phases:
+            print(f"{label:<34}{elapsed * 1000:9.1f} ms", file=sys.stderr)
+        total = sum(elapsed for _, elapsed in self.phases)
+        print(f"{'total':<34}{total * 1000:9.1f} ms", file=sys.stderr)
+
+
 class AppController:
-    def __init__(self):
+    def __init__(self, profiler=None):
+        self.profiler = profiler
         self.app = QtWidgets.QApplication(sys.argv)
         self.app.setApplicationName("GestTransport")
         self.app.setStyle("Fusion")
         self.app.setStyleSheet(APP_STYLE)
+        self._mark("QApplication")
 
-        # Initialize DB
-        init_db()
+        # Initialize DB (un guichet relie au serveur n'a pas de base locale)
+        if not backend().remote:
+            duplicates = init_db()
+            if duplicates:
+                from migrations import describe_duplicates
+                QtWidgets.QMessageBox.warning(None, "Base de données", describe_duplicates(duplicates))
+        self.app.aboutToQuit.connect(close_connections)
+        self._mark("base de données")
 
         self.login_win = None
         self.dashboard = None
 
+    def _mark(self, label):
+        if self.profiler:
+            self.profiler.mark(label)
+
     def start(self):
         self._show_login()
         sys.exit(self.app.exec())
@@ -30,19 +79,41 @@ class AppController:
     def _show_login(self):
         self.login_win = LoginWindow()
         self.login_win.login_success.connect(self._on_login)
+        if self.profiler:
+            self._mark("fenêtre de connexion")
+            self.profiler.until_first_paint(self.login_win, "premier affichage")
         self.login_win.show()
 
     def _on_login(self, user):
+        if self.profiler:
+            self.profiler.restart()
+        from dashboard import Dashboard
+        self._mark("import du tableau de bord")
         self.login_win.close()
         self.dashboard = Dashboard(user)
         self.dashboard.logout_requested.connect(self._on_logout)
+        if self.profiler:
+            self._mark("construction du tableau de bord")
+            self.profiler.until_first_paint(self.dashboard, "premier affichage")
         self.dashboard.showMaximized()
 
     def _on_logout(self):
         self.dashboard.close()
+        # detruit les pages : elles ne suivent plus events.bus
+        self.dashboard.deleteLater()
         self._show_login()
 
 
 if __name__ == "__main__":
-    controller = AppController()
-    controller.start()
\ No newline at end of file
+    profiler = None
+    if "--server" in sys.argv:
+        # --server http://hote:8765 : guichet relie a server.py
+        i = sys.argv.index("--server")
+        use_server(sys.argv[i + 1])
+        del sys.argv[i:i + 2]
+    if "--profile-startup" in sys.argv:
+        sys.argv.remove("--profile-startup")
+        profiler = StartupProfiler(START)
+        profiler.mark("imports")
+    controller = AppController(profiler)
+    controller.start()
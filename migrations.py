@@ -0,0 +1,391 @@
+# migrations du schema : PRAGMA user_version contient le numero de la derniere
+# etape appliquee, init_db() joue les etapes manquantes dans l'ordre.
+# Chaque etape est un script SQL, ou une fonction(conn) qui renvoie le script,
+# execute dans sa propre transaction avec la mise a jour de user_version.
+
+import sqlite3
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS role (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nom TEXT NOT NULL,
+        description TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS societe (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nom TEXT NOT NULL,
+        description TEXT,
+        telephone TEXT,
+        adresse TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS user (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nom TEXT NOT NULL,
+        prenom TEXT NOT NULL,
+        telephone TEXT,
+        date_naissance TEXT,
+        genre TEXT,
+        identifiant TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        role_id INTEGER,
+        societe_id INTEGER,
+        FOREIGN KEY (role_id) REFERENCES role(id),
+        FOREIGN KEY (societe_id) REFERENCES societe(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS ville (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nom TEXT NOT NULL UNIQUE
+    );
+
+    CREATE TABLE IF NOT EXISTS vehicule (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        matricule TEXT NOT NULL UNIQUE,
+        nbre_place INTEGER,
+        type TEXT,
+        societe_id INTEGER,
+        FOREIGN KEY (societe_id) REFERENCES societe(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS chauffeur (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nom TEXT NOT NULL,
+        prenom TEXT NOT NULL,
+        matricule TEXT UNIQUE,
+        permis TEXT,
+        date_embauche TEXT,
+        societe_id INTEGER,
+        FOREIGN KEY (societe_id) REFERENCES societe(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS trajet (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        heure_depart TEXT,
+        heure_arrivee TEXT,
+        ville_depart_id INTEGER,
+        ville_arrivee_id INTEGER,
+        vehicule_id INTEGER,
+        chauffeur_id INTEGER,
+        prix REAL DEFAULT 0,
+        FOREIGN KEY (ville_depart_id) REFERENCES ville(id),
+        FOREIGN KEY (ville_arrivee_id) REFERENCES ville(id),
+        FOREIGN KEY (vehicule_id) REFERENCES vehicule(id),
+        FOREIGN KEY (chauffeur_id) REFERENCES chauffeur(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS client (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nom TEXT NOT NULL,
+        prenom TEXT NOT NULL,
+        telephone TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS ticket (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT,
+        siege INTEGER,
+        montant REAL,
+        statut TEXT DEFAULT 'payé',
+        trajet_id INTEGER,
+        client_id INTEGER,
+        user_id INTEGER,
+        FOREIGN KEY (trajet_id) REFERENCES trajet(id),
+        FOREIGN KEY (client_id) REFERENCES client(id),
+        FOREIGN KEY (user_id) REFERENCES user(id)
+    );
+"""
+
+# index plein texte (FTS5) utilises par les recherches des pages, tenus a jour par triggers
+FTS_TABLES = {
+    "client": ("nom", "prenom", "telephone"),
+    "ville": ("nom",),
+    "chauffeur": ("nom", "prenom", "matricule"),
+    "vehicule": ("matricule", "type"),
+    "user": ("nom", "prenom", "identifiant"),
+}
+
+
+def fts_schema(conn):
+    existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    script = []
+    for table, cols in FTS_TABLES.items():
+        fts = f"{table}_fts"
+        col_list = ", ".join(cols)
+        new_vals = ", ".join(f"new.{col}" for col in cols)
+        old_vals = ", ".join(f"old.{col}" for col in cols)
+        script.append(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {col_list}, content='{table}', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            );
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});
+                INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals});
+            END;
+        """)
+        if fts not in existing:
+            script.append(f"INSERT INTO {fts}({fts}) VALUES ('rebuild');")
+    return "\n".join(script)
+
+
+INDEXES = """
+    CREATE INDEX IF NOT EXISTS idx_ticket_trajet ON ticket(trajet_id);
+    CREATE INDEX IF NOT EXISTS idx_ticket_client ON ticket(client_id);
+    CREATE INDEX IF NOT EXISTS idx_ticket_user ON ticket(user_id);
+    -- couvre les COUNT/SUM du tableau de bord sans lire la table
+    CREATE INDEX IF NOT EXISTS idx_ticket_statut ON ticket(statut, montant);
+    CREATE INDEX IF NOT EXISTS idx_trajet_heure_depart ON trajet(heure_depart);
+    CREATE INDEX IF NOT EXISTS idx_trajet_ville_depart ON trajet(ville_depart_id);
+    CREATE INDEX IF NOT EXISTS idx_trajet_ville_arrivee ON trajet(ville_arrivee_id);
+    CREATE INDEX IF NOT EXISTS idx_trajet_vehicule ON trajet(vehicule_id, heure_depart);
+    CREATE INDEX IF NOT EXISTS idx_trajet_chauffeur ON trajet(chauffeur_id, heure_depart);
+    -- listes triees par nom (pagination par nom, id)
+    CREATE INDEX IF NOT EXISTS idx_client_nom ON client(nom);
+    CREATE INDEX IF NOT EXISTS idx_chauffeur_nom ON chauffeur(nom);
+    CREATE INDEX IF NOT EXISTS idx_user_nom ON user(nom);
+    CREATE INDEX IF NOT EXISTS idx_societe_nom ON societe(nom);
+"""
+
+# compteurs du tableau de bord tenus a jour par triggers : la page d'accueil lit
+# une seule ligne au lieu de compter les tables. stats_jour garde les recettes
+# par jour et par societe (celle de l'agent qui a vendu le ticket, 0 si aucune).
+# Seuls les tickets payes comptent, comme sur l'ancien tableau de bord.
+STATS = """
+    CREATE TABLE IF NOT EXISTS stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        nb_tickets INTEGER NOT NULL DEFAULT 0,
+        recettes REAL NOT NULL DEFAULT 0,
+        nb_trajets INTEGER NOT NULL DEFAULT 0,
+        nb_clients INTEGER NOT NULL DEFAULT 0,
+        nb_chauffeurs INTEGER NOT NULL DEFAULT 0,
+        nb_vehicules INTEGER NOT NULL DEFAULT 0
+    );
+
+    CREATE TABLE IF NOT EXISTS stats_jour (
+        jour TEXT NOT NULL,
+        societe_id INTEGER NOT NULL,
+        nb_tickets INTEGER NOT NULL DEFAULT 0,
+        recettes REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (jour, societe_id)
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER IF NOT EXISTS ticket_stats_ai AFTER INSERT ON ticket WHEN new.statut = 'payé' BEGIN
+        UPDATE stats SET nb_tickets = nb_tickets + 1, recettes = recettes + IFNULL(new.montant, 0) WHERE id = 1;
+        INSERT INTO stats_jour (jour, societe_id, nb_tickets, recettes)
+        VALUES (substr(new.date, 1, 10),
+                IFNULL((SELECT societe_id FROM user WHERE id = new.user_id), 0),
+                1, IFNULL(new.montant, 0))
+        ON CONFLICT (jour, societe_id) DO UPDATE SET
+            nb_tickets = nb_tickets + excluded.nb_tickets,
+            recettes = recettes + excluded.recettes;
+    END;
+    CREATE TRIGGER IF NOT EXISTS ticket_stats_ad AFTER DELETE ON ticket WHEN old.statut = 'payé' BEGIN
+        UPDATE stats SET nb_tickets = nb_tickets - 1, recettes = recettes - IFNULL(old.montant, 0) WHERE id = 1;
+        UPDATE stats_jour SET nb_tickets = nb_tickets - 1, recettes = recettes - IFNULL(old.montant, 0)
+        WHERE jour = substr(old.date, 1, 10)
+          AND societe_id = IFNULL((SELECT societe_id FROM user WHERE id = old.user_id), 0);
+    END;
+    -- une modification = retrait de l'ancienne ligne puis ajout de la nouvelle
+    CREATE TRIGGER IF NOT EXISTS ticket_stats_au_old AFTER UPDATE OF statut, montant, date, user_id ON ticket
+    WHEN old.statut = 'payé' BEGIN
+        UPDATE stats SET nb_tickets = nb_tickets - 1, recettes = recettes - IFNULL(old.montant, 0) WHERE id = 1;
+        UPDATE stats_jour SET nb_tickets = nb_tickets - 1, recettes = recettes - IFNULL(old.montant, 0)
+        WHERE jour = substr(old.date, 1, 10)
+          AND societe_id = IFNULL((SELECT societe_id FROM user WHERE id = old.user_id), 0);
+    END;
+    CREATE TRIGGER IF NOT EXISTS ticket_stats_au_new AFTER UPDATE OF statut, montant, date, user_id ON ticket
+    WHEN new.statut = 'payé' BEGIN
+        UPDATE stats SET nb_tickets = nb_tickets + 1, recettes = recettes + IFNULL(new.montant, 0) WHERE id = 1;
+        INSERT INTO stats_jour (jour, societe_id, nb_tickets, recettes)
+        VALUES (substr(new.date, 1, 10),
+                IFNULL((SELECT societe_id FROM user WHERE id = new.user_id), 0),
+                1, IFNULL(new.montant, 0))
+        ON CONFLICT (jour, societe_id) DO UPDATE SET
+            nb_tickets = nb_tickets + excluded.nb_tickets,
+            recettes = recettes + excluded.recettes;
+    END;
+    -- un agent qui change de societe emporte ses ventes dans la nouvelle
+    CREATE TRIGGER IF NOT EXISTS user_stats_au AFTER UPDATE OF societe_id ON user
+    WHEN old.societe_id IS NOT new.societe_id BEGIN
+        UPDATE stats_jour SET
+            nb_tickets = nb_tickets - (SELECT COUNT(*) FROM ticket tk
+                                       WHERE tk.user_id = new.id AND tk.statut = 'payé'
+                                         AND substr(tk.date, 1, 10) = stats_jour.jour),
+            recettes = recettes - (SELECT IFNULL(SUM(tk.montant), 0) FROM ticket tk
+                                   WHERE tk.user_id = new.id AND tk.statut = 'payé'
+                                     AND substr(tk.date, 1, 10) = stats_jour.jour)
+        WHERE societe_id = IFNULL(old.societe_id, 0);
+        INSERT INTO stats_jour (jour, societe_id, nb_tickets, recettes)
+        SELECT substr(tk.date, 1, 10), IFNULL(new.societe_id, 0), COUNT(*), IFNULL(SUM(tk.montant), 0)
+        FROM ticket tk WHERE tk.user_id = new.id AND tk.statut = 'payé'
+        GROUP BY substr(tk.date, 1, 10)
+        ON CONFLICT (jour, societe_id) DO UPDATE SET
+            nb_tickets = nb_tickets + excluded.nb_tickets,
+            recettes = recettes + excluded.recettes;
+    END;
+"""
+
+STATS_COUNTED = {
+    "trajet": "nb_trajets",
+    "client": "nb_clients",
+    "chauffeur": "nb_chauffeurs",
+    "vehicule": "nb_vehicules",
+}
+
+# recalcule tout depuis les tables : remplissage initial, ou reparation
+STATS_REBUILD = """
+    INSERT OR REPLACE INTO stats (id, nb_tickets, recettes, nb_trajets, nb_clients, nb_chauffeurs, nb_vehicules)
+    SELECT 1,
+           (SELECT COUNT(*) FROM ticket WHERE statut = 'payé'),
+           (SELECT IFNULL(SUM(montant), 0) FROM ticket WHERE statut = 'payé'),
+           (SELECT COUNT(*) FROM trajet),
+           (SELECT COUNT(*) FROM client),
+           (SELECT COUNT(*) FROM chauffeur),
+           (SELECT COUNT(*) FROM vehicule);
+    DELETE FROM stats_jour;
+    INSERT INTO stats_jour (jour, societe_id, nb_tickets, recettes)
+    SELECT substr(tk.date, 1, 10), IFNULL(u.societe_id, 0), COUNT(*), IFNULL(SUM(tk.montant), 0)
+    FROM ticket tk LEFT JOIN user u ON tk.user_id = u.id
+    WHERE tk.statut = 'payé'
+    GROUP BY 1, 2;
+"""
+
+
+def stats_schema(conn):
+    script = [STATS]
+    for table, col in STATS_COUNTED.items():
+        script.append(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_stats_ai AFTER INSERT ON {table} BEGIN
+                UPDATE stats SET {col} = {col} + 1 WHERE id = 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS {table}_stats_ad AFTER DELETE ON {table} BEGIN
+                UPDATE stats SET {col} = {col} - 1 WHERE id = 1;
+            END;
+        """)
+    script.append(STATS_REBUILD)
+    return "\n".join(script)
+
+
+SEAT_INDEX = """CREATE UNIQUE INDEX IF NOT EXISTS idx_ticket_siege ON ticket(trajet_id, siege)
+                WHERE statut != 'annulé';"""
+
+
+def seat_duplicates(conn, limit=20):
+    # sieges vendus plusieurs fois sur un meme trajet : (trajet_id, siege, nombre)
+    return conn.execute("""
+        SELECT trajet_id, siege, COUNT(*) FROM ticket WHERE statut != 'annulé' AND siege IS NOT NULL
+        GROUP BY trajet_id, siege HAVING COUNT(*) > 1 ORDER BY trajet_id, siege LIMIT ?
+    """, (limit,)).fetchall()
+
+
+def describe_duplicates(duplicates):
+    lines = [f"trajet #{trajet_id}, siège {siege} : {count} tickets" for trajet_id, siege, count in duplicates]
+    return ("Des sièges sont vendus plusieurs fois : l'index qui empêche les doubles ventes "
+            "n'a pas pu être créé. Annulez les tickets en trop puis relancez l'application.\n"
+            + "\n".join(lines))
+
+
+def seat_index(conn):
+    # un siege ne peut etre vendu qu'une fois par trajet (tickets annules exclus).
+    # Si une ancienne base contient deja des doublons, l'index ne peut pas etre
+    # cree : ensure_seat_index() le retente a chaque demarrage et signale les doublons.
+    if seat_duplicates(conn, 1):
+        return ""
+    return SEAT_INDEX
+
+
+def ensure_seat_index(conn):
+    # appele a chaque demarrage : renvoie [] si l'index unique est en place,
+    # sinon les doublons qui empechent de le creer
+    for row in conn.execute("PRAGMA index_list(ticket)").fetchall():
+        if row[1] == "idx_ticket_siege" and row[2]:
+            return []
+    duplicates = seat_duplicates(conn)
+    if duplicates:
+        return duplicates
+    # ancienne version : index simple a la place de l'index unique
+    try:
+        conn.executescript(f"BEGIN IMMEDIATE;\nDROP INDEX IF EXISTS idx_ticket_siege;\n{SEAT_INDEX}\nCOMMIT;")
+    except sqlite3.IntegrityError:
+        # doublon vendu entre-temps depuis un autre poste
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        return seat_duplicates(conn)
+    return []
+
+
+# rapports (reports.py) : tickets payes d'une periode, sans lire la table
+REPORT_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_ticket_rapport ON ticket(statut, date, trajet_id, user_id, montant);
+"""
+
+
+# horaires recurrents (timetable.py) : un modele par liaison reguliere, les
+# trajets dates en sont generes. Un seul trajet par modele et par jour.
+TIMETABLE = """
+    CREATE TABLE IF NOT EXISTS trajet_template (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ville_depart_id INTEGER NOT NULL,
+        ville_arrivee_id INTEGER NOT NULL,
+        jours INTEGER NOT NULL DEFAULT 127,
+        heure TEXT NOT NULL,
+        duree INTEGER,
+        vehicule_id INTEGER,
+        chauffeur_id INTEGER,
+        prix REAL DEFAULT 0,
+        actif INTEGER NOT NULL DEFAULT 1,
+        FOREIGN KEY (ville_depart_id) REFERENCES ville(id),
+        FOREIGN KEY (ville_arrivee_id) REFERENCES ville(id),
+        FOREIGN KEY (vehicule_id) REFERENCES vehicule(id),
+        FOREIGN KEY (chauffeur_id) REFERENCES chauffeur(id)
+    );
+    ALTER TABLE trajet ADD COLUMN template_id INTEGER REFERENCES trajet_template(id);
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_trajet_template_jour
+        ON trajet(template_id, substr(heure_depart, 1, 10)) WHERE template_id IS NOT NULL;
+"""
+
+
+# idx_user_login (identifiant, password) doublait l'index UNIQUE de identifiant :
+# la connexion cherche l'utilisateur par identifiant seul (auth.py)
+DROP_USER_LOGIN = "DROP INDEX IF EXISTS idx_user_login;"
+
+
+MIGRATIONS = [
+    (1, "schéma initial", SCHEMA),
+    (2, "recherche plein texte", fts_schema),
+    (3, "index secondaires", INDEXES),
+    (4, "statistiques du tableau de bord", stats_schema),
+    (5, "sièges uniques par trajet", seat_index),
+    (6, "index des rapports", REPORT_INDEX),
+    (7, "horaires récurrents", TIMETABLE),
+    (8, "index de connexion redondant", DROP_USER_LOGIN),
+]
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    version = schema_version(conn)
+    for number, label, step in MIGRATIONS:
+        if number <= version:
+            continue
+        script = step(conn) if callable(step) else step
+        try:
+            conn.executescript(f"BEGIN IMMEDIATE;\n{script}\nPRAGMA user_version = {number};\nCOMMIT;")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise RuntimeError(f"Migration {number} ({label}) impossible : {e}") from e
+    return schema_version(conn)
@@ -0,0 +1,158 @@
+import queries
+from backend import backend
+
+PAGE_SIZE = 100
+MAX_ID = 2 ** 63 - 1
+
+
+class KeysetPager:
+    # pagination par "seek" : chaque page repart de la derniere cle affichee
+    # (WHERE (cles) > (:after_...) ORDER BY cles LIMIT :limit), jamais d'OFFSET.
+    # statement = nom d'une requete de queries.QUERIES
+    # keys = colonnes du resultat formant la cle, start = cle de depart de la premiere page
+    # descending = la requete trie par cle decroissante (listes par id DESC)
+    def __init__(self, statement, keys, start, page_size=PAGE_SIZE, descending=False):
+        self.statement = statement
+        # "clients.page" -> "clients.row" : la meme liste, une ligne par id
+        self.row_statement = statement.rsplit(".", 1)[0] + ".row"
+        self.keys = keys
+        self.start = tuple(start)
+        self.page_size = page_size
+        self.descending = descending
+        self.filters = {}
+        self._reset()
+
+    def _reset(self):
+        self._bounds = []          # cle de depart des pages precedentes
+        self._bound = self.start   # cle de depart de la page courante
+        self._last = self.start    # derniere cle chargee dans la page courante
+        self._loaded = 0
+        self._exhausted = False
+
+    def query(self, after, limit, conn=None, filters=None):
+        # renvoie (lignes, il_en_reste) sans toucher a l'etat de la page
+        params = dict(self.filters if filters is None else filters)
+        params.update((f"after_{key}", value) for key, value in zip(self.keys, after))
+        params["limit"] = limit + 1
+        if conn is None:
+            # base locale ou serveur (guichet distant, voir backend.py)
+            rows = backend().fetchall(self.statement, params)
+        else:
+            rows = queries.fetchall(conn, self.statement, params)
+        return rows[:limit], len(rows) > limit
+
+    def export_params(self):
+        # toute la liste du filtre courant depuis le debut (LIMIT -1 : sans
+        # limite), pour la parcourir avec queries.fetchmany (export.py)
+        params = dict(self.filters)
+        params.update((f"after_{key}", value) for key, value in zip(self.keys, self.start))
+        params["limit"] = -1
+        return params
+
+    def set_filter(self, filters=None):
+        self.filters = dict(filters or {})
+        self._reset()
+
+    def prepare(self, filters=None, limit=None, conn=None):
+        # premiere page d'un nouveau filtre, sans modifier l'etat du pager :
+        # peut tourner dans un thread de recherche, le resultat passe ensuite par apply()
+        filters = dict(filters or {})
+        rows, more = self.query(self.start, min(limit or self.page_size, self.page_size), conn, filters)
+        return filters, rows, more
+
+    def apply(self, prepared):
+        filters, rows, more = prepared
+        self.set_filter(filters)
+        self._exhausted = not more
+        if rows:
+            self._last = self._key(rows[-1])
+            self._loaded = len(rows)
+        return rows
+
+    @property
+    def page(self):
+        return len(self._bounds) + 1
+
+    @property
+    def has_previous(self):
+        return bool(self._bounds)
+
+    @property
+    def has_next(self):
+        return not self._exhausted
+
+    @property
+    def can_fetch(self):
+        # reste-t-il des lignes a charger dans la fenetre courante
+        return not self._exhausted and self._loaded < self.page_size
+
+    def fetch(self, limit=None, conn=None):
+        limit = min(limit or self.page_size, self.page_size - self._loaded)
+        if limit <= 0 or self._exhausted:
+            return []
+        rows, more = self.query(self._last, limit, conn)
+        self._exhausted = not more
+        if rows:
+            self._last = self._key(rows[-1])
+            self._loaded += len(rows)
+        return rows
+
+    def first(self, limit=None, conn=None):
+        self._reset()
+        return self.fetch(limit, conn)
+
+    def next_page(self, limit=None, conn=None):
+        if self._exhausted:
+            return []
+        self._bounds.append(self._bound)
+        self._bound = self._last
+        self._loaded = 0
+        return self.fetch(limit, conn)
+
+    def previous_page(self, limit=None, conn=None):
+        if not self._bounds:
+            return []
+        self._bound = self._last = self._bounds.pop()
+        self._loaded = 0
+        self._exhausted = False
+        return self.fetch(limit, conn)
+
+    def _key(self, row):
+        return tuple(row[key] for key in self.keys)
+
+    def row(self, rowid, conn=None):
+        # la ligne rowid telle que la page l'afficherait, None si elle n'existe
+        # plus ou ne passe pas le filtre courant
+        if conn is None:
+            return backend().fetchone(self.row_statement, dict(self.filters, id=rowid))
+        return queries.fetchone(conn, self.row_statement, dict(self.filters, id=rowid))
+
+    def _in_window(self, key):
+        # la cle tombe-t-elle dans la page courante (entre sa cle de depart et
+        # la derniere ligne chargee, ou apres si la liste est epuisee)
+        if self.descending:
+            return key < self._bound and (self._exhausted or key > self._last)
+        return key > self._bound and (self._exhausted or key < self._last)
+
+    def patch(self, rows, op, rowid, conn=None):
+        # changement (op, rowid) de la table de la liste -> modifications a
+        # appliquer aux lignes affichees, [(action, index, ligne)] avec action
+        # "update", "insert" ou "delete". Ne modifie pas "rows".
+        index = next((i for i, r in enumerate(rows) if r["id"] == rowid), None)
+        row = None if op == "delete" else self.row(rowid, conn)
+        if row is not None and index is not None and self._key(rows[index]) == self._key(row):
+            return [("update", index, row)]
+        changes = []
+        if index is not None:
+            changes.append(("delete", index, None))
+            self._loaded -= 1
+            rows = rows[:index] + rows[index + 1:]
+        if row is not None and self._in_window(self._key(row)):
+            key = self._key(row)
+            if self.descending:
+                pos = next((i for i, r in enumerate(rows) if self._key(r) < key), len(rows))
+            else:
+                pos = next((i for i, r in enumerate(rows) if self._key(r) > key), len(rows))
+            changes.append(("insert", pos, row))
+            self._loaded += 1
+        return changes
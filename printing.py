@@ -0,0 +1,235 @@
+import html
+import itertools
+import string
+from PySide6 import QtWidgets, QtCore, QtGui, QtPrintSupport
+from backend import backend
+from styles import primary_btn
+
+TICKET_TEMPLATE = """
+        <div style="border:2px solid #333;padding:20px;max-width:500px;margin:auto;">
+            <h2 style="text-align:center;color:#1a3a8a;">🚌 GestTransport</h2>
+            <h3 style="text-align:center;border-bottom:1px solid #ccc;padding-bottom:10px;">TICKET DE VOYAGE</h3>
+            <table width="100%" style="margin-top:10px;">
+                <tr><td><b>N° Ticket:</b></td><td>#{id:06d}</td></tr>
+                <tr><td><b>Date achat:</b></td><td>{date}</td></tr>
+                <tr><td><b>Client:</b></td><td>{client}</td></tr>
+                <tr><td><b>Téléphone:</b></td><td>{cl_tel}</td></tr>
+                <tr><td colspan="2" style="padding-top:10px;"><b>──────── TRAJET ────────</b></td></tr>
+                <tr><td><b>Départ:</b></td><td>{v_dep}</td></tr>
+                <tr><td><b>Arrivée:</b></td><td>{v_arr}</td></tr>
+                <tr><td><b>H. Départ:</b></td><td>{heure_depart}</td></tr>
+                <tr><td><b>H. Arrivée:</b></td><td>{heure_arrivee}</td></tr>
+                <tr><td><b>Siège N°:</b></td><td>{siege}</td></tr>
+                <tr><td><b>Chauffeur:</b></td><td>{chauffeur}</td></tr>
+                <tr><td><b>Véhicule:</b></td><td>{vehicule}</td></tr>
+                <tr><td colspan="2" style="padding-top:10px;"><b>──────── PAIEMENT ────────</b></td></tr>
+                <tr><td><b>Montant:</b></td><td style="font-size:16px;font-weight:bold;color:#1a3a8a;">{montant:,.0f} FCFA</td></tr>
+                <tr><td><b>Statut:</b></td><td style="color:{statut_color};">{statut}</td></tr>
+            </table>
+            <p style="text-align:center;margin-top:20px;font-size:11px;color:#888;">
+                Bon voyage ! Merci de votre confiance.<br>
+                Ce ticket est valable uniquement pour le trajet indiqué.
+            </p>
+        </div>
+"""
+PAGE_BREAK = '<div style="page-break-before:always;"></div>'
+
+
+def _compile(template):
+    # le gabarit est decoupe une seule fois en (texte, champ, format) ; un lot
+    # de tickets ne fait plus que des format() et un join
+    parts = [(text, name, spec) for text, name, spec, _ in string.Formatter().parse(template)]
+
+    def render(fields):
+        out = []
+        for text, name, spec in parts:
+            out.append(text)
+            if name is not None:
+                out.append(format(fields[name], spec))
+        return "".join(out)
+    return render
+
+render_ticket = _compile(TICKET_TEMPLATE)
+
+
+def _text(value):
+    return html.escape(str(value)) if value not in (None, "") else "—"
+
+
+def ticket_fields(row):
+    r = dict(row)
+    return {
+        "id": r["id"],
+        "date": _text(r["date"]),
+        "client": _text(f"{r['cl_nom'] or ''} {r['cl_prenom'] or ''}".strip()),
+        "cl_tel": _text(r["cl_tel"]),
+        "v_dep": _text(r["v_dep"]),
+        "v_arr": _text(r["v_arr"]),
+        "heure_depart": _text(r["heure_depart"]),
+        "heure_arrivee": _text(r["heure_arrivee"]),
+        "siege": _text(r["siege"]),
+        "chauffeur": _text(r["chauffeur"]),
+        "vehicule": _text(r["vehicule"]),
+        "montant": r["montant"] or 0,
+        "statut": _text((r["statut"] or "").upper()),
+        "statut_color": "green" if r["statut"] == "payé" else "red",
+    }
+
+
+def tickets_html(rows):
+    # un ticket par page : un lot devient un seul travail d'impression
+    body = PAGE_BREAK.join(render_ticket(ticket_fields(row)) for row in rows)
+    return f'<html><body style="font-family:Arial;font-size:14px;margin:20px;">{body}</body></html>'
+
+
+class _PrintJob(QtCore.QRunnable):
+    # requete, HTML et mise en page (QTextDocument) hors du thread de l'interface.
+    # mode "preview" : le document est rendu au thread de l'interface pour l'apercu ;
+    # "printer" / "pdf" : impression directe depuis ce thread (QPainter sur
+    # QPrinter est permis hors du thread GUI)
+    def __init__(self, queue, job_id, mode, statement=None, params=(), html_text=None,
+                 printer=None, path=None):
+        super().__init__()
+        self.queue = queue
+        self.job_id = job_id
+        self.mode = mode
+        self.statement = statement
+        self.params = params
+        self.html_text = html_text
+        self.printer = printer
+        self.path = path
+
+    def run(self):
+        try:
+            text = self.html_text
+            if text is None:
+                rows = backend().fetchall(self.statement, self.params)
+                if not rows:
+                    self.queue._failed.emit(self.job_id, "Aucun ticket à imprimer.")
+                    return
+                text = tickets_html(rows)
+            doc = QtGui.QTextDocument()
+            doc.setHtml(text)
+            if self.mode == "preview":
+                doc.moveToThread(QtCore.QCoreApplication.instance().thread())
+                self.queue._ready.emit(self.job_id, doc, text)
+                return
+            printer = self.printer
+            if self.mode == "pdf":
+                printer = QtPrintSupport.QPrinter(QtPrintSupport.QPrinter.HighResolution)
+                printer.setOutputFormat(QtPrintSupport.QPrinter.PdfFormat)
+                printer.setOutputFileName(self.path)
+            elif printer is None:
+                info = QtPrintSupport.QPrinterInfo.defaultPrinter()
+                if info.isNull():
+                    self.queue._failed.emit(self.job_id, "Aucune imprimante par défaut.")
+                    return
+                printer = QtPrintSupport.QPrinter(info, QtPrintSupport.QPrinter.HighResolution)
+            doc.print_(printer)
+            self.queue._done.emit(self.job_id)
+        except Exception as e:
+            self.queue._failed.emit(self.job_id, str(e))
+
+
+class PrintQueue(QtCore.QObject):
+    # file d'impression : un seul thread, les travaux sortent dans l'ordre ou ils
+    # ont ete demandes. Le guichet reste utilisable pendant qu'un car complet s'imprime.
+    job_finished = QtCore.Signal(str)
+    _ready = QtCore.Signal(int, object, str)
+    _done = QtCore.Signal(int)
+    _failed = QtCore.Signal(int, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QtCore.QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self._ids = itertools.count(1)
+        self._jobs = {}
+        self._ready.connect(self._on_ready)
+        self._done.connect(self._on_done)
+        self._failed.connect(self._on_failed)
+
+    def _submit(self, parent, title, mode, **kwargs):
+        job_id = next(self._ids)
+        self._jobs[job_id] = (parent, title)
+        self.pool.start(_PrintJob(self, job_id, mode, **kwargs))
+        return job_id
+
+    def preview_ticket(self, parent, tid):
+        return self._submit(parent, f"Ticket #{tid:06d}", "preview",
+                            statement="tickets.print", params=(tid,))
+
+    def preview_trajet(self, parent, trajet_id):
+        return self._submit(parent, f"Tickets du trajet #{trajet_id}", "preview",
+                            statement="tickets.print_trajet", params=(trajet_id,))
+
+    def print_trajet(self, parent, trajet_id, printer=None):
+        # sans printer : imprimante par defaut, sans apercu ni dialogue
+        return self._submit(parent, f"Tickets du trajet #{trajet_id}", "printer",
+                            statement="tickets.print_trajet", params=(trajet_id,), printer=printer)
+
+    def trajet_pdf(self, parent, trajet_id, path):
+        return self._submit(parent, f"Tickets du trajet #{trajet_id}", "pdf",
+                            statement="tickets.print_trajet", params=(trajet_id,), path=path)
+
+    def print_html(self, parent, title, html_text, printer):
+        return self._submit(parent, title, "printer", html_text=html_text, printer=printer)
+
+    def pending(self):
+        return len(self._jobs)
+
+    def _on_ready(self, job_id, doc, text):
+        parent, title = self._jobs.pop(job_id)
+        PrintPreviewDialog(parent, doc, text, title).exec()
+
+    def _on_done(self, job_id):
+        _, title = self._jobs.pop(job_id)
+        self.job_finished.emit(title)
+
+    def _on_failed(self, job_id, message):
+        parent, title = self._jobs.pop(job_id)
+        QtWidgets.QMessageBox.warning(parent, "Impression", f"{title} : {message}")
+
+
+_queue = None
+
+def print_queue():
+    global _queue
+    if _queue is None:
+        _queue = PrintQueue()
+    return _queue
+
+
+class PrintPreviewDialog(QtWidgets.QDialog):
+    def __init__(self, parent, document, html_text, title="Document"):
+        super().__init__(parent)
+        self.html = html_text
+        self.title = title
+        self.setWindowTitle(f"Aperçu — {title}")
+        self.setMinimumSize(600, 700)
+        self.setStyleSheet("QDialog{background:#fff;}")
+        layout = QtWidgets.QVBoxLayout(self)
+        self.text_edit = QtWidgets.QTextEdit()
+        self.text_edit.setReadOnly(True)
+        document.setParent(self.text_edit)
+        self.text_edit.setDocument(document)
+        self.text_edit.setStyleSheet("background:white;color:black;border:none;")
+        layout.addWidget(self.text_edit)
+        btn_row = QtWidgets.QHBoxLayout()
+        btn_print = primary_btn("🖨️ Imprimer")
+        btn_print.clicked.connect(self._print)
+        btn_close = QtWidgets.QPushButton("Fermer")
+        btn_close.setStyleSheet("background:#21262d;color:#e6edf3;border:none;border-radius:6px;padding:8px 18px;")
+        btn_close.clicked.connect(self.reject)
+        btn_row.addStretch()
+        btn_row.addWidget(btn_print)
+        btn_row.addWidget(btn_close)
+        layout.addLayout(btn_row)
+
+    def _print(self):
+        printer = QtPrintSupport.QPrinter(QtPrintSupport.QPrinter.HighResolution)
+        dlg = QtPrintSupport.QPrintDialog(printer, self)
+        if dlg.exec() == QtWidgets.QDialog.Accepted:
+            # la mise en page pour l'imprimante se fait dans la file, pas ici
+            print_queue().print_html(self.parentWidget(), self.title, self.html, printer)
+            self.accept()
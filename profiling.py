@@ -0,0 +1,280 @@
+import atexit
+import itertools
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# chronometrage de toutes les requetes SQL, branche dans database._connect
+# (factory=ProfiledConnection) : chaque execute est compte sous son texte
+# normalise (litteraux -> ?), avec un histogramme pour p50/p95/p99. Au-dela de
+# SLOW_MS la requete va dans le journal des requetes lentes, avec son plan
+# (EXPLAIN QUERY PLAN, calcule a la lecture du journal, pas pendant la requete).
+# GESTTRANSPORT_PROFILE=fichier.json : bilan ecrit a la fermeture de l'application.
+PROFILE_ENV = "GESTTRANSPORT_PROFILE"
+SLOW_MS = 100
+SLOW_KEPT = 200
+# histogramme logarithmique : 4 cases par puissance de 2, en microsecondes
+# (~19 % de largeur par case), de 1 us a ~4 min
+BUCKETS_PER_OCTAVE = 4
+BUCKETS = 28 * BUCKETS_PER_OCTAVE
+NORMALIZED_KEPT = 4096
+
+# RLock : un curseur libere par le ramasse-miettes (__del__) peut enregistrer
+# sa requete pendant que ce meme thread est deja dans record()
+_lock = threading.RLock()
+_stats = {}
+_slow = deque(maxlen=SLOW_KEPT)
+_plans = {}
+_normalized = {}
+_names = None
+
+
+class _Stat:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, elapsed):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        us = elapsed * 1e6
+        index = int(math.log2(us) * BUCKETS_PER_OCTAVE) + 1 if us >= 1 else 0
+        self.buckets[min(index, BUCKETS - 1)] += 1
+
+    def percentile(self, p):
+        # borne haute de la case qui contient le p-ieme centile (en s)
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for index, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(2 ** (index / BUCKETS_PER_OCTAVE) / 1e6, self.max)
+        return self.max
+
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_COMMENTS = re.compile(r"--[^\n]*")
+
+
+def normalize(sql):
+    # "SELECT ... WHERE id IN (1, 2, 3) AND nom = 'x'" -> "SELECT ... WHERE id IN (?, …) AND nom = ?"
+    with _lock:
+        text = _normalized.get(sql)
+    if text is None:
+        text = _COMMENTS.sub(" ", sql)
+        text = _LITERALS.sub("?", text)
+        text = _IN_LIST.sub("(?, …)", text)
+        text = " ".join(text.split())
+        with _lock:
+            if len(_normalized) >= NORMALIZED_KEPT:
+                _normalized.clear()
+            _normalized[sql] = text
+    return text
+
+
+def _name(text):
+    # nom de la requete dans queries.QUERIES, s'il y en a un
+    global _names
+    with _lock:
+        if _names is None:
+            import queries
+            _names = {normalize(sql): name for name, sql in queries.QUERIES.items()}
+        return _names.get(text)
+
+
+def record(sql, params, elapsed, rows=1):
+    text = normalize(sql)
+    with _lock:
+        stat = _stats.get(text)
+        if stat is None:
+            stat = _stats[text] = _Stat()
+        stat.add(elapsed)
+        if elapsed * 1000 >= SLOW_MS:
+            _slow.append({"sql": text, "ms": round(elapsed * 1000, 3), "lignes": rows,
+                          "date": datetime.now().isoformat(timespec="seconds"),
+                          "thread": threading.current_thread().name, "_query": (sql, params)})
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    # le temps d'une requete = execute + les fetch* qui suivent ; il est compte
+    # quand le resultat est epuise, a l'execute suivant, ou quand le curseur est
+    # ferme / libere (un parcours "for row in cur" n'est compte que jusque-la)
+    _sql = None
+
+    def execute(self, sql, params=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self._sql, self._params = sql, params
+            self._elapsed = time.perf_counter() - start
+            self._rows = 0
+
+    def executemany(self, sql, seq):
+        # la premiere ligne de parametres est gardee pour EXPLAIN QUERY PLAN
+        self._finish()
+        rows = iter(seq)
+        first = next(rows, None)
+        if first is not None:
+            rows = itertools.chain((first,), rows)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, rows)
+        finally:
+            record(sql, () if first is None else first, time.perf_counter() - start, self.rowcount)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        if self._sql is not None:
+            self._elapsed += time.perf_counter() - start
+            if row is None:
+                self._finish()
+            else:
+                self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        if self._sql is not None:
+            self._elapsed += time.perf_counter() - start
+            self._rows += len(rows)
+            if not rows:
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        if self._sql is not None:
+            self._elapsed += time.perf_counter() - start
+            self._rows += len(rows)
+            self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def _finish(self):
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            record(sql, self._params, self._elapsed, self._rows)
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            # fin de l'interpreteur : le module a pu etre deja vide
+            pass
+
+
+class ProfiledConnection(sqlite3.Connection):
+    # Connection.execute (en C) n'appelle pas Cursor.execute : on passe par cursor()
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
+
+
+def _plan(sql, params):
+    # EXPLAIN QUERY PLAN sur une connexion a part (sans chronometrage), meme texte et parametres
+    import database
+    try:
+        conn = sqlite3.connect(database.DB_PATH)
+        try:
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        return [f"(plan indisponible : {e})"]
+    # (id, parent, _, detail) -> lignes indentees comme dans le shell sqlite3
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node] + detail)
+    return lines
+
+
+def full_scans(plan):
+    # tables lues en entier : "SCAN t" sans index (un SCAN ... USING INDEX parcourt l'index)
+    # (anciennes versions de SQLite : "SCAN TABLE t")
+    return [line.strip()[5:].removeprefix("TABLE ") for line in plan
+            if line.strip().startswith("SCAN ") and "INDEX" not in line and "VIRTUAL TABLE" not in line]
+
+
+def statistics():
+    # une ligne par requete normalisee, la plus couteuse (temps total) en premier
+    with _lock:
+        items = list(_stats.items())
+        result = [{"sql": text, "nom": _name(text), "appels": st.count, "total_ms": round(st.total * 1000, 3),
+                   "moyenne_ms": round(st.total / st.count * 1000, 3),
+                   "p50_ms": round(st.percentile(50) * 1000, 3), "p95_ms": round(st.percentile(95) * 1000, 3),
+                   "p99_ms": round(st.percentile(99) * 1000, 3), "max_ms": round(st.max * 1000, 3)}
+                  for text, st in items]
+    result.sort(key=lambda row: row["total_ms"], reverse=True)
+    return result
+
+
+def slow_queries():
+    # journal des requetes lentes, la plus recente en premier, avec leur plan
+    with _lock:
+        entries = list(_slow)
+    result = []
+    for entry in reversed(entries):
+        with _lock:
+            plan = _plans.get(entry["sql"])
+        if plan is None:
+            # hors du verrou : EXPLAIN ouvre une connexion
+            plan = _plan(*entry["_query"])
+            with _lock:
+                _plans[entry["sql"]] = plan
+        item = {k: v for k, v in entry.items() if not k.startswith("_")}
+        item["nom"] = _name(entry["sql"])
+        item["plan"] = plan
+        item["scans"] = full_scans(plan)
+        result.append(item)
+    return result
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _slow.clear()
+        _plans.clear()
+
+
+def dump(path=None):
+    # bilan complet en JSON ; ecrit dans path s'il est donne
+    import database
+    data = {"date": datetime.now().isoformat(timespec="seconds"), "base": os.path.abspath(database.DB_PATH),
+            "sqlite": sqlite3.sqlite_version, "seuil_lent_ms": SLOW_MS,
+            "requetes": statistics(), "lentes": slow_queries()}
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+    return data
+
+
+if os.environ.get(PROFILE_ENV):
+    atexit.register(dump, os.environ[PROFILE_ENV])
@@ -0,0 +1,266 @@
+
+# registre des requetes : chaque requete a un nom et une forme fixe (parametres
+# nommes, filtres optionnels ecrits "(:x IS NULL OR col = :x)"), donc son texte
+# ne change jamais et SQLite ne la compile qu'une fois par connexion
+# (cache de requetes preparees, voir database.STATEMENT_CACHE).
+# Les listes paginees prennent :after_<cle> et :limit (voir pagination.KeysetPager).
+
+LISTS = {
+    # nom: (select ... from ..., colonne id, condition de seek, filtres, ordre)
+    "tickets": ("""
+        SELECT tk.id, tk.date,
+               cl.nom||' '||cl.prenom as client,
+               vd.nom||' → '||va.nom as trajet,
+               tk.siege, tk.montant, tk.statut,
+               u.nom||' '||u.prenom as agent
+        FROM ticket tk
+        LEFT JOIN client cl ON tk.client_id = cl.id
+        LEFT JOIN trajet t ON tk.trajet_id = t.id
+        LEFT JOIN ville vd ON t.ville_depart_id = vd.id
+        LEFT JOIN ville va ON t.ville_arrivee_id = va.id
+        LEFT JOIN user u ON tk.user_id = u.id""",
+        "tk.id", "tk.id < :after_id", """(:statut IS NULL OR tk.statut = :statut)
+          AND (:q IS NULL
+               OR tk.client_id IN (SELECT rowid FROM client_fts WHERE client_fts MATCH :q)
+               OR t.ville_depart_id IN (SELECT rowid FROM ville_fts WHERE ville_fts MATCH :q)
+               OR t.ville_arrivee_id IN (SELECT rowid FROM ville_fts WHERE ville_fts MATCH :q))""",
+        "tk.id DESC"),
+    "trajets": ("""
+        SELECT t.id,
+               vd.nom as depart, va.nom as arrivee,
+               t.heure_depart, t.heure_arrivee,
+               c.nom||' '||c.prenom as chauffeur,
+               v.matricule, t.prix,
+               v.nbre_place
+        FROM trajet t
+        LEFT JOIN ville vd ON t.ville_depart_id = vd.id
+        LEFT JOIN ville va ON t.ville_arrivee_id = va.id
+        LEFT JOIN chauffeur c ON t.chauffeur_id = c.id
+        LEFT JOIN vehicule v ON t.vehicule_id = v.id""",
+        "t.id", "t.id < :after_id", """(:q IS NULL
+               OR t.ville_depart_id IN (SELECT rowid FROM ville_fts WHERE ville_fts MATCH :q)
+               OR t.ville_arrivee_id IN (SELECT rowid FROM ville_fts WHERE ville_fts MATCH :q))""",
+        "t.id DESC"),
+    # le nombre de tickets est compte par client de la page seulement,
+    # au lieu d'un GROUP BY sur toute la table ticket
+    "clients": ("""
+        SELECT c.id, c.nom, c.prenom, c.telephone,
+               (SELECT COUNT(*) FROM ticket tk WHERE tk.client_id = c.id) as nb_tickets
+        FROM client c""",
+        "c.id", "(c.nom, c.id) > (:after_nom, :after_id)",
+        "(:q IS NULL OR c.id IN (SELECT rowid FROM client_fts WHERE client_fts MATCH :q))",
+        "c.nom, c.id"),
+    "societes": ("""
+        SELECT id, nom, telephone, adresse, description
+        FROM societe""",
+        "id", "(nom, id) > (:after_nom, :after_id)", "1", "nom, id"),
+    "chauffeurs": ("""
+        SELECT c.id, c.nom, c.prenom, c.matricule, c.permis, c.date_embauche, s.nom as societe
+        FROM chauffeur c LEFT JOIN societe s ON c.societe_id = s.id""",
+        "c.id", "(c.nom, c.id) > (:after_nom, :after_id)",
+        "(:q IS NULL OR c.id IN (SELECT rowid FROM chauffeur_fts WHERE chauffeur_fts MATCH :q))",
+        "c.nom, c.id"),
+    "vehicules": ("""
+        SELECT v.id, v.matricule, v.nbre_place, v.type, s.nom as societe
+        FROM vehicule v LEFT JOIN societe s ON v.societe_id = s.id""",
+        "v.id", "v.id < :after_id",
+        "(:q IS NULL OR v.id IN (SELECT rowid FROM vehicule_fts WHERE vehicule_fts MATCH :q))",
+        "v.id DESC"),
+    "users": ("""
+        SELECT u.id, u.nom, u.prenom, u.identifiant, u.genre, u.telephone, r.nom as role
+        FROM user u LEFT JOIN role r ON u.role_id = r.id""",
+        "u.id", "(u.nom, u.id) > (:after_nom, :after_id)",
+        "(:q IS NULL OR u.id IN (SELECT rowid FROM user_fts WHERE user_fts MATCH :q))",
+        "u.nom, u.id"),
+}
+
+QUERIES = {}
+# chaque liste donne deux requetes : "<nom>.page" (une page apres la cle :after_...)
+# et "<nom>.row" (une seule ligne par :id, avec les memes filtres), qui sert a
+# mettre a jour une ligne affichee sans recharger la page
+for _name, (_select, _id, _seek, _filters, _order) in LISTS.items():
+    QUERIES[f"{_name}.page"] = f"{_select}\n        WHERE {_seek} AND {_filters}\n        ORDER BY {_order} LIMIT :limit"
+    QUERIES[f"{_name}.row"] = f"{_select}\n        WHERE {_id} = :id AND {_filters}"
+
+# page de tickets avec recherche : on part des tickets des clients et villes
+# trouves par FTS (idx_ticket_client, idx_ticket_trajet) au lieu de tester la
+# recherche sur chaque ticket parcouru, un terme rare parcourait toute la table.
+# Sans recherche, la premiere branche garde le parcours par id ; ":q IS NULL"
+# est constant, SQLite n'execute qu'une des deux branches.
+# ORDER BY 1 : une requete composee se trie par numero de colonne (tk.id)
+_TICKET_MATCHES = """
+            SELECT tk2.id FROM ticket tk2
+            WHERE tk2.client_id IN (SELECT rowid FROM client_fts WHERE client_fts MATCH :q)
+              AND tk2.id < :after_id
+            UNION ALL
+            SELECT tk2.id FROM trajet t2 JOIN ticket tk2 ON tk2.trajet_id = t2.id
+            WHERE t2.ville_depart_id IN (SELECT rowid FROM ville_fts WHERE ville_fts MATCH :q)
+              AND tk2.id < :after_id
+            UNION ALL
+            SELECT tk2.id FROM trajet t2 JOIN ticket tk2 ON tk2.trajet_id = t2.id
+            WHERE t2.ville_arrivee_id IN (SELECT rowid FROM ville_fts WHERE ville_fts MATCH :q)
+              AND tk2.id < :after_id"""
+_select = LISTS["tickets"][0]
+QUERIES["tickets.page"] = f"""{_select}
+        WHERE :q IS NULL AND tk.id < :after_id AND (:statut IS NULL OR tk.statut = :statut)
+        UNION ALL{_select}
+        WHERE :q IS NOT NULL AND tk.id IN ({_TICKET_MATCHES})
+          AND (:statut IS NULL OR tk.statut = :statut)
+        ORDER BY 1 DESC LIMIT :limit"""
+
+_TICKET_PRINT = """
+        SELECT tk.*, cl.nom as cl_nom, cl.prenom as cl_prenom, cl.telephone as cl_tel,
+               vd.nom as v_dep, va.nom as v_arr,
+               t.heure_depart, t.heure_arrivee, t.prix,
+               c.nom||' '||c.prenom as chauffeur,
+               veh.matricule as vehicule
+        FROM ticket tk
+        LEFT JOIN client cl ON tk.client_id = cl.id
+        LEFT JOIN trajet t ON tk.trajet_id = t.id
+        LEFT JOIN ville vd ON t.ville_depart_id = vd.id
+        LEFT JOIN ville va ON t.ville_arrivee_id = va.id
+        LEFT JOIN chauffeur c ON t.chauffeur_id = c.id
+        LEFT JOIN vehicule veh ON t.vehicule_id = veh.id
+        """
+
+QUERIES.update({
+    # ── Tickets ──
+    "tickets.print": _TICKET_PRINT + "WHERE tk.id = ?",
+    # tous les tickets valides d'un trajet, un par page (printing.PrintQueue)
+    "tickets.print_trajet": _TICKET_PRINT + """WHERE tk.trajet_id = ? AND tk.statut != 'annulé'
+        ORDER BY tk.siege, tk.id""",
+    "tickets.client": "SELECT client_id FROM ticket WHERE id = ?",
+    "tickets.form_clients": "SELECT id, nom, prenom, telephone FROM client ORDER BY nom",
+    "tickets.form_trajets": """
+        SELECT t.id, vd.nom||' → '||va.nom as label, t.prix, t.heure_depart
+        FROM trajet t
+        LEFT JOIN ville vd ON t.ville_depart_id = vd.id
+        LEFT JOIN ville va ON t.ville_arrivee_id = va.id
+        ORDER BY t.heure_depart DESC
+    """,
+
+    # ── Horaires recurrents ──
+    "timetable.templates": """
+        SELECT tp.id, vd.nom as depart, va.nom as arrivee, tp.jours, tp.heure, tp.duree,
+               v.matricule, c.nom||' '||c.prenom as chauffeur, tp.prix, tp.actif
+        FROM trajet_template tp
+        LEFT JOIN ville vd ON tp.ville_depart_id = vd.id
+        LEFT JOIN ville va ON tp.ville_arrivee_id = va.id
+        LEFT JOIN vehicule v ON tp.vehicule_id = v.id
+        LEFT JOIN chauffeur c ON tp.chauffeur_id = c.id
+        ORDER BY vd.nom, va.nom, tp.heure
+    """,
+
+    # ── Planning (scheduling.py) ──
+    # creneaux occupes par vehicule / chauffeur, pour l'index des conflits ; sans
+    # arrivee valide, le trajet compte pour :duree (scheduling.DEFAULT_DURATION)
+    "scheduling.intervals": """
+        SELECT id, vehicule_id, chauffeur_id, heure_depart,
+               CASE WHEN heure_arrivee > heure_depart THEN heure_arrivee
+                    ELSE strftime('%Y-%m-%d %H:%M', heure_depart, :duree) END
+        FROM trajet
+        WHERE heure_depart IS NOT NULL AND (vehicule_id IS NOT NULL OR chauffeur_id IS NOT NULL)
+    """,
+    "scheduling.new_trajets": """
+        SELECT id, vehicule_id, chauffeur_id, heure_depart,
+               CASE WHEN heure_arrivee > heure_depart THEN heure_arrivee
+                    ELSE strftime('%Y-%m-%d %H:%M', heure_depart, :duree) END
+        FROM trajet
+        WHERE id > :after_id AND (vehicule_id IS NOT NULL OR chauffeur_id IS NOT NULL)
+    """,
+    "scheduling.interval": """
+        SELECT id, vehicule_id, chauffeur_id, heure_depart,
+               CASE WHEN heure_arrivee > heure_depart THEN heure_arrivee
+                    ELSE strftime('%Y-%m-%d %H:%M', heure_depart, :duree) END
+        FROM trajet
+        WHERE id = :id AND heure_depart IS NOT NULL AND (vehicule_id IS NOT NULL OR chauffeur_id IS NOT NULL)
+    """,
+    "scheduling.trajet": """
+        SELECT t.id, vd.nom as depart, va.nom as arrivee, t.heure_depart, t.heure_arrivee
+        FROM trajet t
+        LEFT JOIN ville vd ON t.ville_depart_id = vd.id
+        LEFT JOIN ville va ON t.ville_arrivee_id = va.id
+        WHERE t.id = ?
+    """,
+
+    # ── Tableau de bord ──
+    # compteurs tenus a jour par triggers (migrations.STATS), une seule ligne
+    "dashboard.counts": """
+        SELECT nb_tickets, recettes, nb_trajets, nb_clients, nb_chauffeurs, nb_vehicules
+        FROM stats WHERE id = 1
+    """,
+    "dashboard.recent_tickets": """
+        SELECT tk.id, cl.nom||' '||cl.prenom,
+               vd.nom||' → '||va.nom, tk.montant, tk.date, tk.statut
+        FROM ticket tk
+        LEFT JOIN client cl ON tk.client_id = cl.id
+        LEFT JOIN trajet t ON tk.trajet_id = t.id
+        LEFT JOIN ville vd ON t.ville_depart_id = vd.id
+        LEFT JOIN ville va ON t.ville_arrivee_id = va.id
+        ORDER BY tk.id DESC LIMIT 10
+    """,
+    "dashboard.upcoming_trips": """
+        SELECT vd.nom, va.nom, t.heure_depart, t.heure_arrivee,
+               c.nom||' '||c.prenom, v.matricule
+        FROM trajet t
+        LEFT JOIN ville vd ON t.ville_depart_id = vd.id
+        LEFT JOIN ville va ON t.ville_arrivee_id = va.id
+        LEFT JOIN chauffeur c ON t.chauffeur_id = c.id
+        LEFT JOIN vehicule v ON t.vehicule_id = v.id
+        WHERE t.heure_depart >= datetime('now')
+        ORDER BY t.heure_depart ASC LIMIT 5
+    """,
+
+    # ── Connexion ──
+    "auth.user": "SELECT * FROM user WHERE identifiant = ?",
+
+    # ── Rapports ──
+    # une ligne par ticket paye de la periode (idx_ticket_rapport), agregee par
+    # reports.py ; :len = 10 pour un rapport par jour, 7 par mois
+    "reports.societe": """
+        SELECT substr(jour, 1, :len), societe_id, nb_tickets, recettes
+        FROM stats_jour WHERE jour >= :debut AND jour < :fin
+    """,
+    "reports.trajet": """
+        SELECT substr(tk.date, 1, :len), t.ville_depart_id, t.ville_arrivee_id, tk.montant
+        FROM ticket tk LEFT JOIN trajet t ON tk.trajet_id = t.id
+        WHERE tk.statut = 'payé' AND tk.date >= :debut AND tk.date < :fin
+    """,
+    "reports.agent": """
+        SELECT substr(tk.date, 1, :len), tk.user_id, tk.montant
+        FROM ticket tk
+        WHERE tk.statut = 'payé' AND tk.date >= :debut AND tk.date < :fin
+    """,
+    "reports.chauffeur": """
+        SELECT substr(tk.date, 1, :len), t.chauffeur_id, t.vehicule_id, tk.montant
+        FROM ticket tk LEFT JOIN trajet t ON tk.trajet_id = t.id
+        WHERE tk.statut = 'payé' AND tk.date >= :debut AND tk.date < :fin
+    """,
+    "reports.noms.societe": "SELECT id, nom FROM societe",
+    "reports.noms.ville": "SELECT id, nom FROM ville",
+    "reports.noms.user": "SELECT id, nom||' '||prenom FROM user",
+    "reports.noms.chauffeur": "SELECT id, nom||' '||prenom FROM chauffeur",
+    "reports.noms.vehicule": "SELECT id, matricule FROM vehicule",
+})
+
+
+def fetchall(conn, name, params=()):
+    return conn.execute(QUERIES[name], params).fetchall()
+
+
+def fetchmany(conn, name, params=(), size=1000):
+    # parcours par paquets de size lignes (rapports, exports) : la memoire reste
+    # bornee ; le chronometrage (profiling.py) ne compte que le temps de SQLite
+    cur = conn.execute(QUERIES[name], params)
+    try:
+        while True:
+            rows = cur.fetchmany(size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cur.close()
+
+
+def fetchone(conn, name, params=()):
+    return conn.execute(QUERIES[name], params).fetchone()
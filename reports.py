@@ -0,0 +1,263 @@
+import pandas as pd
+from PySide6 import QtWidgets, QtCore
+import queries
+from database import read_connection
+from styles import primary_btn, section_title, make_table
+
+# lignes lues par paquet : la memoire depend du nombre de groupes du rapport,
+# pas du nombre de tickets de la periode
+CHUNK_ROWS = 100_000
+PERIODS = {"jour": 10, "mois": 7}
+
+# cle -> (titre, requete, [(colonne, en-tete, table des noms)], colonnes de valeurs).
+# Les requetes renvoient des ids ; les noms ne sont joints qu'apres l'agregation.
+REPORTS = {
+    "societe": ("Recettes par société", "reports.societe",
+                [("societe_id", "Société", "societe")], ["nb_tickets", "recettes"]),
+    "trajet": ("Recettes par trajet", "reports.trajet",
+               [("depart_id", "Départ", "ville"), ("arrivee_id", "Arrivée", "ville")], ["montant"]),
+    "agent": ("Recettes par agent", "reports.agent",
+              [("user_id", "Agent", "user")], ["montant"]),
+    "chauffeur": ("Recettes par chauffeur / véhicule", "reports.chauffeur",
+                  [("chauffeur_id", "Chauffeur", "chauffeur"), ("vehicule_id", "Véhicule", "vehicule")],
+                  ["montant"]),
+}
+HEADERS = {"periode": "Période", "nb_tickets": "Tickets", "recettes": "Recettes (FCFA)"}
+
+
+def _aggregate(chunk, keys, values):
+    groups = chunk.groupby(keys, dropna=False)
+    if values == ["montant"]:
+        return groups["montant"].agg(nb_tickets="size", recettes="sum")
+    return groups[["nb_tickets", "recettes"]].sum()
+
+
+def revenue(report, debut, fin, period="jour", conn=None):
+    # debut et fin : "AAAA-MM-JJ", fin incluse. Une seule lecture de la periode ;
+    # chaque paquet est agrege (groupby) puis ajoute au total courant.
+    title, statement, dims, values = REPORTS[report]
+    keys = ["periode"] + [col for col, _, _ in dims]
+    end = (pd.Timestamp(fin) + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+    params = {"len": PERIODS[period], "debut": debut, "fin": end}
+    if conn is None:
+        with read_connection() as conn:
+            return revenue(report, debut, fin, period, conn)
+    total = None
+    for rows in queries.fetchmany(conn, statement, params, CHUNK_ROWS):
+        part = _aggregate(pd.DataFrame.from_records(rows, columns=keys + values), keys, values)
+        total = part if total is None else pd.concat([total, part]).groupby(level=keys, dropna=False).sum()
+    if total is None:
+        df = pd.DataFrame(columns=keys + ["nb_tickets", "recettes"])
+    else:
+        df = total.reset_index()
+    for col, _, names in dims:
+        labels = dict(queries.fetchall(conn, f"reports.noms.{names}"))
+        df[col] = df[col].map(labels).fillna("—")
+    df["nb_tickets"] = df["nb_tickets"].astype("int64")
+    df = df.sort_values(["periode", "recettes"], ascending=[True, False], ignore_index=True)
+    return df.rename(columns={**HEADERS, **{col: header for col, header, _ in dims}})
+
+
+def totals(df):
+    return int(df[HEADERS["nb_tickets"]].sum()), float(df[HEADERS["recettes"]].sum())
+
+
+def to_xlsx(df, path, title):
+    # classeur en ecriture seule : les lignes partent sur le disque au fil de l'eau
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title[:31])
+    ws.append(list(df.columns))
+    for row in df.itertuples(index=False):
+        ws.append([v.item() if hasattr(v, "item") else v for v in row])
+    nb, montant = totals(df)
+    ws.append(["Total"] + [""] * (len(df.columns) - 3) + [nb, montant])
+    wb.save(path)
+
+
+def to_pdf(df, path, title, subtitle=""):
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    styles = getSampleStyleSheet()
+    doc = SimpleDocTemplate(path, pagesize=landscape(A4), title=title)
+    story = [Paragraph(title, styles["Title"])]
+    if subtitle:
+        story.append(Paragraph(subtitle, styles["Normal"]))
+    story.append(Spacer(1, 12))
+    style = TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1a3a8a")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("FONTSIZE", (0, 0), (-1, -1), 9),
+        ("ALIGN", (-2, 0), (-1, -1), "RIGHT"),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f0f2f5")]),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#d0d7de")),
+    ])
+    header = list(df.columns)
+    body = [[*row[:-2], f"{row[-2]:,}", f"{row[-1]:,.0f}"] for row in df.itertuples(index=False)]
+    nb, montant = totals(df)
+    body.append(["Total"] + [""] * (len(header) - 3) + [f"{nb:,}", f"{montant:,.0f}"])
+    # un tableau par bloc de lignes : reportlab ne met pas en page un seul
+    # tableau geant d'un coup
+    for start in range(0, len(body), 1000):
+        table = Table([header] + body[start:start + 1000], repeatRows=1)
+        table.setStyle(style)
+        story.append(table)
+    doc.build(story)
+
+
+class _Job(QtCore.QRunnable):
+    # calcul ou export hors du thread de l'interface ; done(numero, resultat, erreur)
+    def __init__(self, done, number, fn, *args):
+        super().__init__()
+        self.done = done
+        self.number = number
+        self.fn = fn
+        self.args = args
+
+    def run(self):
+        try:
+            result = self.fn(*self.args)
+        except Exception as e:
+            self.done.emit(self.number, None, str(e))
+            return
+        self.done.emit(self.number, result, "")
+
+
+class ReportsPage(QtWidgets.QWidget):
+    _computed = QtCore.Signal(int, object, str)
+    _exported = QtCore.Signal(int, object, str)
+
+    def __init__(self, current_user):
+        super().__init__()
+        self.current_user = current_user
+        self._number = 0
+        self._df = None
+        self._criteria = None
+        self._setup_ui()
+        self._computed.connect(self._show)
+        self._exported.connect(self._export_done)
+
+    def _setup_ui(self):
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(30, 30, 30, 30)
+        layout.setSpacing(20)
+
+        hdr = QtWidgets.QHBoxLayout()
+        hdr.addWidget(section_title("📊 Rapports"))
+        hdr.addStretch()
+        self.btn_xlsx = primary_btn("📗 Excel", "#3fb950")
+        self.btn_xlsx.clicked.connect(lambda: self.export("xlsx"))
+        self.btn_pdf = primary_btn("📕 PDF", "#f85149", "#fff")
+        self.btn_pdf.clicked.connect(lambda: self.export("pdf"))
+        hdr.addWidget(self.btn_xlsx)
+        hdr.addWidget(self.btn_pdf)
+        layout.addLayout(hdr)
+
+        flt = QtWidgets.QHBoxLayout()
+        self.report_cb = QtWidgets.QComboBox()
+        for key, (title, _, _, _) in REPORTS.items():
+            self.report_cb.addItem(title, key)
+        self.period_cb = QtWidgets.QComboBox()
+        self.period_cb.addItem("Par jour", "jour")
+        self.period_cb.addItem("Par mois", "mois")
+        today = QtCore.QDate.currentDate()
+        self.debut = QtWidgets.QDateEdit(QtCore.QDate(today.year(), today.month(), 1))
+        self.fin = QtWidgets.QDateEdit(today)
+        for d in (self.debut, self.fin):
+            d.setCalendarPopup(True)
+            d.setDisplayFormat("dd/MM/yyyy")
+        btn_run = primary_btn("Afficher")
+        btn_run.clicked.connect(self.run)
+        flt.addWidget(self.report_cb, 2)
+        flt.addWidget(self.period_cb, 1)
+        flt.addWidget(QtWidgets.QLabel("Du"))
+        flt.addWidget(self.debut, 1)
+        flt.addWidget(QtWidgets.QLabel("au"))
+        flt.addWidget(self.fin, 1)
+        flt.addWidget(btn_run)
+        layout.addLayout(flt)
+
+        self.table = make_table([HEADERS["periode"], HEADERS["nb_tickets"], HEADERS["recettes"]])
+        layout.addWidget(self.table)
+        self.status = QtWidgets.QLabel("")
+        self.status.setStyleSheet("color:#6e7781;font-size:12px;")
+        layout.addWidget(self.status)
+        self._set_exportable(False)
+
+    def _set_exportable(self, enabled):
+        self.btn_xlsx.setEnabled(enabled)
+        self.btn_pdf.setEnabled(enabled)
+
+    def refresh(self):
+        # recalcule le dernier rapport affiche (ventes depuis)
+        if self._criteria:
+            self._start(self._criteria)
+
+    def run(self):
+        debut = self.debut.date().toString("yyyy-MM-dd")
+        fin = self.fin.date().toString("yyyy-MM-dd")
+        if debut > fin:
+            QtWidgets.QMessageBox.warning(self, "Erreur", "La date de début est après la date de fin.")
+            return
+        self._start((self.report_cb.currentData(), debut, fin, self.period_cb.currentData()))
+
+    def _start(self, criteria):
+        self._number += 1
+        self._criteria = criteria
+        self._set_exportable(False)
+        self.status.setText("Calcul en cours…")
+        QtCore.QThreadPool.globalInstance().start(_Job(self._computed, self._number, revenue, *criteria))
+
+    def _show(self, number, df, error):
+        if number != self._number:
+            return
+        if error:
+            self.status.setText("")
+            QtWidgets.QMessageBox.warning(self, "Erreur", error)
+            return
+        self._df = df
+        self.table.clear()
+        self.table.setColumnCount(len(df.columns))
+        self.table.setHorizontalHeaderLabels(list(df.columns))
+        self.table.setRowCount(len(df))
+        money = df.columns[-1]
+        for i, row in enumerate(df.itertuples(index=False)):
+            for j, val in enumerate(row):
+                text = f"{val:,.0f}" if df.columns[j] == money else str(val)
+                item = QtWidgets.QTableWidgetItem(text)
+                if j >= len(row) - 2:
+                    item.setTextAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+                self.table.setItem(i, j, item)
+        nb, montant = totals(df)
+        self.status.setText(f"{len(df)} ligne(s) — {nb} ticket(s) — {montant:,.0f} FCFA")
+        self._set_exportable(len(df) > 0)
+
+    def _title(self):
+        report, debut, fin, period = self._criteria
+        return REPORTS[report][0], f"Du {debut} au {fin} — par {period}"
+
+    def export(self, fmt):
+        if self._df is None:
+            return
+        title, subtitle = self._title()
+        report, debut, fin, _ = self._criteria
+        name = f"rapport_{report}_{debut}_{fin}.{fmt}"
+        filters = "Excel (*.xlsx)" if fmt == "xlsx" else "PDF (*.pdf)"
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Exporter le rapport", name, filters)
+        if not path:
+            return
+        if fmt == "xlsx":
+            job = _Job(self._exported, 0, to_xlsx, self._df, path, title)
+        else:
+            job = _Job(self._exported, 0, to_pdf, self._df, path, title, subtitle)
+        self.status.setText("Export en cours…")
+        QtCore.QThreadPool.globalInstance().start(job)
+
+    def _export_done(self, _, result, error):
+        if error:
+            self.status.setText("")
+            QtWidgets.QMessageBox.warning(self, "Erreur", error)
+        else:
+            self.status.setText("Rapport exporté.")
@@ -0,0 +1,240 @@
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+import queries
+from database import read_connection, add_change_listener
+
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+# trajet sans heure d'arrivee (ou arrivee avant le depart) : on compte cette duree
+DEFAULT_DURATION = timedelta(hours=1)
+_SQL_DURATION = f"+{int(DEFAULT_DURATION.total_seconds() // 60)} minutes"
+RESOURCES = ("vehicule", "chauffeur")
+
+
+class ScheduleConflict(Exception):
+    # conflicts : liste renvoyee par Scheduler.conflicts() / check() ;
+    # lines : le detail lisible (describe), les 20 premiers dans le message
+    def __init__(self, conflicts, lines=()):
+        text = f"{len(conflicts)} conflit(s) de planning (véhicule ou chauffeur déjà pris)"
+        if lines:
+            text += " :\n" + "\n".join(lines[:20])
+            if len(lines) > 20:
+                text += f"\n… et {len(lines) - 20} autre(s)"
+        super().__init__(text)
+        self.conflicts = conflicts
+
+
+def interval(start, end):
+    # heures "AAAA-MM-JJ HH:MM" : comparees comme des chaines
+    if end and end > start:
+        return start, end
+    return start, (datetime.strptime(start, TIME_FORMAT) + DEFAULT_DURATION).strftime(TIME_FORMAT)
+
+
+class _Timeline:
+    # trajets d'une ressource tries par depart. Les trajets qui commencent avant
+    # "end" sont un prefixe (bisect) ; parmi eux, ceux qui finissent apres
+    # "start" sont trouves dans un arbre de segments du max des arrivees, en
+    # sautant les branches qui finissent toutes avant : O(log n) par trajet
+    # trouve, meme avec un trajet tres long au debut.
+    __slots__ = ("starts", "ends", "ids", "_tree")
+
+    def __init__(self, intervals):
+        intervals.sort()
+        self.starts = [s for s, _, _ in intervals]
+        self.ends = [e for _, e, _ in intervals]
+        self.ids = [i for _, _, i in intervals]
+        self._tree = None
+
+    def add(self, start, end, tid):
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, tid)
+        self._tree = None
+
+    def remove(self, start, tid):
+        i = bisect_left(self.starts, start)
+        while i < len(self.ids) and self.ids[i] != tid:
+            i += 1
+        if i < len(self.ids):
+            del self.starts[i], self.ends[i], self.ids[i]
+            self._tree = None
+
+    def _max_tree(self):
+        # tree[1] = arrivee max de tous les trajets, feuilles a partir de tree[size] ;
+        # reconstruit a la premiere question apres un changement
+        if self._tree is None:
+            size = 1
+            while size < len(self.ends):
+                size *= 2
+            tree = [""] * size + self.ends + [""] * (size - len(self.ends))
+            for node in range(size - 1, 0, -1):
+                left, right = tree[2 * node], tree[2 * node + 1]
+                tree[node] = left if left > right else right
+            self._tree = tree
+        return self._tree
+
+    def overlapping(self, start, end, exclude=None, first=False):
+        limit = bisect_left(self.starts, end)
+        if not limit:
+            return []
+        tree = self._max_tree()
+        size = len(tree) // 2
+        found = []
+        stack = [(1, 0, size)]
+        while stack:
+            node, lo, hi = stack.pop()
+            if lo >= limit or tree[node] <= start:
+                continue
+            if node >= size:
+                if self.ids[lo] != exclude:
+                    found.append(self.ids[lo])
+                    if first:
+                        break
+                continue
+            mid = (lo + hi) // 2
+            stack.append((2 * node + 1, mid, hi))
+            stack.append((2 * node, lo, mid))
+        return found
+
+    def busy(self, start, end, exclude=None):
+        return bool(self.overlapping(start, end, exclude, first=True))
+
+
+class Scheduler:
+    # index des creneaux occupes par vehicule et par chauffeur, construit depuis
+    # la table trajet a la premiere question puis tenu a jour trajet par trajet
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._index = None
+        # trajet -> (depart, arrivee, vehicule, chauffeur) tel qu'il est dans l'index
+        self._spans = {}
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+            self._spans = {}
+
+    def _timelines(self):
+        with self._lock:
+            if self._index is None:
+                spans = {kind: {} for kind in RESOURCES}
+                with read_connection() as conn:
+                    rows = queries.fetchall(conn, "scheduling.intervals", {"duree": _SQL_DURATION})
+                # la requete donne deja l'arrivee effective (voir interval)
+                for tid, vid, cid, dep, arr in rows:
+                    span = (dep, arr, tid)
+                    self._spans[tid] = (dep, arr, vid, cid)
+                    for kind, rid in zip(RESOURCES, (vid, cid)):
+                        if rid is not None:
+                            spans[kind].setdefault(rid, []).append(span)
+                self._index = {kind: {rid: _Timeline(lst) for rid, lst in by_id.items()}
+                               for kind, by_id in spans.items()}
+            return self._index
+
+    def _apply(self, tid, row):
+        # remplace dans l'index le trajet tid par row (None : trajet supprime
+        # ou sans vehicule ni chauffeur)
+        old = self._spans.pop(tid, None)
+        if old is not None:
+            for kind, rid in zip(RESOURCES, old[2:]):
+                if rid is not None:
+                    self._index[kind][rid].remove(old[0], tid)
+        if row is not None:
+            _, vid, cid, dep, arr = row
+            self._spans[tid] = (dep, arr, vid, cid)
+            for kind, rid in zip(RESOURCES, (vid, cid)):
+                if rid is not None:
+                    self._index[kind].setdefault(rid, _Timeline([])).add(dep, arr, tid)
+
+    def conflicts(self, vehicule_id, chauffeur_id, start, end, exclude=None):
+        # [(ressource, trajet)] qui chevauchent le creneau pour ce vehicule / chauffeur
+        start, end = interval(start, end)
+        found = []
+        with self._lock:
+            index = self._timelines()
+            for kind, rid in zip(RESOURCES, (vehicule_id, chauffeur_id)):
+                timeline = index[kind].get(rid) if rid is not None else None
+                if timeline:
+                    found.extend((kind, tid) for tid in timeline.overlapping(start, end, exclude))
+        return found
+
+    def free(self, kind, ids, start, end, exclude=None):
+        # parmi "ids", les vehicules / chauffeurs libres sur le creneau
+        start, end = interval(start, end)
+        with self._lock:
+            index = self._timelines()[kind]
+            return [rid for rid in ids if rid not in index or not index[rid].busy(start, end, exclude)]
+
+    def check(self, conn, after_id):
+        # trajets d'id > after_id, ecrits dans la transaction de conn mais pas encore
+        # dans l'index (trajets generes) : conflits avec l'existant et entre eux.
+        # Balayage par ressource des creneaux existants + nouveaux tries par depart.
+        rows = queries.fetchall(conn, "scheduling.new_trajets", {"after_id": after_id, "duree": _SQL_DURATION})
+        new = {kind: {} for kind in RESOURCES}
+        for tid, vid, cid, dep, arr in rows:
+            span = (dep, arr, tid)
+            for kind, rid in zip(RESOURCES, (vid, cid)):
+                if rid is not None:
+                    new[kind].setdefault(rid, []).append(span)
+        found = []
+        for kind, by_id in new.items():
+            for rid, spans in by_id.items():
+                added = {tid for _, _, tid in spans}
+                with self._lock:
+                    timeline = self._timelines()[kind].get(rid)
+                    if timeline:
+                        spans = spans + list(zip(timeline.starts, timeline.ends, timeline.ids))
+                spans.sort()
+                last_end, last_id = "", None
+                for start, end, tid in spans:
+                    if start < last_end and (tid in added or last_id in added):
+                        found.append((kind, rid, tid, last_id))
+                    if end > last_end:
+                        last_end, last_id = end, tid
+        return found
+
+    def _on_change(self, changes):
+        changed = {(op, rowid) for table, op, rowid in changes if table == "trajet"}
+        if not changed:
+            return
+        if any(op == "reload" for op, _ in changed):
+            self.invalidate()
+            return
+        # lignes relues avant de prendre le verrou : les questions en cours ne
+        # sont pas bloquees par la lecture
+        with read_connection() as conn:
+            rows = {tid: queries.fetchone(conn, "scheduling.interval", {"id": tid, "duree": _SQL_DURATION})
+                    for _, tid in changed}
+        with self._lock:
+            if self._index is None:
+                return
+            for tid, row in rows.items():
+                self._apply(tid, row)
+
+
+def _label(conn, tid):
+    row = queries.fetchone(conn, "scheduling.trajet", (tid,))
+    if row is None:
+        return f"trajet #{tid}"
+    return (f"trajet #{row['id']} {row['depart']} → {row['arrivee']} "
+            f"({row['heure_depart']} – {row['heure_arrivee'] or '?'})")
+
+
+def describe(conflicts, conn):
+    # lignes lisibles pour les messages ; conflicts vient de conflicts() ou de check()
+    labels = {"vehicule": "Véhicule", "chauffeur": "Chauffeur"}
+    lines = []
+    for conflict in conflicts:
+        if len(conflict) == 2:
+            lines.append(f"{labels[conflict[0]]} : {_label(conn, conflict[1])}")
+        else:
+            kind, _, tid, other = conflict
+            lines.append(f"{labels[kind]} : {_label(conn, tid)} chevauche {_label(conn, other)}")
+    return lines
+
+
+scheduler = Scheduler()
+add_change_listener(scheduler._on_change)
+
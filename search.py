@@ -0,0 +1,94 @@
+import sqlite3
+import threading
+from PySide6 import QtCore
+from backend import backend
+
+SEARCH_DELAY_MS = 300
+
+
+class _SearchJob(QtCore.QRunnable):
+    def __init__(self, controller, generation, criteria):
+        super().__init__()
+        self.controller = controller
+        self.generation = generation
+        self.criteria = criteria
+
+    def run(self):
+        ctl = self.controller
+        # conn vaut None pour un guichet distant : la requete part au serveur
+        with backend().search_connection() as conn:
+            if not ctl._begin(self.generation, conn):
+                return
+            try:
+                result = ctl.run_query(conn, self.criteria)
+            except sqlite3.OperationalError:
+                # requete interrompue par une frappe plus recente
+                if ctl._is_current(self.generation):
+                    raise
+                return
+            finally:
+                ctl._end(conn)
+            ctl._done.emit(self.generation, self.criteria, result)
+
+
+class SearchController(QtCore.QObject):
+    # recherche "au fil de la frappe" : on attend delay_ms sans nouvelle frappe,
+    # la requete tourne dans le QThreadPool et une recherche plus recente
+    # interrompt l'ancienne (sqlite3.Connection.interrupt).
+    # run_query(conn, criteria) s'execute hors du thread GUI : elle ne doit pas toucher aux widgets.
+    results_ready = QtCore.Signal(object, object)
+    _done = QtCore.Signal(int, object, object)
+
+    def __init__(self, run_query, delay_ms=SEARCH_DELAY_MS, parent=None):
+        super().__init__(parent)
+        self.run_query = run_query
+        self._generation = 0
+        self._criteria = None
+        self._conn = None
+        self._lock = threading.Lock()
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self._launch)
+        self._done.connect(self._on_done)
+
+    def set_delay(self, delay_ms):
+        self._timer.setInterval(delay_ms)
+
+    def submit(self, criteria, immediate=False):
+        with self._lock:
+            self._generation += 1
+            self._criteria = criteria
+            if self._conn is not None:
+                self._conn.interrupt()
+        if immediate:
+            # start(0) changerait l'intervalle du minuteur pour les frappes suivantes
+            self._timer.stop()
+            self._launch()
+        else:
+            self._timer.start()
+
+    def _launch(self):
+        with self._lock:
+            job = _SearchJob(self, self._generation, self._criteria)
+        QtCore.QThreadPool.globalInstance().start(job)
+
+    def _is_current(self, generation):
+        with self._lock:
+            return generation == self._generation
+
+    def _begin(self, generation, conn):
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._conn = conn
+            return True
+
+    def _end(self, conn):
+        with self._lock:
+            if self._conn is conn:
+                self._conn = None
+
+    def _on_done(self, generation, criteria, result):
+        if self._is_current(generation):
+            self.results_ready.emit(criteria, result)
@@ -0,0 +1,260 @@
+import threading
+import sqlite3
+from database import read_connection, transaction, add_change_listener, table_versions
+
+# nombre de places quand le trajet n'a pas de vehicule (ancienne limite du formulaire)
+DEFAULT_CAPACITY = 200
+
+
+class SeatUnavailable(Exception):
+    pass
+
+
+def _seat_taken(error):
+    # seule la violation de idx_ticket_siege veut dire "siege deja vendu" ;
+    # une cle etrangere ou un NOT NULL reste une vraie erreur
+    return (getattr(error, "sqlite_errorcode", None) == sqlite3.SQLITE_CONSTRAINT_UNIQUE
+            and "ticket.trajet_id, ticket.siege" in str(error))
+
+
+class _SeatMap:
+    # bit i de "bits" = siege i+1 vendu ; "tickets" = {id du ticket: siege},
+    # pour liberer le siege d'un ticket modifie sans relire le trajet
+    __slots__ = ("capacity", "bits", "taken", "tickets")
+
+    def __init__(self, capacity, seats):
+        self.capacity = capacity
+        self.bits = 0
+        self.tickets = {}
+        for siege in seats:
+            if 1 <= siege <= capacity:
+                self.bits |= 1 << (siege - 1)
+        self.taken = bin(self.bits).count("1")
+
+    def is_free(self, siege):
+        return 1 <= siege <= self.capacity and not self.bits >> (siege - 1) & 1
+
+    def next_free(self, start=1):
+        free = ~self.bits & ((1 << self.capacity) - 1)
+        free >>= max(start, 1) - 1
+        if not free:
+            return None
+        return (free & -free).bit_length() + max(start, 1) - 1
+
+    def first_free(self, count):
+        # les "count" premiers sieges libres, en un seul parcours du bitmap
+        seats = []
+        free = ~self.bits & ((1 << self.capacity) - 1)
+        while free and len(seats) < count:
+            low = free & -free
+            seats.append(low.bit_length())
+            free ^= low
+        return seats
+
+    def copy(self):
+        seat_map = _SeatMap(self.capacity, ())
+        seat_map.bits, seat_map.taken = self.bits, self.taken
+        seat_map.tickets = dict(self.tickets)
+        return seat_map
+
+    def sold(self):
+        seats = []
+        bits = self.bits
+        while bits:
+            low = bits & -bits
+            seats.append(low.bit_length())
+            bits ^= low
+        return seats
+
+    def take(self, siege, ticket_id=None):
+        if ticket_id is not None:
+            self.tickets[ticket_id] = siege
+        if self.is_free(siege):
+            self.bits |= 1 << (siege - 1)
+            self.taken += 1
+
+    def release(self, siege):
+        if 1 <= siege <= self.capacity and not self.is_free(siege):
+            self.bits &= ~(1 << (siege - 1))
+            self.taken -= 1
+
+    def drop(self, ticket_id):
+        # le ticket n'occupe plus son siege (annule, supprime ou deplace)
+        siege = self.tickets.pop(ticket_id, None)
+        if siege is not None:
+            self.release(siege)
+
+
+class SeatInventory:
+    # plan des places de chaque trajet garde en memoire : les questions du
+    # formulaire (siege libre ? prochain libre ? places restantes ?) ne relisent
+    # pas la table ticket. La base reste l'arbitre : reserve() reverifie le
+    # siege dans la transaction d'ecriture et l'index unique
+    # idx_ticket_siege (trajet_id, siege) refuse un doublon venu d'un autre poste.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._maps = {}
+        self._external = None
+
+    def _map(self, trajet_id):
+        # ventes d'un autre processus (autre poste sur la meme base) : elles ne
+        # passent pas par _on_change, tout le cache est relu
+        external = table_versions(())[0]
+        with self._lock:
+            if external != self._external:
+                self._maps.clear()
+                self._external = external
+            seat_map = self._maps.get(trajet_id)
+        if seat_map is None:
+            with read_connection() as conn:
+                seat_map = self._read(conn, trajet_id)
+            with self._lock:
+                seat_map = self._maps.setdefault(trajet_id, seat_map)
+        return seat_map
+
+    def _read(self, conn, trajet_id):
+        row = conn.execute("""SELECT v.nbre_place FROM trajet t
+                              LEFT JOIN vehicule v ON t.vehicule_id = v.id WHERE t.id=?""",
+                           (trajet_id,)).fetchone()
+        capacity = (row[0] if row else None) or DEFAULT_CAPACITY
+        rows = conn.execute(
+            "SELECT id, siege FROM ticket WHERE trajet_id=? AND statut != 'annulé' AND siege IS NOT NULL",
+            (trajet_id,)).fetchall()
+        seat_map = _SeatMap(capacity, [r[1] for r in rows])
+        seat_map.tickets = {r[0]: r[1] for r in rows}
+        return seat_map
+
+    def capacity(self, trajet_id):
+        return self._map(trajet_id).capacity
+
+    def is_free(self, trajet_id, siege):
+        return self._map(trajet_id).is_free(siege)
+
+    def next_free(self, trajet_id, start=1):
+        return self._map(trajet_id).next_free(start)
+
+    def remaining(self, trajet_id):
+        seat_map = self._map(trajet_id)
+        return seat_map.capacity - seat_map.taken
+
+    def plan(self, trajet_id):
+        # copie du plan d'un trajet : le formulaire de vente (et le serveur,
+        # GET /trajets/<id>/places) l'interroge sans prendre le verrou
+        seat_map = self._map(trajet_id)
+        with self._lock:
+            return seat_map.copy()
+
+    def invalidate(self, trajet_id=None):
+        # a appeler quand un trajet change de vehicule ou qu'une capacite change
+        with self._lock:
+            if trajet_id is None:
+                self._maps.clear()
+            else:
+                self._maps.pop(trajet_id, None)
+
+    def reserve(self, trajet_id, siege, client_id, user_id, montant, date):
+        # vend le siege ou leve SeatUnavailable ; renvoie l'id du ticket
+        seat_map = self._map(trajet_id)
+        if not 1 <= siege <= seat_map.capacity:
+            raise SeatUnavailable(f"Le siège {siege} n'existe pas (capacité {seat_map.capacity}).")
+        try:
+            with transaction() as conn:
+                taken = conn.execute("""SELECT 1 FROM ticket
+                                        WHERE trajet_id=? AND siege=? AND statut != 'annulé'""",
+                                     (trajet_id, siege)).fetchone()
+                if taken:
+                    raise SeatUnavailable(f"Le siège {siege} est déjà vendu.")
+                cur = conn.execute("""INSERT INTO ticket (date, siege, montant, statut, trajet_id, client_id, user_id)
+                                      VALUES (?,?,?,?,?,?,?)""",
+                                   (date, siege, montant, "payé", trajet_id, client_id, user_id))
+        except SeatUnavailable:
+            # vendu depuis un autre poste : on relit le plan de ce trajet
+            self.invalidate(trajet_id)
+            raise
+        except sqlite3.IntegrityError as e:
+            if not _seat_taken(e):
+                raise
+            self.invalidate(trajet_id)
+            raise SeatUnavailable(f"Le siège {siege} est déjà vendu.") from None
+        with self._lock:
+            seat_map.take(siege, cur.lastrowid)
+        return cur.lastrowid
+
+    def reserve_many(self, trajet_id, client_ids, user_id, montant, date):
+        # vente groupee : un ticket par passager (client_ids), sieges attribues
+        # d'un coup parmi les premiers libres, une seule transaction et un seul
+        # executemany. Tout est vendu ou rien. Renvoie les sieges attribues.
+        if not client_ids:
+            return []
+        try:
+            with transaction() as conn:
+                # plan relu dans la transaction d'ecriture : il ne peut plus bouger
+                seat_map = self._read(conn, trajet_id)
+                free = seat_map.capacity - seat_map.taken
+                if len(client_ids) > free:
+                    raise SeatUnavailable(f"Il ne reste que {free} place(s) sur ce trajet.")
+                seats = seat_map.first_free(len(client_ids))
+                conn.executemany("""INSERT INTO ticket (date, siege, montant, statut, trajet_id, client_id, user_id)
+                                    VALUES (?,?,?,?,?,?,?)""",
+                                 [(date, siege, montant, "payé", trajet_id, client_id, user_id)
+                                  for siege, client_id in zip(seats, client_ids)])
+                # relu pour avoir l'id des nouveaux tickets
+                seat_map = self._read(conn, trajet_id)
+        except sqlite3.IntegrityError as e:
+            if not _seat_taken(e):
+                raise
+            self.invalidate(trajet_id)
+            raise SeatUnavailable("Des sièges ont été vendus entre-temps, réessayez.") from None
+        with self._lock:
+            self._maps[trajet_id] = seat_map
+        return seats
+
+    def cancel(self, ticket_id):
+        # le siege est libere dans le plan par _on_change
+        with transaction() as conn:
+            conn.execute("UPDATE ticket SET statut='annulé' WHERE id=?", (ticket_id,))
+
+    def _on_change(self, changes):
+        # ecritures faites ailleurs dans l'application (page des tickets,
+        # import, modification d'un trajet ou d'un vehicule). Un ticket
+        # modifie ou supprime libere le siege qu'il avait dans les plans en
+        # memoire, puis on relit seulement les tickets changes pour reprendre
+        # leur siege actuel (eventuellement sur un autre trajet).
+        tickets, trajets, vehicules = set(), set(), set()
+        for table, op, rowid in changes:
+            if table in ("ticket", "trajet", "vehicule") and op == "reload":
+                self.invalidate()
+                return
+            elif table == "ticket":
+                tickets.add(rowid)
+            elif table == "trajet":
+                trajets.add(rowid)
+            elif table == "vehicule":
+                vehicules.add(rowid)
+        if not (tickets or trajets or vehicules):
+            return
+        rows = []
+        with read_connection() as conn:
+            if vehicules:
+                marks = ",".join("?" * len(vehicules))
+                trajets.update(r[0] for r in conn.execute(
+                    f"SELECT id FROM trajet WHERE vehicule_id IN ({marks})", list(vehicules)))
+            if tickets:
+                marks = ",".join("?" * len(tickets))
+                rows = conn.execute(f"""SELECT id, trajet_id, siege FROM ticket
+                                        WHERE id IN ({marks}) AND statut != 'annulé' AND siege IS NOT NULL""",
+                                    list(tickets)).fetchall()
+        with self._lock:
+            for trajet_id in trajets:
+                self._maps.pop(trajet_id, None)
+            if tickets:
+                for seat_map in self._maps.values():
+                    for ticket_id in tickets & seat_map.tickets.keys():
+                        seat_map.drop(ticket_id)
+            for ticket_id, trajet_id, siege in rows:
+                seat_map = self._maps.get(trajet_id)
+                if seat_map is not None:
+                    seat_map.take(siege, ticket_id)
+
+inventory = SeatInventory()
+add_change_listener(inventory._on_change)
@@ -0,0 +1,455 @@
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+import database
+import queries
+from database import read_connection, transaction, add_change_listener, fts_match
+from pagination import MAX_ID
+from seats import inventory, SeatUnavailable
+from writequeue import write_queue, MAX_LATENCY
+
+# mode serveur : python server.py --db /chemin/gestransport.db --port 8765
+# Ce processus est le seul a ecrire dans la base, par un seul thread (file
+# d'ecriture) ; les guichets (main.py --server http://hote:8765) vendent sur le
+# meme plan des places.
+DEFAULT_PORT = 8765
+READ_THREADS = 8
+MAX_BODY = 1 << 20
+# changements gardes pour GET /changes ; un guichet plus en retard recharge tout
+CHANGES_KEPT = 10_000
+# comme events.BULK_CHANGES : au-dela, un commit est publie comme un "reload"
+BULK_CHANGES = 200
+SEARCH_LIMIT = 500
+
+# requetes du registre qu'un guichet distant peut lire (jamais auth.*)
+REMOTE_QUERIES = {
+    "tickets.page", "tickets.row", "tickets.form_clients", "tickets.form_trajets",
+    "tickets.print", "tickets.print_trajet",
+    "dashboard.counts", "dashboard.recent_tickets", "dashboard.upcoming_trips",
+    "trajets.page", "trajets.row", "clients.page", "clients.row",
+}
+
+STATUS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+          409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M")
+
+
+def _field(data, key, kind, required=True):
+    # champ du corps JSON (ou de la query string) ; 400 s'il manque ou ne se convertit pas
+    value = data.get(key)
+    if value is None or value == "":
+        if required:
+            raise HttpError(400, f"Champ manquant : {key}")
+        return None
+    if isinstance(value, (dict, list)):
+        raise HttpError(400, f"Champ invalide : {key}")
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, f"Champ invalide : {key}") from None
+
+
+def _body(body):
+    try:
+        data = json.loads(body) if body else {}
+    except ValueError:
+        raise HttpError(400, "Corps JSON invalide.") from None
+    if not isinstance(data, dict):
+        raise HttpError(400, "Corps JSON invalide : objet attendu.")
+    return data
+
+
+def _table(rows):
+    return {"columns": list(rows[0].keys()) if rows else [], "rows": [tuple(r) for r in rows]}
+
+
+# ── Operations d'ecriture : executees par la file d'ecriture (writequeue.py),
+# commits groupes, chacune dans son SAVEPOINT ──
+
+def _sell(user, trajet_id, siege, client_id, montant):
+    if siege is None:
+        siege = inventory.next_free(trajet_id)
+        if siege is None:
+            raise SeatUnavailable("Plus aucune place libre sur ce trajet.")
+    return {"id": inventory.reserve(trajet_id, siege, client_id, user["id"], montant, _now()),
+            "siege": siege}
+
+
+def _sell_group(user, trajet_id, client_ids, montant):
+    return {"sieges": inventory.reserve_many(trajet_id, client_ids, user["id"], montant, _now())}
+
+
+def _cancel(ticket_id):
+    inventory.cancel(ticket_id)
+    return {"ok": True}
+
+
+def _add_client(nom, prenom, telephone):
+    with transaction() as conn:
+        cur = conn.execute("INSERT INTO client (nom,prenom,telephone) VALUES (?,?,?)", (nom, prenom, telephone))
+    return {"id": cur.lastrowid}
+
+
+class ChangeLog:
+    # changements publies apres chaque commit, numerotes, pour GET /changes
+    # (long polling : la requete attend le prochain commit)
+    def __init__(self, loop):
+        self.loop = loop
+        # numeros a partir de l'heure de demarrage : ceux d'un guichet qui a connu
+        # le serveur precedent sont hors de la plage connue (rechargement complet)
+        self.seq = time.time_ns() // 1_000_000
+        self.entries = deque(maxlen=CHANGES_KEPT)
+        self._event = asyncio.Event()
+        add_change_listener(self._on_commit)
+
+    def _on_commit(self, changes):
+        # thread de l'ecrivain
+        counts = {}
+        for table, _, _ in changes:
+            counts[table] = counts.get(table, 0) + 1
+        bulk = {table for table, count in counts.items() if count > BULK_CHANGES}
+        changes = [(table, "reload", 0) for table in bulk] + [c for c in changes if c[0] not in bulk]
+        self.loop.call_soon_threadsafe(self._append, changes)
+
+    def _append(self, changes):
+        for change in changes:
+            self.seq += 1
+            self.entries.append(change)
+        self._event.set()
+        self._event = asyncio.Event()
+
+    async def since(self, seq, wait):
+        if seq < 0:
+            return self.seq, []
+        if seq >= self.seq and wait > 0:
+            try:
+                await asyncio.wait_for(self._event.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+        first = self.seq - len(self.entries)
+        if seq < first or seq > self.seq:
+            # guichet trop en retard, ou numero d'avant un redemarrage du serveur
+            # (plus grand que le notre si l'horloge a recule)
+            return self.seq, [(table, "reload", 0) for table in database.WATCHED_TABLES]
+        return self.seq, list(itertools.islice(self.entries, seq - first, None))
+
+
+class Server:
+    ROUTES = [
+        ("POST", r"/login", "login", False),
+        ("GET", r"/changes", "changes", True),
+        ("GET", r"/etat", "status", True),
+        ("GET", r"/dashboard", "dashboard", True),
+        ("GET", r"/diagnostics", "diagnostics", True),
+        ("POST", r"/query/([\w.]+)", "query", True),
+        ("GET", r"/tickets", "search", True),
+        ("POST", r"/tickets", "sell", True),
+        ("POST", r"/tickets/groupe", "sell_group", True),
+        ("POST", r"/tickets/(\d+)/annuler", "cancel", True),
+        ("POST", r"/clients", "add_client", True),
+        ("GET", r"/trajets/(\d+)/places", "places", True),
+    ]
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.sessions = {}
+        self.readers = ThreadPoolExecutor(READ_THREADS, thread_name_prefix="reader")
+        self.changelog = ChangeLog(loop)
+        self.routes = [(method, re.compile(path), name, auth) for method, path, name, auth in self.ROUTES]
+
+    async def handle(self, reader, writer):
+        # une connexion HTTP/1.1 persistante par guichet
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, payload = await self._dispatch(method, target, headers, body)
+                data = json.dumps(payload, ensure_ascii=False, default=str).encode()
+                keep = headers.get("connection", "").lower() != "close"
+                writer.write((f"HTTP/1.1 {status} {STATUS[status]}\r\n"
+                              "Content-Type: application/json; charset=utf-8\r\n"
+                              f"Content-Length: {len(data)}\r\n"
+                              f"Connection: {'keep-alive' if keep else 'close'}\r\n\r\n").encode() + data)
+                await writer.drain()
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY:
+            raise ValueError("corps trop gros")
+        body = await reader.readexactly(length) if length else b""
+        return method, target, headers, body
+
+    async def _dispatch(self, method, target, headers, body):
+        parts = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        for route_method, pattern, name, auth in self.routes:
+            match = pattern.fullmatch(parts.path)
+            if not match or route_method != method:
+                continue
+            try:
+                user = self._user(headers) if auth else None
+                return 200, await getattr(self, name)(user, params, _body(body), *match.groups())
+            except HttpError as e:
+                return e.status, {"error": str(e)}
+            except SeatUnavailable as e:
+                return 409, {"error": str(e)}
+            except Exception as e:
+                traceback.print_exc()
+                return 500, {"error": str(e)}
+        return 404, {"error": f"Introuvable : {method} {parts.path}"}
+
+    def _user(self, headers):
+        token = headers.get("authorization", "").removeprefix("Bearer ").strip()
+        user = self.sessions.get(token)
+        if user is None:
+            raise HttpError(401, "Session expirée, reconnectez-vous.")
+        return user
+
+    async def _read(self, fn, *args):
+        return await self.loop.run_in_executor(self.readers, fn, *args)
+
+    async def _write(self, fn, *args):
+        return await asyncio.wrap_future(write_queue().submit(fn, *args))
+
+    # ── Routes ──
+
+    async def login(self, user, params, data):
+        from auth import authenticate
+        user = await self._read(authenticate, _field(data, "identifiant", str), _field(data, "password", str))
+        if user is None:
+            return {"user": None}
+        user.pop("password", None)
+        token = secrets.token_urlsafe(24)
+        self.sessions[token] = user
+        return {"token": token, "user": user}
+
+    async def changes(self, user, params, data):
+        since = _field(params, "since", int, False)
+        wait = min(max(_field(params, "wait", float, False) or 0, 0), 60)
+        seq, changes = await self.changelog.since(-1 if since is None else since, wait)
+        return {"seq": seq, "changes": changes}
+
+    async def status(self, user, params, data):
+        return dict(write_queue().stats(), sessions=len(self.sessions), changements=self.changelog.seq)
+
+    async def dashboard(self, user, params, data):
+        def read():
+            with read_connection() as conn:
+                return {"compteurs": dict(queries.fetchone(conn, "dashboard.counts")),
+                        "derniers_tickets": _table(queries.fetchall(conn, "dashboard.recent_tickets")),
+                        "prochains_trajets": _table(queries.fetchall(conn, "dashboard.upcoming_trips"))}
+        return await self._read(read)
+
+    async def diagnostics(self, user, params, data):
+        # temps des requetes du serveur (profiling.py), meme contenu que l'export de la page Diagnostics
+        if user.get("role_nom") != "Admin":
+            raise HttpError(403, "Réservé aux administrateurs.")
+        import profiling
+        return await self._read(profiling.dump)
+
+    async def query(self, user, params, data, name):
+        if name not in REMOTE_QUERIES:
+            raise HttpError(404, f"Requête inconnue : {name}")
+        args = data.get("params")
+        if args is None:
+            args = []
+        values = args.values() if isinstance(args, dict) else args
+        if (not isinstance(args, (dict, list))
+                or not all(v is None or isinstance(v, (str, int, float)) for v in values)):
+            raise HttpError(400, "Champ invalide : params")
+        args = dict(args) if isinstance(args, dict) else tuple(args)
+
+        def read():
+            with read_connection() as conn:
+                try:
+                    if data.get("one"):
+                        row = queries.fetchone(conn, name, args)
+                        return _table([row] if row else [])
+                    return _table(queries.fetchall(conn, name, args))
+                except sqlite3.ProgrammingError as e:
+                    # parametres qui ne correspondent pas a la requete
+                    raise HttpError(400, f"Champ invalide : params ({e})") from None
+        return await self._read(read)
+
+    async def search(self, user, params, data):
+        # GET /tickets?q=ouaga&statut=payé&after_id=120&limit=50
+        args = {"q": fts_match(params.get("q")), "statut": params.get("statut") or None,
+                "after_id": _field(params, "after_id", int, False) or MAX_ID,
+                "limit": min(_field(params, "limit", int, False) or 100, SEARCH_LIMIT)}
+
+        def read():
+            with read_connection() as conn:
+                return _table(queries.fetchall(conn, "tickets.page", args))
+        return await self._read(read)
+
+    async def sell(self, user, params, data):
+        return await self._write(_sell, user, _field(data, "trajet_id", int), _field(data, "siege", int, False),
+                                        _field(data, "client_id", int), _field(data, "montant", float, False) or 0)
+
+    async def sell_group(self, user, params, data):
+        client_ids = data.get("client_ids")
+        if (not isinstance(client_ids, list) or not client_ids
+                or not all(isinstance(c, int) and not isinstance(c, bool) for c in client_ids)):
+            raise HttpError(400, "Champ invalide : client_ids")
+        return await self._write(_sell_group, user, _field(data, "trajet_id", int), client_ids,
+                                        _field(data, "montant", float, False) or 0)
+
+    async def cancel(self, user, params, data, ticket_id):
+        return await self._write(_cancel, int(ticket_id))
+
+    async def add_client(self, user, params, data):
+        nom = (_field(data, "nom", str, False) or "").strip()
+        prenom = (_field(data, "prenom", str, False) or "").strip()
+        if not nom or not prenom:
+            raise HttpError(400, "Nom et prénom obligatoires.")
+        return await self._write(_add_client, nom, prenom, _field(data, "telephone", str, False) or "")
+
+    async def places(self, user, params, data, trajet_id):
+        plan = await self._read(inventory.plan, int(trajet_id))
+        return {"capacite": plan.capacity, "pris": plan.sold()}
+
+
+async def serve(host, port, started=None):
+    server = Server(asyncio.get_running_loop())
+    listener = await asyncio.start_server(server.handle, host, port)
+    print(f"GestTransport : serveur sur http://{host}:{port} (base {database.DB_PATH})", file=sys.stderr)
+    if started is not None:
+        started.set()
+    async with listener:
+        await listener.serve_forever()
+
+
+# ── Simulation de guichets (test de charge sur localhost) ──
+
+def simulate(url, counters, sales, identifiant, password):
+    # "counters" guichets en parallele vendent chacun "sales" tickets sur des
+    # trajets tires au hasard ; un siege pris entre-temps est retente
+    from backend import RemoteBackend
+    probe = RemoteBackend(url)
+    result = probe.request("POST", "/login", {"identifiant": identifiant, "password": password})
+    if result["user"] is None:
+        sys.exit("Identifiants refusés.")
+    probe.token = result["token"]
+    trajets = [r["id"] for r in probe.fetchall("tickets.form_trajets")]
+    clients = [r["id"] for r in probe.fetchall("tickets.form_clients")]
+    if not trajets or not clients:
+        sys.exit("Il faut au moins un trajet et un client.")
+    before = probe.request("GET", "/etat")
+    totals = {"vendus": 0, "sieges_pris": 0, "complets": 0, "erreurs": 0}
+    lock = threading.Lock()
+
+    def counter(number):
+        rnd = random.Random(number)
+        client = RemoteBackend(url)
+        client.token = probe.token
+        counts = dict.fromkeys(totals, 0)
+        for _ in range(sales):
+            trajet_id = rnd.choice(trajets)
+            for _ in range(3):
+                siege = client.seat_plan(trajet_id).next_free()
+                if siege is None:
+                    counts["complets"] += 1
+                    break
+                try:
+                    client.sell_ticket(None, trajet_id, siege, rnd.choice(clients), 1000, None)
+                    counts["vendus"] += 1
+                    break
+                except SeatUnavailable:
+                    counts["sieges_pris"] += 1
+                except Exception:
+                    counts["erreurs"] += 1
+                    break
+        with lock:
+            for key, value in counts.items():
+                totals[key] += value
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=counter, args=(n,)) for n in range(counters)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    after = probe.request("GET", "/etat")
+    batches = after["lots"] - before["lots"]
+    ops = after["ecritures"] - before["ecritures"]
+    print(f"{counters} guichet(s), {elapsed:.2f} s : {totals['vendus']} vendu(s) "
+          f"({totals['vendus'] / elapsed:.0f}/s), {totals['sieges_pris']} siège(s) pris entre-temps, "
+          f"{totals['complets']} trajet(s) complet(s), {totals['erreurs']} erreur(s)")
+    print(f"{ops} écriture(s) en {batches} commit(s), {ops / max(batches, 1):.1f} par commit")
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GestTransport — serveur multi-guichets")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", default=database.DB_PATH, help="fichier SQLite partagé")
+    parser.add_argument("--max-latency-ms", type=float, default=MAX_LATENCY * 1000,
+                        help="attente maximale pour grouper les ventes dans un même commit")
+    parser.add_argument("--simulate", type=int, metavar="N", help="N guichets simulés contre --url")
+    parser.add_argument("--sales", type=int, default=20, help="ventes par guichet simulé")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{DEFAULT_PORT}")
+    parser.add_argument("--user", default="")
+    parser.add_argument("--password", default="")
+    args = parser.parse_args(argv)
+    if args.simulate:
+        simulate(args.url, args.simulate, args.sales, args.user, args.password)
+        return
+    database.DB_PATH = args.db
+    write_queue().max_latency = args.max_latency_ms / 1000
+    duplicates = database.init_db()
+    if duplicates:
+        from migrations import describe_duplicates
+        print(describe_duplicates(duplicates), file=sys.stderr)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        database.close_connections()
+
+
+if __name__ == "__main__":
+    main()
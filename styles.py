@@ -14,15 +14,15 @@ QScrollBar::handle:vertical {
     background: #c8d0da; border-radius: 4px; min-height: 20px;
 }
 QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical { height: 0; }
-QTableWidget {
+QTableWidget, QTableView {
     background-color: #ffffff;
     border: 1px solid #d0d7de;
     border-radius: 8px;
     gridline-color: #e8ecf0;
     outline: none;
 }
-QTableWidget::item { padding: 8px 12px; border: none; color: #1a1f2e; }
-QTableWidget::item:selected {
+QTableWidget::item, QTableView::item { padding: 8px 12px; border: none; color: #1a1f2e; }
+QTableWidget::item:selected, QTableView::item:selected {
     background-color: #dce8ff;
     color: #1a1f2e;
 }
@@ -142,4 +142,66 @@ def make_table(headers):
     t.verticalHeader().setVisible(False)
     t.setAlternatingRowColors(True)
     t.verticalHeader().setDefaultSectionSize(42)
-    return t
\ No newline at end of file
+    return t
+
+def patch_table(table, rows, changes, fill_row):
+    # applique a un QTableWidget (et a sa liste de lignes) le resultat de
+    # KeysetPager.patch() ; fill_row(i, ligne) remplit une ligne du tableau
+    for action, i, row in changes:
+        if action == "delete":
+            del rows[i]
+            table.removeRow(i)
+            continue
+        if action == "insert":
+            rows.insert(i, row)
+            table.insertRow(i)
+        else:
+            rows[i] = row
+        fill_row(i, row)
+
+def make_view(model):
+    from PySide6 import QtWidgets
+    t = QtWidgets.QTableView()
+    t.setModel(model)
+    t.horizontalHeader().setStretchLastSection(True)
+    t.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+    t.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+    t.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+    t.verticalHeader().setVisible(False)
+    t.setAlternatingRowColors(True)
+    # hauteur fixe: evite de mesurer chaque ligne quand le modele grossit
+    t.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+    t.verticalHeader().setDefaultSectionSize(42)
+    t.setMouseTracking(True)
+    return t
+
+def pager_bar(on_previous, on_next):
+    from PySide6 import QtWidgets, QtGui, QtCore
+    bar = QtWidgets.QWidget()
+    bl = QtWidgets.QHBoxLayout(bar)
+    bl.setContentsMargins(0, 0, 0, 0)
+    style = """
+        QPushButton { background:#ffffff; color:#1a1f2e; border:1px solid #d0d7de; border-radius:6px; padding:6px 14px; }
+        QPushButton:hover { background:#dce8ff; }
+        QPushButton:disabled { color:#c8d0da; }
+    """
+    bar.prev_btn = QtWidgets.QPushButton("◀ Précédent")
+    bar.next_btn = QtWidgets.QPushButton("Suivant ▶")
+    for b in (bar.prev_btn, bar.next_btn):
+        b.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        b.setStyleSheet(style)
+    bar.prev_btn.clicked.connect(on_previous)
+    bar.next_btn.clicked.connect(on_next)
+    bar.label = QtWidgets.QLabel("Page 1")
+    bar.label.setStyleSheet("color:#6e7781;font-size:12px;")
+    bl.addStretch()
+    bl.addWidget(bar.prev_btn)
+    bl.addWidget(bar.label)
+    bl.addWidget(bar.next_btn)
+
+    def sync(pager):
+        bar.label.setText(f"Page {pager.page}")
+        bar.prev_btn.setEnabled(pager.has_previous)
+        bar.next_btn.setEnabled(pager.has_next)
+    bar.sync = sync
+    return bar
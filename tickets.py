@@ -1,8 +1,158 @@
-from PySide6 import QtWidgets, QtCore, QtPrintSupport, QtGui
-from database import get_connection
-from styles import primary_btn, section_title, make_table
+from PySide6 import QtWidgets, QtCore, QtGui
+from database import fts_match
+from styles import primary_btn, section_title, make_view, pager_bar
+from pagination import KeysetPager, MAX_ID
+from search import SearchController
+from events import bus
+from export import export_list
+from printing import print_queue
+from seats import SeatUnavailable, DEFAULT_CAPACITY
+from backend import backend
 from datetime import datetime
 
+TICKET_HEADERS = ["ID", "Date", "Client", "Trajet", "Siège", "Montant", "Statut", "Agent", "Actions"]
+FETCH_CHUNK = 200
+TICKETS_PAGE_SIZE = 1000
+
+
+class TicketTableModel(QtCore.QAbstractTableModel):
+    # une page de TICKETS_PAGE_SIZE tickets, chargee par paquets quand la vue defile
+    # (canFetchMore/fetchMore) ; on ne garde que les lignes, aucun widget par ligne
+    STATUT_COL = 6
+    ACTIONS_COL = 8
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self.pager = KeysetPager("tickets.page", ["id"], (MAX_ID,), page_size=TICKETS_PAGE_SIZE,
+                                 descending=True)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(TICKET_HEADERS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return TICKET_HEADERS[section]
+        return None
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        col = index.column()
+        if role == QtCore.Qt.DisplayRole:
+            if col == self.ACTIONS_COL:
+                return None
+            val = row[col]
+            return str(val) if val else "—"
+        if role == QtCore.Qt.ForegroundRole and col == self.STATUT_COL:
+            return QtGui.QColor("#3fb950") if row[col] == "payé" else QtGui.QColor("#f85149")
+        if role == QtCore.Qt.UserRole:
+            return row[0]
+        return None
+
+    def filter_for(self, search="", statut=None):
+        return {"q": fts_match(search), "statut": statut}
+
+    def set_filter(self, search="", statut=None):
+        self.pager.set_filter(self.filter_for(search, statut))
+        self._load(self.pager.first(FETCH_CHUNK))
+
+    def prepare(self, conn, criteria):
+        # appele depuis le thread de recherche
+        return self.pager.prepare(self.filter_for(*criteria), limit=FETCH_CHUNK, conn=conn)
+
+    def apply(self, prepared):
+        self._load(self.pager.apply(prepared))
+
+    def next_page(self):
+        if self.pager.has_next:
+            self._load(self.pager.next_page(FETCH_CHUNK))
+
+    def previous_page(self):
+        if self.pager.has_previous:
+            self._load(self.pager.previous_page(FETCH_CHUNK))
+
+    def _load(self, rows):
+        self.beginResetModel()
+        self._rows = list(rows)
+        self.endResetModel()
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return not parent.isValid() and self.pager.can_fetch
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return
+        rows = self.pager.fetch(FETCH_CHUNK)
+        if not rows:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+    def patch(self, op, rowid):
+        # un ticket ajoute, modifie ou supprime : seule sa ligne est touchee
+        for action, i, row in self.pager.patch(self._rows, op, rowid):
+            if action == "delete":
+                self.beginRemoveRows(QtCore.QModelIndex(), i, i)
+                del self._rows[i]
+                self.endRemoveRows()
+            elif action == "insert":
+                self.beginInsertRows(QtCore.QModelIndex(), i, i)
+                self._rows.insert(i, row)
+                self.endInsertRows()
+            else:
+                self._rows[i] = row
+                self.dataChanged.emit(self.index(i, 0), self.index(i, len(TICKET_HEADERS) - 1))
+
+
+class TicketActionsDelegate(QtWidgets.QStyledItemDelegate):
+    # un seul delegate dessine les boutons Imprimer/Annuler de toutes les lignes
+    print_clicked = QtCore.Signal(int)
+    cancel_clicked = QtCore.Signal(int)
+
+    BUTTONS = (
+        ("🖨️ Imprimer", "#21262d", "#e6edf3", "print_clicked"),
+        ("❌ Annuler", "#3d1c1c", "#f85149", "cancel_clicked"),
+    )
+
+    def _rects(self, rect):
+        r = rect.adjusted(4, 6, -4, -6)
+        w = (r.width() - 6) // 2
+        first = QtCore.QRect(r.left(), r.top(), w, r.height())
+        second = QtCore.QRect(first.right() + 7, r.top(), w, r.height())
+        return first, second
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)
+        painter.save()
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        font = QtGui.QFont(option.font)
+        font.setPixelSize(11)
+        painter.setFont(font)
+        for rect, (text, bg, fg, _) in zip(self._rects(option.rect), self.BUTTONS):
+            painter.setPen(QtCore.Qt.NoPen)
+            painter.setBrush(QtGui.QColor(bg))
+            painter.drawRoundedRect(rect, 4, 4)
+            painter.setPen(QtGui.QColor(fg))
+            painter.drawText(rect, QtCore.Qt.AlignCenter, text)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QtCore.QEvent.MouseButtonRelease and event.button() == QtCore.Qt.LeftButton:
+            pos = event.position().toPoint()
+            for rect, (_, _, _, signal) in zip(self._rects(option.rect), self.BUTTONS):
+                if rect.contains(pos):
+                    getattr(self, signal).emit(index.data(QtCore.Qt.UserRole))
+                    return True
+        return super().editorEvent(event, model, option, index)
+
+
 class TicketsPage(QtWidgets.QWidget):
     def __init__(self, current_user):
         super().__init__()
@@ -18,6 +168,14 @@ class TicketsPage(QtWidgets.QWidget):
         hdr = QtWidgets.QHBoxLayout()
         hdr.addWidget(section_title("🎫 Tickets de voyage"))
         hdr.addStretch()
+        btn_export = primary_btn("⬇️ Exporter", "#ffffff", "#1a1f2e")
+        btn_export.clicked.connect(lambda: export_list(self, "tickets", self.model.pager, self.table))
+        # l'export lit la base locale : pas sur un guichet distant
+        btn_export.setVisible(not backend().remote)
+        hdr.addWidget(btn_export)
+        btn_group = primary_btn("👥 Vente groupée")
+        btn_group.clicked.connect(self.open_group_form)
+        hdr.addWidget(btn_group)
         btn_add = primary_btn("+ Vendre un ticket")
         btn_add.clicked.connect(self.open_form)
         hdr.addWidget(btn_add)
@@ -26,232 +184,191 @@ class TicketsPage(QtWidgets.QWidget):
         flt = QtWidgets.QHBoxLayout()
         self.search_input = QtWidgets.QLineEdit()
         self.search_input.setPlaceholderText("🔍 Rechercher par client, trajet...")
-        self.search_input.textChanged.connect(lambda t: self.load_data(t))
+        self.search_input.textChanged.connect(lambda: self._search())
         flt.addWidget(self.search_input)
         self.filter_status = QtWidgets.QComboBox()
         self.filter_status.addItems(["Tous", "payé", "annulé"])
-        self.filter_status.currentTextChanged.connect(lambda: self.load_data(self.search_input.text()))
+        self.filter_status.currentTextChanged.connect(lambda: self._search(immediate=True))
         flt.addWidget(self.filter_status)
         layout.addLayout(flt)
 
-        self.table = make_table(["ID", "Date", "Client", "Trajet", "Siège", "Montant", "Statut", "Agent", "Actions"])
+        self.model = TicketTableModel(self)
+        self.table = make_view(self.model)
+        self.actions = TicketActionsDelegate(self.table)
+        self.actions.print_clicked.connect(self.print_ticket)
+        self.actions.cancel_clicked.connect(self.cancel_ticket)
+        self.table.setItemDelegateForColumn(TicketTableModel.ACTIONS_COL, self.actions)
         layout.addWidget(self.table)
+        self.pager_bar = pager_bar(self.previous_page, self.next_page)
+        self.model.rowsInserted.connect(lambda *_: self.pager_bar.sync(self.model.pager))
+        layout.addWidget(self.pager_bar)
+        self.searcher = SearchController(self.model.prepare)
+        self.searcher.results_ready.connect(self._apply_search)
+        bus().changed.connect(self._on_change)
 
-    def load_data(self, search=""):
-        conn = get_connection()
-        query = """
-            SELECT tk.id, tk.date,
-                   cl.nom||' '||cl.prenom as client,
-                   vd.nom||' → '||va.nom as trajet,
-                   tk.siege, tk.montant, tk.statut,
-                   u.nom||' '||u.prenom as agent
-            FROM ticket tk
-            LEFT JOIN client cl ON tk.client_id = cl.id
-            LEFT JOIN trajet t ON tk.trajet_id = t.id
-            LEFT JOIN ville vd ON t.ville_depart_id = vd.id
-            LEFT JOIN ville va ON t.ville_arrivee_id = va.id
-            LEFT JOIN user u ON tk.user_id = u.id
-            WHERE 1=1
-        """
-        params = []
-        if search:
-            query += " AND (cl.nom LIKE ? OR cl.prenom LIKE ? OR vd.nom LIKE ? OR va.nom LIKE ?)"
-            s = f"%{search}%"
-            params += [s, s, s, s]
+    def _statut(self):
         st = self.filter_status.currentText()
-        if st != "Tous":
-            query += " AND tk.statut=?"
-            params.append(st)
-        query += " ORDER BY tk.id DESC"
-        rows = conn.execute(query, params).fetchall()
-        conn.close()
-
-        self.table.setRowCount(len(rows))
-        for i, row in enumerate(rows):
-            for j, val in enumerate(row):
-                item = QtWidgets.QTableWidgetItem(str(val) if val else "—")
-                if j == 6:  # statut
-                    item.setForeground(QtGui.QColor("#3fb950") if val == "payé" else QtGui.QColor("#f85149"))
-                self.table.setItem(i, j, item)
-            aw = QtWidgets.QWidget()
-            al = QtWidgets.QHBoxLayout(aw)
-            al.setContentsMargins(4, 2, 4, 2)
-            btn_p = QtWidgets.QPushButton("🖨️ Imprimer")
-            btn_p.setStyleSheet("background:#21262d;color:#e6edf3;border:none;border-radius:4px;padding:4px 8px;font-size:11px;")
-            btn_a = QtWidgets.QPushButton("❌ Annuler")
-            btn_a.setStyleSheet("background:#3d1c1c;color:#f85149;border:none;border-radius:4px;padding:4px 8px;font-size:11px;")
-            tid = row[0]
-            btn_p.clicked.connect(lambda _, id=tid: self.print_ticket(id))
-            btn_a.clicked.connect(lambda _, id=tid: self.cancel_ticket(id))
-            al.addWidget(btn_p)
-            al.addWidget(btn_a)
-            self.table.setCellWidget(i, 8, aw)
+        return None if st == "Tous" else st
+
+    def refresh(self):
+        self.load_data(self.search_input.text())
+
+    def load_data(self, search=""):
+        self.model.set_filter(search, self._statut())
+        self.pager_bar.sync(self.model.pager)
+
+    def _search(self, immediate=False):
+        self.searcher.submit((self.search_input.text(), self._statut()), immediate)
+
+    def _apply_search(self, criteria, prepared):
+        self.model.apply(prepared)
+        self.pager_bar.sync(self.model.pager)
+
+    def _on_change(self, table, op, rowid):
+        if table == "ticket" and op == "reload":
+            self.refresh()
+        elif table == "ticket":
+            self.model.patch(op, rowid)
+            self.pager_bar.sync(self.model.pager)
+
+    def next_page(self):
+        self.model.next_page()
+        self.pager_bar.sync(self.model.pager)
+
+    def previous_page(self):
+        self.model.previous_page()
+        self.pager_bar.sync(self.model.pager)
 
     def cancel_ticket(self, tid):
         reply = QtWidgets.QMessageBox.question(self, "Confirmation", "Annuler ce ticket ?")
         if reply == QtWidgets.QMessageBox.Yes:
-            conn = get_connection()
-            conn.execute("UPDATE ticket SET statut='annulé' WHERE id=?", (tid,))
-            conn.commit()
-            conn.close()
-            self.load_data()
+            try:
+                backend().cancel_ticket(tid)
+            except Exception as e:
+                QtWidgets.QMessageBox.warning(self, "Erreur", str(e))
 
     def print_ticket(self, tid):
-        conn = get_connection()
-        row = conn.execute("""
-            SELECT tk.*, cl.nom as cl_nom, cl.prenom as cl_prenom, cl.telephone as cl_tel,
-                   vd.nom as v_dep, va.nom as v_arr,
-                   t.heure_depart, t.heure_arrivee, t.prix,
-                   c.nom||' '||c.prenom as chauffeur,
-                   veh.matricule as vehicule
-            FROM ticket tk
-            LEFT JOIN client cl ON tk.client_id = cl.id
-            LEFT JOIN trajet t ON tk.trajet_id = t.id
-            LEFT JOIN ville vd ON t.ville_depart_id = vd.id
-            LEFT JOIN ville va ON t.ville_arrivee_id = va.id
-            LEFT JOIN chauffeur c ON t.chauffeur_id = c.id
-            LEFT JOIN vehicule veh ON t.vehicule_id = veh.id
-            WHERE tk.id=?
-        """, (tid,)).fetchone()
-        conn.close()
-        if not row:
-            return
-        r = dict(row)
-        html = f"""
-        <html><body style="font-family:Arial;font-size:14px;margin:20px;">
-        <div style="border:2px solid #333;padding:20px;max-width:500px;margin:auto;">
-            <h2 style="text-align:center;color:#1a3a8a;">🚌 GestTransport</h2>
-            <h3 style="text-align:center;border-bottom:1px solid #ccc;padding-bottom:10px;">TICKET DE VOYAGE</h3>
-            <table width="100%" style="margin-top:10px;">
-                <tr><td><b>N° Ticket:</b></td><td>#{r['id']:06d}</td></tr>
-                <tr><td><b>Date achat:</b></td><td>{r['date']}</td></tr>
-                <tr><td><b>Client:</b></td><td>{r['cl_nom']} {r['cl_prenom']}</td></tr>
-                <tr><td><b>Téléphone:</b></td><td>{r['cl_tel'] or '—'}</td></tr>
-                <tr><td colspan="2" style="padding-top:10px;"><b>──────── TRAJET ────────</b></td></tr>
-                <tr><td><b>Départ:</b></td><td>{r['v_dep']}</td></tr>
-                <tr><td><b>Arrivée:</b></td><td>{r['v_arr']}</td></tr>
-                <tr><td><b>H. Départ:</b></td><td>{r['heure_depart']}</td></tr>
-                <tr><td><b>H. Arrivée:</b></td><td>{r['heure_arrivee']}</td></tr>
-                <tr><td><b>Siège N°:</b></td><td>{r['siege']}</td></tr>
-                <tr><td><b>Chauffeur:</b></td><td>{r['chauffeur'] or '—'}</td></tr>
-                <tr><td><b>Véhicule:</b></td><td>{r['vehicule'] or '—'}</td></tr>
-                <tr><td colspan="2" style="padding-top:10px;"><b>──────── PAIEMENT ────────</b></td></tr>
-                <tr><td><b>Montant:</b></td><td style="font-size:16px;font-weight:bold;color:#1a3a8a;">{r['montant']:,.0f} FCFA</td></tr>
-                <tr><td><b>Statut:</b></td><td style="color:{'green' if r['statut']=='payé' else 'red'};">{r['statut'].upper()}</td></tr>
-            </table>
-            <p style="text-align:center;margin-top:20px;font-size:11px;color:#888;">
-                Bon voyage ! Merci de votre confiance.<br>
-                Ce ticket est valable uniquement pour le trajet indiqué.
-            </p>
-        </div>
-        </body></html>
-        """
-        dlg = PrintPreviewDialog(self, html, f"Ticket #{tid:06d}")
-        dlg.exec()
+        print_queue().preview_ticket(self, tid)
 
     def open_form(self):
         dlg = TicketFormDialog(self, self.current_user)
-        if dlg.exec():
-            self.load_data()
+        dlg.exec()
+
+    def open_group_form(self):
+        dlg = GroupSaleDialog(self, self.current_user)
+        dlg.exec()
 
 
-class PrintPreviewDialog(QtWidgets.QDialog):
-    def __init__(self, parent, html, title="Document"):
+class ClientListModel(QtCore.QStringListModel):
+    # clients des formulaires de vente, partages par toutes leurs listes.
+    # Les libelles sont donnes a Qt d'un bloc ; seul data() est redefini, pour
+    # l'id (currentData()) : Qt appelle rowCount() des centaines de milliers de
+    # fois en dimensionnant chaque liste, il doit rester en C++
+    def __init__(self, rows, parent=None):
         super().__init__(parent)
-        self.html = html
-        self.setWindowTitle(f"Aperçu — {title}")
-        self.setMinimumSize(600, 700)
-        self.setStyleSheet("QDialog{background:#fff;}")
-        layout = QtWidgets.QVBoxLayout(self)
-        self.text_edit = QtWidgets.QTextEdit()
-        self.text_edit.setReadOnly(True)
-        self.text_edit.setHtml(html)
-        self.text_edit.setStyleSheet("background:white;color:black;border:none;")
-        layout.addWidget(self.text_edit)
-        btn_row = QtWidgets.QHBoxLayout()
-        btn_print = primary_btn("🖨️ Imprimer")
-        btn_print.clicked.connect(self._print)
-        btn_close = QtWidgets.QPushButton("Fermer")
-        btn_close.setStyleSheet("background:#21262d;color:#e6edf3;border:none;border-radius:6px;padding:8px 18px;")
-        btn_close.clicked.connect(self.reject)
-        btn_row.addStretch()
-        btn_row.addWidget(btn_print)
-        btn_row.addWidget(btn_close)
-        layout.addLayout(btn_row)
-
-    def _print(self):
-        printer = QtPrintSupport.QPrinter(QtPrintSupport.QPrinter.HighResolution)
-        dlg = QtPrintSupport.QPrintDialog(printer, self)
-        if dlg.exec() == QtWidgets.QDialog.Accepted:
-            self.text_edit.print_(printer)
+        self._ids = [c['id'] for c in rows]
+        self.setStringList([self._label(c) for c in rows])
+
+    def _label(self, c):
+        return f"{c['nom']} {c['prenom']} ({c['telephone'] or '—'})"
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.UserRole:
+            return self._ids[index.row()] if index.isValid() else None
+        return super().data(index, role)
+
+    def append(self, row):
+        count = self.rowCount()
+        self._ids.append(row['id'])
+        self.insertRows(count, 1)
+        self.setData(self.index(count), self._label(row))
+        return count
 
 
 class TicketFormDialog(QtWidgets.QDialog):
     def __init__(self, parent, current_user):
         super().__init__(parent)
         self.current_user = current_user
+        self._plan = None
+        self._clients = None
+        self.client_cbs = []
         self.setWindowTitle("Vendre un ticket")
         self.setMinimumWidth(480)
         self.setStyleSheet("QDialog{background:#f5f7fa;color:#e6edf3;} QLabel{color:#8b949e;font-size:12px;}")
         self._setup_ui()
 
     def _setup_ui(self):
+        layout = self._form()
+        client_row = self._client_row()
+        self.client_cb = self.client_cbs[0]
+
+        self.siege = QtWidgets.QSpinBox()
+        self.siege.setMinimum(1)
+        self.siege.setMaximum(DEFAULT_CAPACITY)
+        self.siege.valueChanged.connect(self._update_seat_state)
+
+        layout.addRow("Client *", client_row)
+        layout.addRow("Trajet *", self.trajet_cb)
+        layout.addRow("N° Siège *", self.siege)
+        layout.addRow("", self.seats_info)
+        layout.addRow("Montant", self.montant)
+        self._finish_form(layout)
+
+    def _form(self):
+        # parties communes a la vente simple et a la vente groupee
         layout = QtWidgets.QFormLayout(self)
         layout.setSpacing(12)
         layout.setContentsMargins(24, 24, 24, 24)
 
-        # Client section
-        client_row = QtWidgets.QHBoxLayout()
-        self.client_cb = QtWidgets.QComboBox()
-        self._load_clients()
-        btn_new_client = QtWidgets.QPushButton("+ Nouveau")
-        btn_new_client.setStyleSheet("background:#21262d;color:#e6edf3;border:none;border-radius:4px;padding:6px;")
-        btn_new_client.clicked.connect(self._add_client)
-        client_row.addWidget(self.client_cb)
-        client_row.addWidget(btn_new_client)
-
-        # Trajet
         self.trajet_cb = QtWidgets.QComboBox()
         self._load_trajets()
         self.trajet_cb.currentIndexChanged.connect(self._update_montant)
+        self.trajet_cb.currentIndexChanged.connect(self._update_seats)
 
-        self.siege = QtWidgets.QSpinBox()
-        self.siege.setMinimum(1)
-        self.siege.setMaximum(200)
+        self.seats_info = QtWidgets.QLabel()
         self.montant = QtWidgets.QDoubleSpinBox()
         self.montant.setMaximum(9999999)
         self.montant.setSuffix(" FCFA")
+        return layout
 
-        layout.addRow("Client *", client_row)
-        layout.addRow("Trajet *", self.trajet_cb)
-        layout.addRow("N° Siège *", self.siege)
-        layout.addRow("Montant", self.montant)
-
+    def _finish_form(self, layout):
         btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Save | QtWidgets.QDialogButtonBox.Cancel)
         btns.accepted.connect(self._save)
         btns.rejected.connect(self.reject)
         btns.setStyleSheet("QPushButton{background:#82a2f5;color:#0d1117;border:none;border-radius:6px;padding:8px 18px;font-weight:700;}")
         layout.addRow(btns)
+        self._update_seats()
+
+    def _client_row(self):
+        # liste des clients + bouton "Nouveau" ; la liste est ajoutee a client_cbs
+        client_row = QtWidgets.QHBoxLayout()
+        client_cb = QtWidgets.QComboBox()
+        # largeur et hauteur de ligne fixes : sinon chaque liste mesure tous
+        # les clients (50 000 lignes) en s'affichant
+        client_cb.setSizeAdjustPolicy(QtWidgets.QComboBox.AdjustToMinimumContentsLengthWithIcon)
+        client_cb.setMinimumContentsLength(30)
+        view = QtWidgets.QListView()
+        view.setUniformItemSizes(True)
+        client_cb.setView(view)
+        client_cb.setModel(self._load_clients())
+        btn_new_client = QtWidgets.QPushButton("+ Nouveau")
+        btn_new_client.setStyleSheet("background:#21262d;color:#e6edf3;border:none;border-radius:4px;padding:6px;")
+        btn_new_client.clicked.connect(lambda: self._add_client(client_cb))
+        client_row.addWidget(client_cb)
+        client_row.addWidget(btn_new_client)
+        self.client_cbs.append(client_cb)
+        return client_row
 
     def _load_clients(self):
-        self.client_cb.clear()
-        conn = get_connection()
-        clients = conn.execute("SELECT id, nom, prenom, telephone FROM client ORDER BY nom").fetchall()
-        conn.close()
-        for c in clients:
-            self.client_cb.addItem(f"{c['nom']} {c['prenom']} ({c['telephone'] or '—'})", c['id'])
+        # un seul modele, lu une fois, partage par toutes les listes du formulaire
+        # (vente groupee : une liste par place)
+        if self._clients is None:
+            self._clients = ClientListModel(backend().fetchall("tickets.form_clients"), self)
+        return self._clients
 
     def _load_trajets(self):
         self.trajet_cb.clear()
-        conn = get_connection()
-        trajets = conn.execute("""
-            SELECT t.id, vd.nom||' → '||va.nom as label, t.prix, t.heure_depart
-            FROM trajet t
-            LEFT JOIN ville vd ON t.ville_depart_id=vd.id
-            LEFT JOIN ville va ON t.ville_arrivee_id=va.id
-            ORDER BY t.heure_depart DESC
-        """).fetchall()
-        conn.close()
+        trajets = backend().fetchall("tickets.form_trajets")
         for t in trajets:
             self.trajet_cb.addItem(f"{t['label']} ({t['heure_depart']})", (t['id'], t['prix']))
 
@@ -260,25 +377,133 @@ class TicketFormDialog(QtWidgets.QDialog):
         if data:
             self.montant.setValue(data[1] or 0)
 
-    def _add_client(self):
+    def _load_plan(self):
+        # plan des places du trajet choisi (inventaire local ou serveur)
+        data = self.trajet_cb.currentData()
+        self._plan = backend().seat_plan(data[0]) if data else None
+        return self._plan
+
+    def _update_seats(self):
+        # le siege propose est le premier libre du trajet
+        plan = self._load_plan()
+        if plan is None:
+            return
+        self.siege.setMaximum(plan.capacity)
+        self.siege.setValue(plan.next_free() or 1)
+        self._update_seat_state()
+
+    def _update_seat_state(self):
+        plan = self._plan
+        if plan is None:
+            self.seats_info.clear()
+            return
+        remaining = plan.capacity - plan.taken
+        text = f"{remaining} place(s) libre(s) sur {plan.capacity}"
+        if not plan.is_free(self.siege.value()):
+            text += f" — siège {self.siege.value()} déjà vendu"
+            self.seats_info.setStyleSheet("color:#f85149;font-size:12px;")
+        else:
+            self.seats_info.setStyleSheet("color:#3fb950;font-size:12px;")
+        self.seats_info.setText(text)
+
+    def _add_client(self, client_cb):
         dlg = ClientQuickAdd(self)
         if dlg.exec():
-            self._load_clients()
-            self.client_cb.setCurrentIndex(self.client_cb.count() - 1)
+            # ajoute au modele partage : il apparait dans toutes les listes,
+            # choisi dans celle du bouton
+            row = self._clients.append({"id": dlg.client_id, "nom": dlg.nom.text().strip(),
+                                        "prenom": dlg.prenom.text().strip(), "telephone": dlg.tel.text()})
+            client_cb.setCurrentIndex(row)
 
     def _save(self):
         if not self.client_cb.currentData() or not self.trajet_cb.currentData():
             QtWidgets.QMessageBox.warning(self, "Erreur", "Client et trajet sont obligatoires.")
             return
         trajet_data = self.trajet_cb.currentData()
-        conn = get_connection()
         now = datetime.now().strftime("%Y-%m-%d %H:%M")
-        conn.execute("""INSERT INTO ticket (date, siege, montant, statut, trajet_id, client_id, user_id)
-                        VALUES (?,?,?,?,?,?,?)""",
-                     (now, self.siege.value(), self.montant.value(), "payé",
-                      trajet_data[0], self.client_cb.currentData(), self.current_user['id']))
-        conn.commit()
-        conn.close()
+        try:
+            backend().sell_ticket(self.current_user, trajet_data[0], self.siege.value(),
+                                  self.client_cb.currentData(), self.montant.value(), now)
+        except SeatUnavailable as e:
+            QtWidgets.QMessageBox.warning(self, "Siège indisponible", str(e))
+            self._update_seats()
+            return
+        except Exception as e:
+            QtWidgets.QMessageBox.warning(self, "Erreur", str(e))
+            return
+        self.accept()
+
+
+class GroupSaleDialog(TicketFormDialog):
+    # plusieurs places sur un meme trajet, un client par passager (groupe, ecole...)
+    def __init__(self, parent, current_user):
+        super().__init__(parent, current_user)
+        self.setWindowTitle("Vente groupée")
+
+    def _setup_ui(self):
+        layout = self._form()
+
+        self.nombre = QtWidgets.QSpinBox()
+        self.nombre.setMinimum(1)
+        self.nombre.setMaximum(DEFAULT_CAPACITY)
+        self.nombre.valueChanged.connect(self._update_passengers)
+
+        # une ligne client par place ; la liste defile au-dela de quelques passagers
+        self.passengers = QtWidgets.QFormLayout()
+        box = QtWidgets.QWidget()
+        box.setLayout(self.passengers)
+        scroll = QtWidgets.QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setWidget(box)
+        scroll.setMaximumHeight(220)
+
+        layout.addRow("Trajet *", self.trajet_cb)
+        layout.addRow("Nombre de places *", self.nombre)
+        layout.addRow("", self.seats_info)
+        layout.addRow("Passagers *", scroll)
+        layout.addRow("Montant par place", self.montant)
+        self._update_passengers()
+        self._finish_form(layout)
+
+    def _update_passengers(self):
+        count = self.nombre.value()
+        while len(self.client_cbs) > count:
+            self.client_cbs.pop()
+            self.passengers.removeRow(self.passengers.rowCount() - 1)
+        while len(self.client_cbs) < count:
+            # par defaut le meme client que le passager precedent
+            previous = self.client_cbs[-1].currentIndex() if self.client_cbs else 0
+            self.passengers.addRow(f"Place {len(self.client_cbs) + 1}", self._client_row())
+            self.client_cbs[-1].setCurrentIndex(previous)
+
+    def _update_seats(self):
+        plan = self._load_plan()
+        if plan is None:
+            self.seats_info.clear()
+            return
+        remaining = plan.capacity - plan.taken
+        self.nombre.setMaximum(max(remaining, 1))
+        self.seats_info.setText(f"{remaining} place(s) libre(s) sur {plan.capacity}")
+
+    def _save(self):
+        client_ids = [cb.currentData() for cb in self.client_cbs]
+        if not all(client_ids) or not self.trajet_cb.currentData():
+            QtWidgets.QMessageBox.warning(self, "Erreur", "Trajet et client de chaque place sont obligatoires.")
+            return
+        trajet_data = self.trajet_cb.currentData()
+        now = datetime.now().strftime("%Y-%m-%d %H:%M")
+        try:
+            seats = backend().sell_group(self.current_user, trajet_data[0], client_ids,
+                                         self.montant.value(), now)
+        except SeatUnavailable as e:
+            QtWidgets.QMessageBox.warning(self, "Places indisponibles", str(e))
+            self._update_seats()
+            return
+        except Exception as e:
+            QtWidgets.QMessageBox.warning(self, "Erreur", str(e))
+            return
+        QtWidgets.QMessageBox.information(self, "Vente groupée",
+                                          f"{len(seats)} ticket(s) vendu(s), sièges : {', '.join(map(str, seats))}")
         self.accept()
 
 
@@ -308,8 +533,9 @@ class ClientQuickAdd(QtWidgets.QDialog):
         if not nom or not prenom:
             QtWidgets.QMessageBox.warning(self, "Erreur", "Nom et prénom obligatoires.")
             return
-        conn = get_connection()
-        conn.execute("INSERT INTO client (nom,prenom,telephone) VALUES (?,?,?)", (nom, prenom, self.tel.text()))
-        conn.commit()
-        conn.close()
+        try:
+            self.client_id = backend().add_client(nom, prenom, self.tel.text())
+        except Exception as e:
+            QtWidgets.QMessageBox.warning(self, "Erreur", str(e))
+            return
         self.accept()
\ No newline at end of file
@@ -0,0 +1,269 @@
+import sqlite3
+from PySide6 import QtWidgets, QtCore
+import queries
+from database import read_connection, transaction
+from styles import primary_btn, make_table
+from scheduling import scheduler, ScheduleConflict, describe
+
+# bit i de trajet_template.jours = jour i de la semaine, lundi = 0
+WEEKDAYS = ["Lun", "Mar", "Mer", "Jeu", "Ven", "Sam", "Dim"]
+ALL_DAYS = 127
+
+# un seul INSERT ... SELECT pour toute la periode : les jours viennent d'une
+# CTE recursive, croises avec les modeles actifs. L'index unique
+# idx_trajet_template_jour + OR IGNORE rendent la generation rejouable : un
+# jour deja genere pour un modele est saute.
+GENERATE = """
+    INSERT OR IGNORE INTO trajet (template_id, ville_depart_id, ville_arrivee_id, heure_depart,
+                                  heure_arrivee, vehicule_id, chauffeur_id, prix)
+    WITH RECURSIVE jour(d) AS (
+        SELECT date(:debut)
+        UNION ALL
+        SELECT date(d, '+1 day') FROM jour WHERE d < date(:fin)
+    )
+    SELECT tp.id, tp.ville_depart_id, tp.ville_arrivee_id, jour.d || ' ' || tp.heure,
+           CASE WHEN tp.duree IS NULL THEN NULL
+                ELSE strftime('%Y-%m-%d %H:%M', jour.d || ' ' || tp.heure, '+' || tp.duree || ' minutes') END,
+           tp.vehicule_id, tp.chauffeur_id, tp.prix
+    FROM jour JOIN trajet_template tp
+    WHERE tp.actif
+      AND (:template IS NULL OR tp.id = :template)
+      AND tp.jours >> ((CAST(strftime('%w', jour.d) AS INTEGER) + 6) % 7) & 1
+"""
+
+
+def days_label(mask):
+    if mask == ALL_DAYS:
+        return "Tous les jours"
+    return " ".join(day for i, day in enumerate(WEEKDAYS) if mask >> i & 1) or "—"
+
+
+def generate(debut, fin, template_id=None, conn=None):
+    # cree les trajets des modeles actifs du debut a la fin (incluse, "AAAA-MM-JJ"),
+    # en une transaction ; renvoie le nombre de trajets crees. Si un vehicule ou un
+    # chauffeur se retrouve sur deux trajets en meme temps, ScheduleConflict annule tout.
+    if conn is None:
+        with transaction(bulk=("trajet",)) as conn:
+            return generate(debut, fin, template_id, conn)
+    last = conn.execute("SELECT COALESCE(MAX(id), 0) FROM trajet").fetchone()[0]
+    cur = conn.execute(GENERATE, {"debut": debut, "fin": fin, "template": template_id})
+    conflicts = scheduler.check(conn, last)
+    if conflicts:
+        raise ScheduleConflict(conflicts, describe(conflicts, conn))
+    return cur.rowcount
+
+
+class TemplatesDialog(QtWidgets.QDialog):
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setWindowTitle("Horaires récurrents")
+        self.setMinimumSize(900, 560)
+        self.setStyleSheet("QDialog{background:#fff;color:#e6edf3;} QLabel{color:#8b949e;font-size:12px;}")
+        self._setup_ui()
+        self.load_data()
+
+    def _setup_ui(self):
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(24, 24, 24, 24)
+        layout.setSpacing(14)
+
+        hdr = QtWidgets.QHBoxLayout()
+        hdr.addWidget(QtWidgets.QLabel("Un modèle par liaison régulière ; les trajets datés en sont générés."))
+        hdr.addStretch()
+        btn_add = primary_btn("+ Nouveau modèle")
+        btn_add.clicked.connect(lambda: self.open_form())
+        hdr.addWidget(btn_add)
+        layout.addLayout(hdr)
+
+        self.table = make_table(["ID", "Départ", "Arrivée", "Jours", "Heure", "Durée", "Véhicule",
+                                 "Chauffeur", "Prix (FCFA)", "Actif", "Actions"])
+        layout.addWidget(self.table)
+
+        gen = QtWidgets.QHBoxLayout()
+        today = QtCore.QDate.currentDate()
+        self.debut = QtWidgets.QDateEdit(today)
+        self.fin = QtWidgets.QDateEdit(today.addDays(30))
+        for d in (self.debut, self.fin):
+            d.setCalendarPopup(True)
+            d.setDisplayFormat("dd/MM/yyyy")
+        btn_gen = primary_btn("🗓️ Générer les trajets")
+        btn_gen.clicked.connect(self._generate)
+        gen.addWidget(QtWidgets.QLabel("Du"))
+        gen.addWidget(self.debut)
+        gen.addWidget(QtWidgets.QLabel("au"))
+        gen.addWidget(self.fin)
+        gen.addStretch()
+        gen.addWidget(btn_gen)
+        layout.addLayout(gen)
+
+    def load_data(self):
+        with read_connection() as conn:
+            rows = queries.fetchall(conn, "timetable.templates")
+        self.table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            values = [row["id"], row["depart"], row["arrivee"], days_label(row["jours"]), row["heure"],
+                      f"{row['duree']} min" if row["duree"] else "", row["matricule"], row["chauffeur"],
+                      f"{row['prix'] or 0:,.0f}", "Oui" if row["actif"] else "Non"]
+            for j, val in enumerate(values):
+                self.table.setItem(i, j, QtWidgets.QTableWidgetItem(str(val) if val else "—"))
+            aw = QtWidgets.QWidget()
+            al = QtWidgets.QHBoxLayout(aw)
+            al.setContentsMargins(4, 2, 4, 2)
+            btn_e = QtWidgets.QPushButton("✏️")
+            btn_e.setStyleSheet("background:#1f3a6e;color:#82a2f5;border:none;border-radius:4px;padding:4px 8px;")
+            btn_d = QtWidgets.QPushButton("🗑️")
+            btn_d.setStyleSheet("background:#3d1c1c;color:#f85149;border:none;border-radius:4px;padding:4px 8px;")
+            tid = row["id"]
+            btn_e.clicked.connect(lambda _, id=tid: self.open_form(id))
+            btn_d.clicked.connect(lambda _, id=tid: self.delete(id))
+            al.addWidget(btn_e)
+            al.addWidget(btn_d)
+            self.table.setCellWidget(i, 10, aw)
+
+    def open_form(self, tid=None):
+        if TemplateFormDialog(self, tid).exec():
+            self.load_data()
+
+    def delete(self, tid):
+        reply = QtWidgets.QMessageBox.question(self, "Confirmation", "Supprimer ce modèle ?")
+        if reply != QtWidgets.QMessageBox.Yes:
+            return
+        try:
+            with transaction() as conn:
+                conn.execute("DELETE FROM trajet_template WHERE id=?", (tid,))
+        except sqlite3.IntegrityError:
+            QtWidgets.QMessageBox.warning(self, "Erreur", "Des trajets ont été générés depuis ce modèle : "
+                                                          "désactivez-le plutôt que de le supprimer.")
+            return
+        self.load_data()
+
+    def _generate(self):
+        debut = self.debut.date().toString("yyyy-MM-dd")
+        fin = self.fin.date().toString("yyyy-MM-dd")
+        if debut > fin:
+            QtWidgets.QMessageBox.warning(self, "Erreur", "La date de début est après la date de fin.")
+            return
+        try:
+            created = generate(debut, fin)
+        except Exception as e:
+            QtWidgets.QMessageBox.warning(self, "Erreur", str(e))
+            return
+        QtWidgets.QMessageBox.information(self, "Horaires", f"{created} trajet(s) créé(s).")
+
+
+class TemplateFormDialog(QtWidgets.QDialog):
+    def __init__(self, parent, tid=None):
+        super().__init__(parent)
+        self.tid = tid
+        self.setWindowTitle("Modifier le modèle" if tid else "Nouveau modèle")
+        self.setMinimumWidth(460)
+        self.setStyleSheet("QDialog{background:#fff;color:#e6edf3;} QLabel{color:#8b949e;font-size:12px;}")
+        self._setup_ui()
+        if tid:
+            self._load(tid)
+
+    def _setup_ui(self):
+        layout = QtWidgets.QFormLayout(self)
+        layout.setSpacing(12)
+        layout.setContentsMargins(24, 24, 24, 24)
+
+        with read_connection() as conn:
+            villes = conn.execute("SELECT id,nom FROM ville ORDER BY nom").fetchall()
+            chauffeurs = conn.execute("SELECT id,nom,prenom FROM chauffeur").fetchall()
+            vehicules = conn.execute("SELECT id,matricule,nbre_place FROM vehicule").fetchall()
+
+        self.vd_cb = QtWidgets.QComboBox()
+        self.va_cb = QtWidgets.QComboBox()
+        for v in villes:
+            self.vd_cb.addItem(v['nom'], v['id'])
+            self.va_cb.addItem(v['nom'], v['id'])
+        self.days = []
+        days_row = QtWidgets.QHBoxLayout()
+        for day in WEEKDAYS:
+            cb = QtWidgets.QCheckBox(day)
+            cb.setChecked(True)
+            self.days.append(cb)
+            days_row.addWidget(cb)
+        self.heure = QtWidgets.QTimeEdit(QtCore.QTime(8, 0))
+        self.heure.setDisplayFormat("HH:mm")
+        self.duree = QtWidgets.QSpinBox()
+        self.duree.setRange(0, 48 * 60)
+        self.duree.setSingleStep(15)
+        self.duree.setSuffix(" min")
+        self.duree.setSpecialValueText("—")
+        self.chauf_cb = QtWidgets.QComboBox()
+        self.chauf_cb.addItem("— Aucun —", None)
+        for ch in chauffeurs:
+            self.chauf_cb.addItem(f"{ch['nom']} {ch['prenom']}", ch['id'])
+        self.veh_cb = QtWidgets.QComboBox()
+        self.veh_cb.addItem("— Aucun —", None)
+        for veh in vehicules:
+            self.veh_cb.addItem(f"{veh['matricule']} ({veh['nbre_place']} places)", veh['id'])
+        self.prix = QtWidgets.QDoubleSpinBox()
+        self.prix.setMaximum(9999999)
+        self.prix.setSuffix(" FCFA")
+        self.actif = QtWidgets.QCheckBox("Générer des trajets pour ce modèle")
+        self.actif.setChecked(True)
+
+        layout.addRow("Ville départ *", self.vd_cb)
+        layout.addRow("Ville arrivée *", self.va_cb)
+        layout.addRow("Jours", days_row)
+        layout.addRow("Heure départ *", self.heure)
+        layout.addRow("Durée", self.duree)
+        layout.addRow("Chauffeur", self.chauf_cb)
+        layout.addRow("Véhicule", self.veh_cb)
+        layout.addRow("Prix", self.prix)
+        layout.addRow("Actif", self.actif)
+
+        btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Save | QtWidgets.QDialogButtonBox.Cancel)
+        btns.accepted.connect(self._save)
+        btns.rejected.connect(self.reject)
+        btns.setStyleSheet("QPushButton{background:#82a2f5;color:#0d1117;border:none;border-radius:6px;padding:8px 18px;font-weight:700;}")
+        layout.addRow(btns)
+
+    def _select(self, cb, value):
+        idx = cb.findData(value)
+        if idx >= 0:
+            cb.setCurrentIndex(idx)
+
+    def _load(self, tid):
+        with read_connection() as conn:
+            row = conn.execute("SELECT * FROM trajet_template WHERE id=?", (tid,)).fetchone()
+        if row:
+            self._select(self.vd_cb, row['ville_depart_id'])
+            self._select(self.va_cb, row['ville_arrivee_id'])
+            for i, cb in enumerate(self.days):
+                cb.setChecked(bool(row['jours'] >> i & 1))
+            self.heure.setTime(QtCore.QTime.fromString(row['heure'], "HH:mm"))
+            self.duree.setValue(row['duree'] or 0)
+            self._select(self.chauf_cb, row['chauffeur_id'])
+            self._select(self.veh_cb, row['vehicule_id'])
+            self.prix.setValue(row['prix'] or 0)
+            self.actif.setChecked(bool(row['actif']))
+
+    def _save(self):
+        jours = sum(1 << i for i, cb in enumerate(self.days) if cb.isChecked())
+        if self.vd_cb.currentData() is None or self.vd_cb.currentData() == self.va_cb.currentData():
+            QtWidgets.QMessageBox.warning(self, "Erreur", "Choisissez deux villes différentes.")
+            return
+        if not jours:
+            QtWidgets.QMessageBox.warning(self, "Erreur", "Cochez au moins un jour.")
+            return
+        values = (self.vd_cb.currentData(), self.va_cb.currentData(), jours,
+                  self.heure.time().toString("HH:mm"), self.duree.value() or None,
+                  self.veh_cb.currentData(), self.chauf_cb.currentData(), self.prix.value(),
+                  int(self.actif.isChecked()))
+        try:
+            with transaction() as conn:
+                if self.tid:
+                    # les trajets deja generes gardent leurs valeurs ; seuls les
+                    # jours encore a generer suivent le modele
+                    conn.execute("""UPDATE trajet_template SET ville_depart_id=?,ville_arrivee_id=?,jours=?,
+                        heure=?,duree=?,vehicule_id=?,chauffeur_id=?,prix=?,actif=? WHERE id=?""",
+                        values + (self.tid,))
+                else:
+                    conn.execute("""INSERT INTO trajet_template (ville_depart_id,ville_arrivee_id,jours,
+                        heure,duree,vehicule_id,chauffeur_id,prix,actif) VALUES (?,?,?,?,?,?,?,?,?)""", values)
+            self.accept()
+        except Exception as e:
+            QtWidgets.QMessageBox.warning(self, "Erreur", str(e))
@@ -1,6 +1,15 @@
+import sqlite3
 from PySide6 import QtWidgets, QtCore
-from database import get_connection
-from styles import primary_btn, section_title, make_table
+from database import read_connection, transaction, fts_match
+from styles import primary_btn, section_title, make_table, pager_bar, patch_table
+from pagination import KeysetPager, MAX_ID
+from search import SearchController
+from events import bus
+from export import export_list
+from seats import inventory
+from printing import print_queue
+from timetable import TemplatesDialog
+from scheduling import scheduler, describe
 
 class TrajetsPage(QtWidgets.QWidget):
     def __init__(self, current_user):
@@ -17,6 +26,15 @@ class TrajetsPage(QtWidgets.QWidget):
         hdr = QtWidgets.QHBoxLayout()
         hdr.addWidget(section_title("🗺️ Trajets"))
         hdr.addStretch()
+        btn_timetable = primary_btn("🗓️ Horaires", "#ffffff", "#1a1f2e")
+        btn_timetable.clicked.connect(lambda: TemplatesDialog(self).exec())
+        hdr.addWidget(btn_timetable)
+        btn_import = primary_btn("📥 Importer", "#ffffff", "#1a1f2e")
+        btn_import.clicked.connect(self.open_import)
+        hdr.addWidget(btn_import)
+        btn_export = primary_btn("⬇️ Exporter", "#ffffff", "#1a1f2e")
+        btn_export.clicked.connect(lambda: export_list(self, "trajets", self.pager, self.table))
+        hdr.addWidget(btn_export)
         btn_add = primary_btn("+ Nouveau trajet")
         btn_add.clicked.connect(self.open_form)
         hdr.addWidget(btn_add)
@@ -25,67 +43,100 @@ class TrajetsPage(QtWidgets.QWidget):
         # Search
         self.search_input = QtWidgets.QLineEdit()
         self.search_input.setPlaceholderText("🔍 Rechercher par ville de départ ou d'arrivée...")
-        self.search_input.textChanged.connect(lambda t: self.load_data(t))
+        self.search_input.textChanged.connect(lambda t: self.searcher.submit(t))
         layout.addWidget(self.search_input)
 
         self.table = make_table(["ID", "Départ", "Arrivée", "H. Départ", "H. Arrivée", "Chauffeur", "Véhicule", "Prix (FCFA)", "Places", "Actions"])
         layout.addWidget(self.table)
+        self.pager = KeysetPager("trajets.page", ["id"], (MAX_ID,), descending=True)
+        self.pager_bar = pager_bar(lambda: self._show(self.pager.previous_page()),
+                                   lambda: self._show(self.pager.next_page()))
+        layout.addWidget(self.pager_bar)
+        bus().changed.connect(self._on_change)
+        self.searcher = SearchController(lambda conn, text: self.pager.prepare(self._filter(text), conn=conn))
+        self.searcher.results_ready.connect(lambda text, res: self._show(self.pager.apply(res)))
+
+    def _filter(self, search):
+        return {"q": fts_match(search)}
+
+    def refresh(self):
+        self.load_data(self.search_input.text())
 
     def load_data(self, search=""):
-        conn = get_connection()
-        query = """
-            SELECT t.id,
-                   vd.nom as depart, va.nom as arrivee,
-                   t.heure_depart, t.heure_arrivee,
-                   c.nom||' '||c.prenom as chauffeur,
-                   v.matricule, t.prix,
-                   v.nbre_place
-            FROM trajet t
-            LEFT JOIN ville vd ON t.ville_depart_id = vd.id
-            LEFT JOIN ville va ON t.ville_arrivee_id = va.id
-            LEFT JOIN chauffeur c ON t.chauffeur_id = c.id
-            LEFT JOIN vehicule v ON t.vehicule_id = v.id
-        """
-        params = []
-        if search:
-            query += " WHERE vd.nom LIKE ? OR va.nom LIKE ?"
-            s = f"%{search}%"
-            params = [s, s]
-        query += " ORDER BY t.id DESC"
-        rows = conn.execute(query, params).fetchall()
-        conn.close()
+        self.pager.set_filter(self._filter(search))
+        self._show(self.pager.first())
 
+    def _show(self, rows):
+        self._rows = list(rows)
         self.table.setRowCount(len(rows))
         for i, row in enumerate(rows):
-            for j, val in enumerate(row):
-                self.table.setItem(i, j, QtWidgets.QTableWidgetItem(str(val) if val else "—"))
-            aw = QtWidgets.QWidget()
-            al = QtWidgets.QHBoxLayout(aw)
-            al.setContentsMargins(4, 2, 4, 2)
-            btn_e = QtWidgets.QPushButton("✏️")
-            btn_e.setStyleSheet("background:#1f3a6e;color:#82a2f5;border:none;border-radius:4px;padding:4px 8px;")
-            btn_d = QtWidgets.QPushButton("🗑️")
-            btn_d.setStyleSheet("background:#3d1c1c;color:#f85149;border:none;border-radius:4px;padding:4px 8px;")
-            tid = row[0]
-            btn_e.clicked.connect(lambda _, id=tid: self.open_form(id))
-            btn_d.clicked.connect(lambda _, id=tid: self.delete(id))
-            al.addWidget(btn_e)
-            al.addWidget(btn_d)
-            self.table.setCellWidget(i, 9, aw)
+            self._fill_row(i, row)
+        self.pager_bar.sync(self.pager)
+
+    def _fill_row(self, i, row):
+        for j, val in enumerate(row):
+            self.table.setItem(i, j, QtWidgets.QTableWidgetItem(str(val) if val else "—"))
+        aw = QtWidgets.QWidget()
+        al = QtWidgets.QHBoxLayout(aw)
+        al.setContentsMargins(4, 2, 4, 2)
+        btn_e = QtWidgets.QPushButton("✏️")
+        btn_e.setStyleSheet("background:#1f3a6e;color:#82a2f5;border:none;border-radius:4px;padding:4px 8px;")
+        btn_d = QtWidgets.QPushButton("🗑️")
+        btn_d.setStyleSheet("background:#3d1c1c;color:#f85149;border:none;border-radius:4px;padding:4px 8px;")
+        tid = row[0]
+        btn_p = QtWidgets.QPushButton("🖨️")
+        btn_p.setToolTip("Imprimer les tickets du trajet")
+        btn_p.setStyleSheet("background:#21262d;color:#e6edf3;border:none;border-radius:4px;padding:4px 8px;")
+        btn_e.clicked.connect(lambda _, id=tid: self.open_form(id))
+        btn_d.clicked.connect(lambda _, id=tid: self.delete(id))
+        btn_p.clicked.connect(lambda _, id=tid, b=btn_p: self.print_tickets(id, b))
+        al.addWidget(btn_p)
+        al.addWidget(btn_e)
+        al.addWidget(btn_d)
+        self.table.setCellWidget(i, 9, aw)
+
+    def _on_change(self, table, op, rowid):
+        if table == "trajet" and op == "reload":
+            self.refresh()
+        elif table == "trajet":
+            patch_table(self.table, self._rows, self.pager.patch(self._rows, op, rowid), self._fill_row)
+            self.pager_bar.sync(self.pager)
 
     def delete(self, tid):
         reply = QtWidgets.QMessageBox.question(self, "Confirmation", "Supprimer ce trajet ?")
         if reply == QtWidgets.QMessageBox.Yes:
-            conn = get_connection()
-            conn.execute("DELETE FROM trajet WHERE id=?", (tid,))
-            conn.commit()
-            conn.close()
-            self.load_data()
+            try:
+                with transaction() as conn:
+                    conn.execute("DELETE FROM trajet WHERE id=?", (tid,))
+            except sqlite3.IntegrityError:
+                QtWidgets.QMessageBox.warning(self, "Erreur", "Ce trajet a des tickets vendus, il ne peut pas être supprimé.")
+                return
+
+    def print_tickets(self, tid, button):
+        # tous les tickets du trajet en un seul travail, dans la file d'impression
+        menu = QtWidgets.QMenu(self)
+        preview = menu.addAction("Aperçu des tickets")
+        direct = menu.addAction("Imprimer directement")
+        pdf = menu.addAction("Enregistrer en PDF…")
+        chosen = menu.exec(button.mapToGlobal(QtCore.QPoint(0, button.height())))
+        if chosen is preview:
+            print_queue().preview_trajet(self, tid)
+        elif chosen is direct:
+            print_queue().print_trajet(self, tid)
+        elif chosen is pdf:
+            path, _ = QtWidgets.QFileDialog.getSaveFileName(
+                self, "Enregistrer les tickets", f"tickets_trajet_{tid}.pdf", "PDF (*.pdf)")
+            if path:
+                print_queue().trajet_pdf(self, tid, path)
 
     def open_form(self, tid=None):
         dlg = TrajetFormDialog(self, tid)
-        if dlg.exec():
-            self.load_data()
+        dlg.exec()
+
+    def open_import(self):
+        # pandas n'est charge qu'a la premiere importation
+        from importer import import_dialog
+        import_dialog(self, "trajets")
 
 
 class TrajetFormDialog(QtWidgets.QDialog):
@@ -104,11 +155,10 @@ class TrajetFormDialog(QtWidgets.QDialog):
         layout.setSpacing(12)
         layout.setContentsMargins(24, 24, 24, 24)
 
-        conn = get_connection()
-        self._villes = [dict(r) for r in conn.execute("SELECT id,nom FROM ville ORDER BY nom").fetchall()]
-        self._chauffeurs = [dict(r) for r in conn.execute("SELECT id,nom,prenom FROM chauffeur").fetchall()]
-        self._vehicules = [dict(r) for r in conn.execute("SELECT id,matricule,nbre_place FROM vehicule").fetchall()]
-        conn.close()
+        with read_connection() as conn:
+            self._villes = [dict(r) for r in conn.execute("SELECT id,nom FROM ville ORDER BY nom").fetchall()]
+            self._chauffeurs = [dict(r) for r in conn.execute("SELECT id,nom,prenom FROM chauffeur").fetchall()]
+            self._vehicules = [dict(r) for r in conn.execute("SELECT id,matricule,nbre_place FROM vehicule").fetchall()]
 
         self.vd_cb = QtWidgets.QComboBox()
         self.va_cb = QtWidgets.QComboBox()
@@ -143,6 +193,9 @@ class TrajetFormDialog(QtWidgets.QDialog):
         self.prix.setSuffix(" FCFA")
 
         self._populate_combos()
+        # chauffeurs et vehicules proposes = ceux qui sont libres sur le creneau
+        self.h_dep.dateTimeChanged.connect(self._populate_resources)
+        self.h_arr.dateTimeChanged.connect(self._populate_resources)
 
         layout.addRow("Ville départ *", vd_row)
         layout.addRow("Ville arrivée *", va_row)
@@ -161,38 +214,52 @@ class TrajetFormDialog(QtWidgets.QDialog):
     def _populate_combos(self):
         self.vd_cb.clear()
         self.va_cb.clear()
-        conn = get_connection()
-        self._villes = [dict(r) for r in conn.execute("SELECT id,nom FROM ville ORDER BY nom").fetchall()]
-        conn.close()
+        with read_connection() as conn:
+            self._villes = [dict(r) for r in conn.execute("SELECT id,nom FROM ville ORDER BY nom").fetchall()]
         for v in self._villes:
             self.vd_cb.addItem(v['nom'], v['id'])
             self.va_cb.addItem(v['nom'], v['id'])
-        self.chauf_cb.clear()
-        self.chauf_cb.addItem("— Aucun —", None)
-        for ch in self._chauffeurs:
-            self.chauf_cb.addItem(f"{ch['nom']} {ch['prenom']}", ch['id'])
-        self.veh_cb.clear()
-        self.veh_cb.addItem("— Aucun —", None)
-        for veh in self._vehicules:
-            self.veh_cb.addItem(f"{veh['matricule']} ({veh['nbre_place']} places)", veh['id'])
+        self._populate_resources()
+
+    def _slot(self):
+        return (self.h_dep.dateTime().toString("yyyy-MM-dd HH:mm"),
+                self.h_arr.dateTime().toString("yyyy-MM-dd HH:mm"))
+
+    def _populate_resources(self):
+        # la selection en cours reste dans la liste (marquee si elle est prise),
+        # l'enregistrement refusera alors le conflit
+        dep, arr = self._slot()
+        for cb, kind, items, label in (
+                (self.chauf_cb, "chauffeur", self._chauffeurs, lambda ch: f"{ch['nom']} {ch['prenom']}"),
+                (self.veh_cb, "vehicule", self._vehicules,
+                 lambda veh: f"{veh['matricule']} ({veh['nbre_place']} places)")):
+            current = cb.currentData()
+            free = set(scheduler.free(kind, [it['id'] for it in items], dep, arr, self.tid))
+            cb.blockSignals(True)
+            cb.clear()
+            cb.addItem("— Aucun —", None)
+            for it in items:
+                if it['id'] in free:
+                    cb.addItem(label(it), it['id'])
+                elif it['id'] == current:
+                    cb.addItem(label(it) + " (occupé)", it['id'])
+            cb.setCurrentIndex(max(cb.findData(current), 0))
+            cb.blockSignals(False)
 
     def _add_ville(self, cb):
         nom, ok = QtWidgets.QInputDialog.getText(self, "Nouvelle ville", "Nom de la ville :")
         if ok and nom.strip():
-            conn = get_connection()
             try:
-                conn.execute("INSERT INTO ville (nom) VALUES (?)", (nom.strip(),))
-                conn.commit()
+                with transaction() as conn:
+                    conn.execute("INSERT INTO ville (nom) VALUES (?)", (nom.strip(),))
             except: pass
-            conn.close()
             self._populate_combos()
             idx = cb.findText(nom.strip())
             if idx >= 0: cb.setCurrentIndex(idx)
 
     def _load(self, tid):
-        conn = get_connection()
-        row = conn.execute("SELECT * FROM trajet WHERE id=?", (tid,)).fetchone()
-        conn.close()
+        with read_connection() as conn:
+            row = conn.execute("SELECT * FROM trajet WHERE id=?", (tid,)).fetchone()
         if row:
             for i in range(self.vd_cb.count()):
                 if self.vd_cb.itemData(i) == row['ville_depart_id']:
@@ -204,35 +271,43 @@ class TrajetFormDialog(QtWidgets.QDialog):
                 self.h_dep.setDateTime(QtCore.QDateTime.fromString(row['heure_depart'], "yyyy-MM-dd HH:mm"))
             if row['heure_arrivee']:
                 self.h_arr.setDateTime(QtCore.QDateTime.fromString(row['heure_arrivee'], "yyyy-MM-dd HH:mm"))
-            for i in range(self.chauf_cb.count()):
-                if self.chauf_cb.itemData(i) == row['chauffeur_id']:
-                    self.chauf_cb.setCurrentIndex(i)
-            for i in range(self.veh_cb.count()):
-                if self.veh_cb.itemData(i) == row['vehicule_id']:
-                    self.veh_cb.setCurrentIndex(i)
+            # le chauffeur / vehicule enregistre est propose meme s'il est pris ailleurs
+            self.chauf_cb.addItem("", row['chauffeur_id'])
+            self.chauf_cb.setCurrentIndex(self.chauf_cb.count() - 1)
+            self.veh_cb.addItem("", row['vehicule_id'])
+            self.veh_cb.setCurrentIndex(self.veh_cb.count() - 1)
+            self._populate_resources()
             self.prix.setValue(row['prix'] or 0)
 
     def _save(self):
-        conn = get_connection()
-        dep = self.h_dep.dateTime().toString("yyyy-MM-dd HH:mm")
-        arr = self.h_arr.dateTime().toString("yyyy-MM-dd HH:mm")
+        dep, arr = self._slot()
+        if arr <= dep:
+            QtWidgets.QMessageBox.warning(self, "Erreur", "L'heure d'arrivée doit être après l'heure de départ.")
+            return
+        conflicts = scheduler.conflicts(self.veh_cb.currentData(), self.chauf_cb.currentData(), dep, arr, self.tid)
+        if conflicts:
+            with read_connection() as conn:
+                lines = describe(conflicts, conn)
+            QtWidgets.QMessageBox.warning(
+                self, "Conflit de planning",
+                "Déjà pris sur ce créneau :\n" + "\n".join(lines))
+            return
         try:
-            if self.tid:
-                conn.execute("""UPDATE trajet SET ville_depart_id=?,ville_arrivee_id=?,
-                    heure_depart=?,heure_arrivee=?,chauffeur_id=?,vehicule_id=?,prix=? WHERE id=?""",
-                    (self.vd_cb.currentData(), self.va_cb.currentData(),
-                     dep, arr, self.chauf_cb.currentData(), self.veh_cb.currentData(),
-                     self.prix.value(), self.tid))
-            else:
-                conn.execute("""INSERT INTO trajet (ville_depart_id,ville_arrivee_id,
-                    heure_depart,heure_arrivee,chauffeur_id,vehicule_id,prix)
-                    VALUES (?,?,?,?,?,?,?)""",
-                    (self.vd_cb.currentData(), self.va_cb.currentData(),
-                     dep, arr, self.chauf_cb.currentData(), self.veh_cb.currentData(),
-                     self.prix.value()))
-            conn.commit()
-            conn.close()
+            with transaction() as conn:
+                if self.tid:
+                    conn.execute("""UPDATE trajet SET ville_depart_id=?,ville_arrivee_id=?,
+                        heure_depart=?,heure_arrivee=?,chauffeur_id=?,vehicule_id=?,prix=? WHERE id=?""",
+                        (self.vd_cb.currentData(), self.va_cb.currentData(),
+                         dep, arr, self.chauf_cb.currentData(), self.veh_cb.currentData(),
+                         self.prix.value(), self.tid))
+                    inventory.invalidate(self.tid)
+                else:
+                    conn.execute("""INSERT INTO trajet (ville_depart_id,ville_arrivee_id,
+                        heure_depart,heure_arrivee,chauffeur_id,vehicule_id,prix)
+                        VALUES (?,?,?,?,?,?,?)""",
+                        (self.vd_cb.currentData(), self.va_cb.currentData(),
+                         dep, arr, self.chauf_cb.currentData(), self.veh_cb.currentData(),
+                         self.prix.value()))
             self.accept()
         except Exception as e:
-            conn.close()
             QtWidgets.QMessageBox.warning(self, "Erreur", str(e))
\ No newline at end of file
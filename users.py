@@ -1,6 +1,12 @@
+import sqlite3
 from PySide6 import QtWidgets, QtCore
-from database import get_connection, hash_password
-from styles import primary_btn, danger_btn, section_title, make_table, card_widget
+from database import read_connection, transaction, fts_match
+from auth import hash_password
+from styles import primary_btn, danger_btn, section_title, make_table, card_widget, pager_bar, patch_table
+from pagination import KeysetPager
+from search import SearchController
+from events import bus
+from export import export_list
 
 class UsersPage(QtWidgets.QWidget):
     def __init__(self, current_user):
@@ -17,6 +23,9 @@ class UsersPage(QtWidgets.QWidget):
         hdr = QtWidgets.QHBoxLayout()
         hdr.addWidget(section_title("👥 Utilisateurs"))
         hdr.addStretch()
+        btn_export = primary_btn("⬇️ Exporter", "#ffffff", "#1a1f2e")
+        btn_export.clicked.connect(lambda: export_list(self, "utilisateurs", self.pager, self.table))
+        hdr.addWidget(btn_export)
         btn_add = primary_btn("+ Ajouter")
         btn_add.clicked.connect(self.open_form)
         hdr.addWidget(btn_add)
@@ -31,43 +40,57 @@ class UsersPage(QtWidgets.QWidget):
 
         self.table = make_table(["ID", "Nom", "Prénom", "Identifiant", "Genre", "Téléphone", "Rôle", "Actions"])
         layout.addWidget(self.table)
+        self.pager = KeysetPager("users.page", ["nom", "id"], ("", 0))
+        self.pager_bar = pager_bar(lambda: self._show(self.pager.previous_page()),
+                                   lambda: self._show(self.pager.next_page()))
+        layout.addWidget(self.pager_bar)
+        bus().changed.connect(self._on_change)
+        self.searcher = SearchController(lambda conn, text: self.pager.prepare(self._filter(text), conn=conn))
+        self.searcher.results_ready.connect(lambda text, res: self._show(self.pager.apply(res)))
+
+    def _filter(self, search):
+        return {"q": fts_match(search)}
+
+    def refresh(self):
+        self.load_data(self.search_input.text())
 
     def load_data(self, search=""):
-        conn = get_connection()
-        c = conn.cursor()
-        query = """
-            SELECT u.id, u.nom, u.prenom, u.identifiant, u.genre, u.telephone, r.nom as role
-            FROM user u LEFT JOIN role r ON u.role_id = r.id
-        """
-        params = []
-        if search:
-            query += " WHERE u.nom LIKE ? OR u.prenom LIKE ? OR u.identifiant LIKE ?"
-            s = f"%{search}%"
-            params = [s, s, s]
-        c.execute(query, params)
-        rows = c.fetchall()
-        conn.close()
+        self.pager.set_filter(self._filter(search))
+        self._show(self.pager.first())
 
+    def _show(self, rows):
+        self._rows = list(rows)
         self.table.setRowCount(len(rows))
         for i, row in enumerate(rows):
-            for j, val in enumerate(row):
-                self.table.setItem(i, j, QtWidgets.QTableWidgetItem(str(val) if val else ""))
-            action_widget = QtWidgets.QWidget()
-            action_layout = QtWidgets.QHBoxLayout(action_widget)
-            action_layout.setContentsMargins(4, 2, 4, 2)
-            btn_edit = QtWidgets.QPushButton("✏️ Modifier")
-            btn_edit.setStyleSheet("background:#1f3a6e;color:#82a2f5;border:none;border-radius:4px;padding:4px 8px;")
-            btn_del = QtWidgets.QPushButton("🗑️ Supprimer")
-            btn_del.setStyleSheet("background:#3d1c1c;color:#f85149;border:none;border-radius:4px;padding:4px 8px;")
-            uid = row[0]
-            btn_edit.clicked.connect(lambda _, id=uid: self.open_form(id))
-            btn_del.clicked.connect(lambda _, id=uid: self.delete_user(id))
-            action_layout.addWidget(btn_edit)
-            action_layout.addWidget(btn_del)
-            self.table.setCellWidget(i, 7, action_widget)
+            self._fill_row(i, row)
+        self.pager_bar.sync(self.pager)
+
+    def _fill_row(self, i, row):
+        for j, val in enumerate(row):
+            self.table.setItem(i, j, QtWidgets.QTableWidgetItem(str(val) if val else ""))
+        action_widget = QtWidgets.QWidget()
+        action_layout = QtWidgets.QHBoxLayout(action_widget)
+        action_layout.setContentsMargins(4, 2, 4, 2)
+        btn_edit = QtWidgets.QPushButton("✏️ Modifier")
+        btn_edit.setStyleSheet("background:#1f3a6e;color:#82a2f5;border:none;border-radius:4px;padding:4px 8px;")
+        btn_del = QtWidgets.QPushButton("🗑️ Supprimer")
+        btn_del.setStyleSheet("background:#3d1c1c;color:#f85149;border:none;border-radius:4px;padding:4px 8px;")
+        uid = row[0]
+        btn_edit.clicked.connect(lambda _, id=uid: self.open_form(id))
+        btn_del.clicked.connect(lambda _, id=uid: self.delete_user(id))
+        action_layout.addWidget(btn_edit)
+        action_layout.addWidget(btn_del)
+        self.table.setCellWidget(i, 7, action_widget)
+
+    def _on_change(self, table, op, rowid):
+        if table == "user" and op == "reload":
+            self.refresh()
+        elif table == "user":
+            patch_table(self.table, self._rows, self.pager.patch(self._rows, op, rowid), self._fill_row)
+            self.pager_bar.sync(self.pager)
 
     def filter_table(self, text):
-        self.load_data(text)
+        self.searcher.submit(text)
 
     def delete_user(self, uid):
         if uid == self.current_user['id']:
@@ -75,16 +98,16 @@ class UsersPage(QtWidgets.QWidget):
             return
         reply = QtWidgets.QMessageBox.question(self, "Confirmation", "Supprimer cet utilisateur ?")
         if reply == QtWidgets.QMessageBox.Yes:
-            conn = get_connection()
-            conn.execute("DELETE FROM user WHERE id=?", (uid,))
-            conn.commit()
-            conn.close()
-            self.load_data()
+            try:
+                with transaction() as conn:
+                    conn.execute("DELETE FROM user WHERE id=?", (uid,))
+            except sqlite3.IntegrityError:
+                QtWidgets.QMessageBox.warning(self, "Erreur", "Cet utilisateur a vendu des tickets, il ne peut pas être supprimé.")
+                return
 
     def open_form(self, uid=None):
         dlg = UserFormDialog(self, uid)
-        if dlg.exec():
-            self.load_data()
+        dlg.exec()
 
 
 class UserFormDialog(QtWidgets.QDialog):
@@ -120,10 +143,9 @@ class UserFormDialog(QtWidgets.QDialog):
         self.role_cb = QtWidgets.QComboBox()
         self.societe_cb = QtWidgets.QComboBox()
 
-        conn = get_connection()
-        self._roles = [dict(r) for r in conn.execute("SELECT id, nom FROM role").fetchall()]
-        self._societes = [dict(s) for s in conn.execute("SELECT id, nom FROM societe").fetchall()]
-        conn.close()
+        with read_connection() as conn:
+            self._roles = [dict(r) for r in conn.execute("SELECT id, nom FROM role").fetchall()]
+            self._societes = [dict(s) for s in conn.execute("SELECT id, nom FROM societe").fetchall()]
         for r in self._roles:
             self.role_cb.addItem(r['nom'], r['id'])
         for s in self._societes:
@@ -149,9 +171,8 @@ class UserFormDialog(QtWidgets.QDialog):
         layout.addRow(btns)
 
     def _load(self, uid):
-        conn = get_connection()
-        row = conn.execute("SELECT * FROM user WHERE id=?", (uid,)).fetchone()
-        conn.close()
+        with read_connection() as conn:
+            row = conn.execute("SELECT * FROM user WHERE id=?", (uid,)).fetchone()
         if row:
             self.nom.setText(row['nom'])
             self.prenom.setText(row['prenom'])
@@ -175,33 +196,30 @@ class UserFormDialog(QtWidgets.QDialog):
         if not nom or not prenom or not ident:
             QtWidgets.QMessageBox.warning(self, "Erreur", "Nom, prénom et identifiant sont obligatoires.")
             return
-        conn = get_connection()
         pw = self.password.text()
         dob = self.date_naissance.date().toString("yyyy-MM-dd")
+        if not self.uid and not pw:
+            QtWidgets.QMessageBox.warning(self, "Erreur", "Le mot de passe est obligatoire.")
+            return
         try:
-            if self.uid:
-                if pw:
-                    conn.execute("""UPDATE user SET nom=?,prenom=?,telephone=?,date_naissance=?,genre=?,
-                        identifiant=?,password=?,role_id=?,societe_id=? WHERE id=?""",
-                        (nom, prenom, self.telephone.text(), dob, self.genre.currentText(),
-                         ident, hash_password(pw), self.role_cb.currentData(),
-                         self.societe_cb.currentData(), self.uid))
+            with transaction() as conn:
+                if self.uid:
+                    if pw:
+                        conn.execute("""UPDATE user SET nom=?,prenom=?,telephone=?,date_naissance=?,genre=?,
+                            identifiant=?,password=?,role_id=?,societe_id=? WHERE id=?""",
+                            (nom, prenom, self.telephone.text(), dob, self.genre.currentText(),
+                             ident, hash_password(pw), self.role_cb.currentData(),
+                             self.societe_cb.currentData(), self.uid))
+                    else:
+                        conn.execute("""UPDATE user SET nom=?,prenom=?,telephone=?,date_naissance=?,genre=?,
+                            identifiant=?,role_id=?,societe_id=? WHERE id=?""",
+                            (nom, prenom, self.telephone.text(), dob, self.genre.currentText(),
+                             ident, self.role_cb.currentData(), self.societe_cb.currentData(), self.uid))
                 else:
-                    conn.execute("""UPDATE user SET nom=?,prenom=?,telephone=?,date_naissance=?,genre=?,
-                        identifiant=?,role_id=?,societe_id=? WHERE id=?""",
+                    conn.execute("""INSERT INTO user (nom,prenom,telephone,date_naissance,genre,identifiant,password,role_id,societe_id)
+                        VALUES (?,?,?,?,?,?,?,?,?)""",
                         (nom, prenom, self.telephone.text(), dob, self.genre.currentText(),
-                         ident, self.role_cb.currentData(), self.societe_cb.currentData(), self.uid))
-            else:
-                if not pw:
-                    QtWidgets.QMessageBox.warning(self, "Erreur", "Le mot de passe est obligatoire.")
-                    return
-                conn.execute("""INSERT INTO user (nom,prenom,telephone,date_naissance,genre,identifiant,password,role_id,societe_id)
-                    VALUES (?,?,?,?,?,?,?,?,?)""",
-                    (nom, prenom, self.telephone.text(), dob, self.genre.currentText(),
-                     ident, hash_password(pw), self.role_cb.currentData(), self.societe_cb.currentData()))
-            conn.commit()
-            conn.close()
+                         ident, hash_password(pw), self.role_cb.currentData(), self.societe_cb.currentData()))
             self.accept()
         except Exception as e:
-            conn.close()
             QtWidgets.QMessageBox.warning(self, "Erreur", str(e))
\ No newline at end of file